@@ -0,0 +1,362 @@
+"""
+Almacén compacto de POIs en un archivo binario que se abre con mmap.
+
+Cada consumidor (teselas, clusters, corredor, servidor de consultas) volvía a
+parsear los GeoJSON a dicts de Python, con las mismas cadenas repetidas miles
+de veces (empresabandera, tipooperador, provincia, localidad...). Acá la capa
+combinada de poi_data.load_merged_pois se guarda una sola vez en columnas:
+
+- coordenadas en int32 de punto fijo (grados * 1e7, ~1 cm); las fuentes con
+  hasta 7 decimales (las estaciones y casi todas las cámaras) quedan exactas
+- columnas categóricas codificadas por diccionario (uint8/uint16; el código 0
+  es "ausente" y el diccionario va en el encabezado)
+- por fila, el código de su "forma" (qué claves tiene y en qué orden), para
+  rearmar cada dict de propiedades exactamente igual al original
+- texto libre (direccion, razonsocial...) en un heap UTF-8 con offsets
+- valores que no son escalares (p.ej. mergedIds) como JSON en un heap
+
+El archivo se mapea en modo sólo lectura y cada columna es un np.frombuffer
+sobre el mapeo: abrirlo no copia ni decodifica nada, y varios procesos que
+abren el mismo archivo comparten las páginas del page cache. Los registros se
+leen con vistas POI (__slots__) que decodifican un campo cuando se pide.
+
+    python comun/almacen_poi.py --build                 # dist/pois.store
+    store = POIStore('dist/pois.store')
+    store[10].provincia, store.mask('empresabandera', 'YPF').sum()
+    CorridorIndex(store.as_pois())
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import tracemalloc
+from collections.abc import Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from poi_data import TYPES, ROOT, load_merged_pois, GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+STORE_FILE = os.path.join(ROOT, 'dist', 'pois.store')
+MAGIC = b'MAPNFSPS'
+VERSION = 1
+ALIGN = 64
+COORD_SCALE = 10_000_000
+# Se codifican por diccionario aunque no pasen el umbral de cardinalidad
+CATEGORICAL = ('empresabandera', 'tipooperador', 'provincia', 'localidad')
+# Se guardan como texto aunque tengan pocos valores distintos
+TEXT = ('direccion', 'razonsocial')
+MAX_CARDINALITY_RATIO = 0.25
+
+_PREFIX = struct.Struct('<8sII')   # magic, versión, largo del encabezado JSON
+_MISSING = object()
+
+
+def _is_scalar(value) -> bool:
+    return value is None or isinstance(value, (str, bool, int, float))
+
+
+def _code_dtype(size: int) -> str:
+    return 'u1' if size < 0xFF else 'u2' if size < 0xFFFF else 'u4'
+
+
+def _column_kind(name: str, values: list) -> str:
+    """'cat', 'text' o 'json' según los valores presentes de la columna."""
+    present = [v for v in values if v is not _MISSING]
+    if not all(_is_scalar(v) for v in present):
+        return 'json'
+    if name in TEXT and all(isinstance(v, str) for v in present):
+        return 'text'
+    distinct = len(set(present))
+    if name in CATEGORICAL or distinct <= max(1, MAX_CARDINALITY_RATIO * len(present)):
+        return 'cat'
+    return 'text' if all(isinstance(v, str) for v in present) else 'json'
+
+
+def _heap(encoded: list):
+    """Offsets (n+1) y bytes concatenados de una lista de bytes."""
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    dtype = np.uint32 if offsets[-1] < 0xFFFFFFFF else np.uint64
+    return offsets.astype(dtype), np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def write_store(path: str, pois: dict) -> dict:
+    """
+    Guarda la capa combinada en el formato binario del almacén (de forma atómica).
+
+    Args:
+        path: Archivo de salida
+        pois: Resultado de poi_data.load_merged_pois
+
+    Returns:
+        El encabezado escrito (columnas, tipos y secciones)
+    """
+    n = len(pois['lon'])
+    props = pois['props']
+    sections = {
+        'lon_e7': np.round(np.asarray(pois['lon'], dtype=float) * COORD_SCALE).astype(np.int32),
+        'lat_e7': np.round(np.asarray(pois['lat'], dtype=float) * COORD_SCALE).astype(np.int32),
+        'layer': np.array([TYPES.index(t) for t in pois['type']], dtype=np.uint8),
+    }
+
+    # Cada combinación de claves (en orden) es una "forma"; por fila sólo se
+    # guarda el código de su forma, así los dicts se rearman igual al original
+    shapes = {}
+    shape_codes = [shapes.setdefault(tuple(p), len(shapes)) for p in props]
+    sections['shape'] = np.array(shape_codes, dtype=_code_dtype(len(shapes)))
+    names = list(dict.fromkeys(k for shape in shapes for k in shape))
+
+    columns = {}
+    for name in names:
+        values = [p.get(name, _MISSING) for p in props]
+        kind = _column_kind(name, values)
+        column = {'kind': kind}
+        if kind == 'cat':
+            dictionary = list(dict.fromkeys(v for v in values if v is not _MISSING))
+            # True == 1 y False == 0 para un dict: separar por tipo
+            lookup = {(type(v), v): i + 1 for i, v in enumerate(dictionary)}
+            column['dictionary'] = dictionary
+            sections[f'{name}.codes'] = np.array(
+                [0 if v is _MISSING else lookup[(type(v), v)] for v in values], dtype=_code_dtype(len(dictionary)))
+        else:
+            if kind == 'text':
+                encoded = [b'' if v is _MISSING else v.encode('utf-8') for v in values]
+            else:
+                encoded = [b'' if v is _MISSING else json.dumps(v, ensure_ascii=False).encode('utf-8')
+                           for v in values]
+            sections[f'{name}.offsets'], sections[f'{name}.heap'] = _heap(encoded)
+        columns[name] = column
+
+    header = {'rows': n, 'types': list(TYPES), 'shapes': [list(shape) for shape in shapes], 'columns': columns,
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'sections': {}}
+    # Las secciones van alineadas a ALIGN bytes después del encabezado; el
+    # encabezado incluye sus propios offsets, así que se calcula dos veces.
+    for _ in range(2):
+        encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        offset = -(-(_PREFIX.size + len(encoded_header)) // ALIGN) * ALIGN
+        layout = {}
+        for name, arr in sections.items():
+            layout[name] = {'offset': offset, 'dtype': arr.dtype.str, 'count': int(arr.size)}
+            offset = -(-(offset + arr.nbytes) // ALIGN) * ALIGN
+        header['sections'] = layout
+    encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    if _PREFIX.size + len(encoded_header) > min(s['offset'] for s in header['sections'].values()):
+        raise ValueError('El encabezado cambió de tamaño al fijar los offsets')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(encoded_header)))
+        f.write(encoded_header)
+        for name, arr in sections.items():
+            f.seek(header['sections'][name]['offset'])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, path)
+    return header
+
+
+class POI:
+    """Vista de un registro del almacén: no copia nada hasta que se pide un campo."""
+
+    __slots__ = ('_store', '_i')
+
+    def __init__(self, store: 'POIStore', i: int):
+        self._store = store
+        self._i = i
+
+    @property
+    def index(self) -> int:
+        return self._i
+
+    @property
+    def lon(self) -> float:
+        return int(self._store.lon_e7[self._i]) / COORD_SCALE
+
+    @property
+    def lat(self) -> float:
+        return int(self._store.lat_e7[self._i]) / COORD_SCALE
+
+    @property
+    def type(self) -> str:
+        return TYPES[self._store.layer[self._i]]
+
+    def get(self, name: str, default=None):
+        value = self._store.value(name, self._i)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, name: str):
+        value = self._store.value(name, self._i)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def properties(self) -> dict:
+        return self._store.properties(self._i)
+
+    def __repr__(self):
+        return f'POI({self._i}, {self.type}, {self.lon:.6f}, {self.lat:.6f})'
+
+
+class _PropsView(Sequence):
+    """Secuencia perezosa de dicts de propiedades, para usar el almacén donde se espera pois['props']."""
+
+    def __init__(self, store: 'POIStore'):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._store.properties(j) for j in range(*i.indices(len(self)))]
+        return self._store.properties(int(i))
+
+
+class POIStore:
+    """
+    Almacén abierto con mmap (sólo lectura).
+
+    Args:
+        path: Archivo generado por write_store
+    """
+
+    def __init__(self, path: str = STORE_FILE):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es un almacén de POIs")
+        if version != VERSION:
+            raise ValueError(f"{path}: versión {version}, se esperaba {VERSION}")
+        self.header = json.loads(self._mm[_PREFIX.size:_PREFIX.size + header_len].decode('utf-8'))
+        self.columns = self.header['columns']
+        self._sections = self.header['sections']
+        self._arrays = {name: np.frombuffer(self._mm, dtype=s['dtype'], count=s['count'], offset=s['offset'])
+                        for name, s in self._sections.items()}
+        self.lon_e7 = self._arrays['lon_e7']
+        self.lat_e7 = self._arrays['lat_e7']
+        self.layer = self._arrays['layer']
+        self.shape = self._arrays['shape']
+        self._shapes = self.header['shapes']
+        self._shape_sets = [frozenset(shape) for shape in self._shapes]
+
+    def __len__(self):
+        return self.header['rows']
+
+    def __getitem__(self, i: int) -> POI:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return POI(self, i % len(self))
+
+    def __iter__(self):
+        return (POI(self, i) for i in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mm)
+
+    def lonlat(self):
+        """(lon, lat) en float64."""
+        return self.lon_e7 / COORD_SCALE, self.lat_e7 / COORD_SCALE
+
+    def value(self, name: str, i: int):
+        """Valor de un campo de la fila i (_MISSING si la fila no lo tiene)."""
+        column = self.columns.get(name)
+        if column is None or name not in self._shape_sets[self.shape[i]]:
+            return _MISSING
+        kind = column['kind']
+        if kind == 'cat':
+            code = int(self._arrays[f'{name}.codes'][i])
+            return _MISSING if code == 0 else column['dictionary'][code - 1]
+        offsets = self._arrays[f'{name}.offsets']
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        base = self._sections[f'{name}.heap']['offset']
+        raw = self._mm[base + start:base + end]
+        return json.loads(raw) if kind == 'json' else raw.decode('utf-8')
+
+    def properties(self, i: int) -> dict:
+        """Propiedades de la fila i como dict, con las claves en el orden original."""
+        return {name: self.value(name, i) for name in self._shapes[self.shape[i]]}
+
+    def codes(self, name: str):
+        """(códigos, diccionario) de una columna categórica; el código k es dictionary[k - 1]."""
+        column = self.columns[name]
+        if column['kind'] != 'cat':
+            raise ValueError(f"{name} no es categórica")
+        return self._arrays[f'{name}.codes'], column['dictionary']
+
+    def mask(self, name: str, *values) -> np.ndarray:
+        """Filas cuya columna categórica `name` vale alguno de `values` (vectorizado, sin decodificar)."""
+        codes, dictionary = self.codes(name)
+        wanted = [i + 1 for i, v in enumerate(dictionary) if any(type(v) is type(w) and v == w for w in values)]
+        return np.isin(codes, wanted)
+
+    def layer_mask(self, *types) -> np.ndarray:
+        return np.isin(self.layer, [TYPES.index(t) for t in types])
+
+    def as_pois(self) -> dict:
+        """Mismo formato que poi_data.load_merged_pois, con las propiedades leídas a demanda."""
+        lon, lat = self.lonlat()
+        return {'lon': lon, 'lat': lat, 'type': np.asarray(TYPES, dtype=object)[self.layer],
+                'props': _PropsView(self)}
+
+
+def load_pois(store: str = None, gas: str = GAS_GEOJSON, cameras: str = CAMERAS_GEOJSON,
+              villas: str = VILLAS_GEOJSON) -> dict:
+    """POIs combinados desde el almacén si se indica, si no desde los GeoJSON."""
+    if store:
+        return POIStore(store).as_pois()
+    return load_merged_pois(gas, cameras, villas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Almacén binario de POIs (mmap).')
+    parser.add_argument('--store', default=STORE_FILE, help=f'Archivo del almacén (default {STORE_FILE})')
+    parser.add_argument('--build', action='store_true', help='(Re)construirlo desde los GeoJSON')
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    args = parser.parse_args()
+
+    if args.build:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        pois = load_merged_pois(args.gas, args.cameras, args.villas)
+        parsed = time.perf_counter() - t0
+        dict_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        header = write_store(args.store, pois)
+        print(f"GeoJSON a dicts: {parsed * 1000:.0f} ms, {dict_mb:.1f} MB en memoria")
+        kinds = {}
+        for name, column in header['columns'].items():
+            kinds.setdefault(column['kind'], []).append(name)
+        for kind, names in kinds.items():
+            print(f"  {kind:<5} {', '.join(names)}")
+        print(f"✓ Almacén guardado en: {args.store}")
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    store = POIStore(args.store)
+    opened = time.perf_counter() - t0
+    heap_kb = tracemalloc.get_traced_memory()[0] / 1e3
+    tracemalloc.stop()
+    counts = {t: int((store.layer == k).sum()) for k, t in enumerate(TYPES)}
+    print(f"{len(store)} POIs {counts}: {store.nbytes / 1e6:.2f} MB en disco, "
+          f"abierto en {opened * 1000:.2f} ms ({heap_kb:.0f} KB de objetos Python)")
+
+
+if __name__ == '__main__':
+    main()
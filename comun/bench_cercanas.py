@@ -0,0 +1,100 @@
+"""
+Benchmark de estaciones_cercanas.NearestStations contra la búsqueda por fuerza bruta.
+
+Las posiciones de consulta imitan a conductores: la mayoría cerca de alguna
+estación (desvío normal de --spread grados) y el resto al azar dentro del país.
+Para cada filtro verifica que ids y distancias coinciden con la fuerza bruta
+(distancia a todas las estaciones y filtro después) y compara tiempos por
+consulta. Con --replicate se multiplica el dataset (copias desplazadas) para
+ver cómo escala.
+
+    python comun/bench_cercanas.py --queries 5000 -k 5
+    python comun/bench_cercanas.py --replicate 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from estaciones_cercanas import NearestStations, brute_force_nearest
+from poi_data import load_merged_pois
+
+ARGENTINA = (-73.6, -55.1, -53.6, -21.8)
+SCENARIOS = [
+    {},
+    {'fuel': 'gnc'},
+    {'brand': 'YPF'},
+    {'fuel': 'gnc', 'province': 'CORDOBA'},
+    {'brand': ['PUMA', 'GULF'], 'province': 'BUENOS AIRES'},
+    {'fuel': 'glp'},
+]
+
+
+def replicate(pois: dict, times: int, rng: np.random.Generator) -> dict:
+    """Copias de las estaciones desplazadas ~5 km, para probar datasets más grandes."""
+    gas = np.flatnonzero(pois['type'] == 'gas')
+    n = len(gas) * times
+    idx = np.tile(gas, times)
+    return {
+        'lon': pois['lon'][idx] + rng.normal(0, 0.05, n),
+        'lat': pois['lat'][idx] + rng.normal(0, 0.05, n),
+        'type': pois['type'][idx],
+        'props': [pois['props'][i] for i in idx],
+    }
+
+
+def query_positions(index: NearestStations, n: int, spread: float, rng: np.random.Generator):
+    near = int(n * 0.8)
+    i = rng.integers(len(index), size=near)
+    lon = np.concatenate([index.lon[i] + rng.normal(0, spread, near), rng.uniform(ARGENTINA[0], ARGENTINA[2], n - near)])
+    lat = np.concatenate([index.lat[i] + rng.normal(0, spread, near), rng.uniform(ARGENTINA[1], ARGENTINA[3], n - near)])
+    return lon, lat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la búsqueda de estaciones cercanas.')
+    parser.add_argument('--queries', type=int, default=5000, help='Posiciones por lote')
+    parser.add_argument('--brute-queries', type=int, default=500, help='Posiciones a verificar por fuerza bruta')
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--spread', type=float, default=0.3, help='Desvío de las posiciones respecto de las estaciones (grados)')
+    parser.add_argument('--replicate', type=int, default=1, help='Multiplicar el dataset')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    pois = load_merged_pois()
+    if args.replicate > 1:
+        pois = replicate(pois, args.replicate, rng)
+
+    t0 = time.perf_counter()
+    index = NearestStations(pois)
+    build = time.perf_counter() - t0
+    print(f"Estaciones: {len(index)}, construcción del índice: {build * 1000:.1f} ms")
+    lon, lat = query_positions(index, args.queries, args.spread, rng)
+    check = min(args.brute_queries, args.queries)
+
+    print(f"\n{'filtro':<45} {'grilla ms':>9} {'µs/cons':>8} {'bruta µs':>9} {'acel.':>7}  resultado")
+    for filters in SCENARIOS:
+        t0 = time.perf_counter()
+        index.query_batch(lon[:1], lat[:1], args.k, **filters)
+        grid_ms = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        ids, km = index.query_batch(lon, lat, args.k, **filters)
+        per_query = (time.perf_counter() - t0) / args.queries
+
+        t0 = time.perf_counter()
+        expected_ids, expected_km = brute_force_nearest(index, lon[:check], lat[:check], args.k, **filters)
+        brute = (time.perf_counter() - t0) / check
+
+        same = np.array_equal(ids[:check], expected_ids) and np.allclose(km[:check], expected_km)
+        label = ', '.join(f'{k}={v}' for k, v in filters.items()) or '(sin filtro)'
+        print(f"{label:<45} {grid_ms:9.1f} {per_query * 1e6:8.1f} {brute * 1e6:9.1f} "
+              f"{brute / max(per_query, 1e-12):6.1f}x  {'OK' if same else 'DIFERENTE'}")
+
+
+if __name__ == '__main__':
+    main()
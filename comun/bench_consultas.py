@@ -0,0 +1,193 @@
+"""
+Prueba de carga de servidor_consultas.py en localhost: latencia p50/p99.
+
+Levanta el servidor en un proceso aparte (o usa --url) y lo consulta con N
+clientes concurrentes, cada uno con su conexión keep-alive. Las consultas
+imitan a un mapa real: una vista de 1280x800 px centrada en un POI al azar, con
+zoom entre 4 y 16 (más peso en los zooms de ciudad), a veces filtrando por tipo
+y a veces revalidando con If-None-Match una vista ya vista (como el navegador al
+volver a una zona).
+
+    python comun/bench_consultas.py --concurrency 32 --duration 10
+    python comun/bench_consultas.py --url http://127.0.0.1:8090 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from servidor_consultas import SNAPSHOT_FILE, load_index
+
+VIEWPORT = (1280, 800)
+TILE_SIZE = 512
+ZOOMS = np.arange(4, 17)
+ZOOM_WEIGHTS = np.array([1, 1, 2, 2, 3, 4, 5, 6, 6, 5, 4, 3, 2], dtype=float)
+FILTER_SETS = [None, None, None, 'gas', 'camera', 'gas:gnc', 'camera:speed', 'gas:gnc,camera:speed']
+REVALIDATE_RATE = 0.3
+STARTUP_TIMEOUT = 30
+
+
+def viewport_bbox(lon: float, lat: float, zoom: int):
+    """BBOX de una vista de VIEWPORT px centrada en (lon, lat)."""
+    world = TILE_SIZE * (1 << zoom)
+    half_lon = VIEWPORT[0] / 2 / world * 360.0
+    half_lat = VIEWPORT[1] / 2 / world * 360.0 * np.cos(np.radians(lat))
+    return lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat
+
+
+def make_queries(lon, lat, n: int, seed: int = 0) -> list:
+    """n rutas /features?... con vistas centradas en POIs al azar."""
+    rng = np.random.default_rng(seed)
+    centers = rng.integers(len(lon), size=n)
+    zooms = rng.choice(ZOOMS, size=n, p=ZOOM_WEIGHTS / ZOOM_WEIGHTS.sum())
+    filters = rng.integers(len(FILTER_SETS), size=n)
+    queries = []
+    for i, z, f in zip(centers, zooms, filters):
+        bbox = viewport_bbox(lon[i], lat[i], int(z))
+        path = '/features?bbox=' + ','.join(f'{v:.5f}' for v in bbox) + f'&zoom={z}'
+        if FILTER_SETS[f]:
+            path += '&types=' + FILTER_SETS[f]
+        queries.append(path)
+    return queries
+
+
+async def _request(reader, writer, host, path, etag=None):
+    headers = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\n'
+    if etag:
+        headers += f'If-None-Match: {etag}\r\n'
+    writer.write((headers + '\r\n').encode('latin-1'))
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length, tag = 0, None
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'etag':
+            tag = value.strip()
+    body = await reader.readexactly(length) if length else b''
+    return status, len(body), tag
+
+
+async def _client(host, port, queries, deadline, rng, latencies, statuses, sizes):
+    reader, writer = await asyncio.open_connection(host, port)
+    seen = []
+    try:
+        while time.perf_counter() < deadline:
+            if seen and rng.random() < REVALIDATE_RATE:
+                path, etag = seen[rng.integers(len(seen))]
+            else:
+                path, etag = queries[rng.integers(len(queries))], None
+            t0 = time.perf_counter()
+            status, size, tag = await _request(reader, writer, f'{host}:{port}', path, etag)
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+            sizes.append(size)
+            if tag and etag is None:
+                seen.append((path, tag))
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, queries: list, concurrency: int, duration: float, seed: int = 0) -> dict:
+    latencies, sizes, statuses = [], [], {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, queries, deadline, np.random.default_rng(seed + c), latencies, statuses, sizes)
+        for c in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': len(ms),
+        'seconds': round(elapsed, 3),
+        'requests_per_s': round(len(ms) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3) if len(ms) else None,
+        'p90_ms': round(float(np.percentile(ms, 90)), 3) if len(ms) else None,
+        'p99_ms': round(float(np.percentile(ms, 99)), 3) if len(ms) else None,
+        'max_ms': round(float(ms.max()), 3) if len(ms) else None,
+        'mean_bytes': round(float(np.mean(sizes)), 1) if sizes else 0,
+        'status': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(snapshot: str):
+    """Arranca servidor_consultas.py en otro proceso y espera a que responda /health."""
+    port = _free_port()
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'servidor_consultas.py')
+    proc = subprocess.Popen([sys.executable, script, '--snapshot', snapshot, '--port', str(port)],
+                            stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            with urlopen(url + '/health', timeout=1):
+                return proc, url
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError('servidor_consultas.py terminó al arrancar')
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'servidor_consultas.py no respondió en {STARTUP_TIMEOUT} s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del servidor de consultas (p50/p99).')
+    parser.add_argument('--url', default=None, help='Servidor ya levantado (default: se arranca uno)')
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE)
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8, 32], help='Clientes simultáneos')
+    parser.add_argument('--duration', type=float, default=5.0, help='Segundos por nivel de concurrencia')
+    parser.add_argument('--queries', type=int, default=2000, help='Vistas distintas a sortear')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='Guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    index = load_index(args.snapshot)
+    queries = make_queries(index.lon, index.lat, args.queries, args.seed)
+
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(args.snapshot)
+    parts = urlsplit(url)
+    results = []
+    try:
+        print(f"{'clientes':>8} {'consultas':>10} {'cons/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'máx ms':>8}  estados")
+        for c in args.concurrency:
+            r = asyncio.run(run_load(parts.hostname, parts.port, queries, c, args.duration, args.seed))
+            results.append(r)
+            print(f"{c:>8} {r['requests']:>10} {r['requests_per_s']:>9.0f} {r['p50_ms']:>8.2f} "
+                  f"{r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}  {r['status']}")
+        with urlopen(url + '/health', timeout=5) as resp:
+            print(f"Servidor: {json.load(resp)}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'queries': args.queries, 'results': results}, f, indent=2)
+        print(f"✓ Resultados guardados en: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark de corredor.CorridorIndex contra la búsqueda por fuerza bruta.
+
+Genera rutas sintéticas de ~1000 km (paseos aleatorios suaves con un vértice
+cada ~100 m, como las geometrías de OSRM) que cruzan zonas con POIs, verifica
+que el índice devuelve el mismo conjunto que la fuerza bruta y mide tiempos.
+
+    python comun/bench_corredor.py --routes 5 --length 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from corredor import CorridorIndex, KM_PER_DEG, brute_force_query
+from poi_data import load_merged_pois
+
+
+def synthetic_route(rng: np.random.Generator, start, length_km: float = 1000.0, step_km: float = 0.1):
+    """Paseo aleatorio con rumbo suavizado de length_km kilómetros desde start (lon, lat)."""
+    n = int(length_km / step_km)
+    heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.02, n))
+    lat = np.empty(n + 1)
+    lon = np.empty(n + 1)
+    lon[0], lat[0] = start
+    dlat = step_km * np.cos(heading) / KM_PER_DEG
+    lat[1:] = lat[0] + np.cumsum(dlat)
+    dlon = step_km * np.sin(heading) / (KM_PER_DEG * np.cos(np.radians(lat[:-1])))
+    lon[1:] = lon[0] + np.cumsum(dlon)
+    return np.column_stack([lon, lat])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del índice de corredor.')
+    parser.add_argument('--routes', type=int, default=5)
+    parser.add_argument('--length', type=float, default=1000.0, help='Largo de cada ruta en km')
+    parser.add_argument('--radius', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    pois = load_merged_pois()
+    rng = np.random.default_rng(args.seed)
+
+    t0 = time.perf_counter()
+    index = CorridorIndex(pois)
+    build = time.perf_counter() - t0
+    print(f"POIs: {len(pois['lon'])}, construcción del índice: {build * 1000:.1f} ms")
+
+    t_index = t_brute = 0.0
+    for r in range(args.routes):
+        # Arrancar desde un POI al azar para que la ruta atraviese zonas pobladas
+        i = rng.integers(len(pois['lon']))
+        route = synthetic_route(rng, (pois['lon'][i], pois['lat'][i]), args.length)
+
+        t0 = time.perf_counter()
+        result = index.query(route, radius_km=args.radius)
+        t_index += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        expected = brute_force_query(pois, route, radius_km=args.radius)
+        t_brute += time.perf_counter() - t0
+
+        got = sorted(h['index'] for h in result['hits'])
+        status = 'OK' if got == sorted(expected.tolist()) else 'DIFERENTE'
+        print(f"ruta {r}: {len(route) - 1} segmentos, {len(got)} aciertos {result['counts']} [{status}]")
+
+    print(f"\nÍndice:       {t_index / args.routes * 1000:8.1f} ms por ruta")
+    print(f"Fuerza bruta: {t_brute / args.routes * 1000:8.1f} ms por ruta")
+    print(f"Aceleración:  {t_brute / max(t_index, 1e-9):8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
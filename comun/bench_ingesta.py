@@ -0,0 +1,362 @@
+"""
+Benchmark de las etapas de ingesta sobre datos sintéticos (ver sinteticos.py).
+
+Para cada tamaño (1k a 1M registros) genera las fuentes de forma determinista
+y corre cada etapa en un proceso nuevo, midiendo sólo el trabajo de la etapa:
+registros por segundo, pico de memoria residente (RSS) y tamaño de la salida.
+Todo corre sin red: el WFS lo sirve mock_wfs.py y Nominatim fake_geocoder.py,
+ambos en hilos de este proceso.
+
+Etapas:
+  wfs       extraer_wfs.extract_wfs_data paginando el WFS + Parquet 'estaciones'
+  dbf       read_dbf_records + read_points + build_features + Parquet 'caba_full_data'
+  pba       medidores_stream.extract (extract_cameras) de la página PBA a GeoJSON
+  geocode   geocode_speedcameras.py contra el geocodificador falso, sin caché previa
+  merge     merge_cameras.merge de las cuatro fuentes, sin estado previo
+  geojson   geojson_writer.write_point_collection
+  json      geojson_writer.write_records
+
+Los resultados quedan en JSON; con --baseline se comparan contra una corrida
+anterior y se marcan las regresiones de throughput o de memoria:
+
+    python comun/bench_ingesta.py --sizes 1k 10k 100k
+    python comun/bench_ingesta.py --sizes 10k --baseline dist/bench/base.json --fail-on-regression
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COMUN = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(COMUN)
+FOTOMULTAS = os.path.join(ROOT, 'fotomultas')
+ESTACIONES = os.path.join(ROOT, 'estaciones de servicio')
+for _path in (COMUN, FOTOMULTAS, ESTACIONES):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+import sinteticos
+
+STAGES = ['wfs', 'dbf', 'pba', 'geocode', 'merge', 'geojson', 'json']
+DEFAULT_SIZES = ['1k', '10k', '100k']
+DEFAULT_OUT = os.path.join(ROOT, 'dist', 'bench', 'ingesta.json')
+DEFAULT_TOLERANCE = 0.2
+RESULTS_VERSION = 1
+WFS_LAYER = 'res1104_mmino_eess'
+CABA_DBF = os.path.join('caba', 'camaras-fijas-de-control-vehicular.dbf')
+STAGE_TIMEOUT = 3600
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '1m' -> 1000000, '2500' -> 2500"""
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor > 1 else text) * factor)
+
+
+def peak_rss_mb():
+    """Pico de RSS del proceso en MB (None donde no hay getrusage)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+# --- Preparación de entradas (proceso principal) ---------------------------------
+
+def prepare(stage: str, workdir: str, n: int, seed: int, servers: dict) -> int:
+    """Genera lo que necesita `stage` en workdir (si falta) y devuelve los bytes de entrada."""
+    pba = os.path.join(workdir, 'MEDIDORESPBA.HTML')
+    dbf = os.path.join(workdir, CABA_DBF)
+    cinemometros = os.path.join(workdir, 'cinemometros.csv')
+    geocoded = os.path.join(workdir, 'cinemometros_geocoded.parquet')
+    caba_csv = os.path.join(workdir, 'camaras-fijas-de-control-vehicular.csv')
+
+    if stage == 'wfs':
+        from mock_wfs import CannedLayer
+        members = sinteticos.gml_layer(n, WFS_LAYER, seed)
+        coords = zip(*sinteticos.points(n, seed))
+        servers['wfs'].layers[WFS_LAYER] = CannedLayer.from_members(members, coords)
+        return sum(len(m) for m in members)
+    if stage in ('dbf', 'merge') and not os.path.exists(dbf):
+        os.makedirs(os.path.dirname(dbf), exist_ok=True)
+        sinteticos.write_shapefile(os.path.splitext(dbf)[0], n, seed)
+    if stage in ('pba', 'merge') and not os.path.exists(pba):
+        sinteticos.pba_html(pba, n, seed)
+    if stage == 'geocode' and not os.path.exists(cinemometros):
+        sinteticos.cinemometros_rows(n, seed).to_csv(cinemometros, index=False)
+    if stage == 'merge':
+        from intermedios import write_table
+        if not os.path.exists(geocoded):
+            write_table(sinteticos.cinemometros_rows(n, seed, locate=True), geocoded, 'cinemometros_geocoded')
+        if not os.path.exists(caba_csv):
+            sinteticos.caba_csv(caba_csv, n, seed)
+        return _size(pba) + _size(dbf) + _size(geocoded) + _size(caba_csv)
+    return {'dbf': _size(dbf), 'pba': _size(pba), 'geocode': _size(cinemometros)}.get(stage, 0)
+
+
+# --- Etapas (proceso hijo) ---------------------------------------------------------
+
+def stage_wfs(workdir, n, args):
+    import pandas as pd
+    from extraer_wfs import extract_wfs_data
+    from intermedios import write_table
+    out = os.path.join(workdir, 'estaciones.parquet')
+    df = extract_wfs_data(WFS_LAYER, streaming=True, page_size=args.page_size, base_url=args.wfs)
+    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
+    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
+    write_table(df, out, 'estaciones')
+    return len(df), out
+
+
+def stage_dbf(workdir, n, args):
+    import pandas as pd
+    from intermedios import write_table
+    from process_caba_dbf import read_dbf_records, read_points, build_features
+    path = os.path.join(workdir, CABA_DBF)
+    out = os.path.join(workdir, 'caba_full_data.parquet')
+    records, columns = read_dbf_records(path)
+    features = build_features(records, read_points(path))
+    write_table(pd.DataFrame(records, columns=columns), out, 'caba_full_data')
+    return len(features), out
+
+
+def stage_pba(workdir, n, args):
+    from medidores_stream import extract
+    out = os.path.join(workdir, 'pba.geojson')
+    return extract(os.path.join(workdir, 'MEDIDORESPBA.HTML'), out), out
+
+
+def stage_geocode(workdir, n, args):
+    import geocode_speedcameras
+    cache = os.path.join(workdir, 'geocode_cache.sqlite')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(cache + suffix):
+            os.remove(cache + suffix)
+    sys.argv = ['geocode_speedcameras.py', '--provider', 'nominatim-local', '--domain', args.geocoder,
+                '--rate', '100000', '--workers', '16', '--cache', cache, '--no-shared-sources']
+    geocode_speedcameras.main()
+    return n, os.path.join(workdir, geocode_speedcameras.OUTPUT_TABLE)
+
+
+def stage_merge(workdir, n, args):
+    import json as _json
+    from merge_cameras import merge
+    state = os.path.join(workdir, 'speed_cameras.state.json')
+    out = os.path.join(workdir, 'speed_cameras.geojson')
+    for path in (state, out):
+        if os.path.exists(path):
+            os.remove(path)
+    merge(state_file=state, output=out)
+    with open(out, 'r', encoding='utf-8') as f:
+        return len(_json.load(f)['features']), out
+
+
+def stage_geojson(workdir, n, args, df=None):
+    from geojson_writer import write_point_collection
+    out = os.path.join(workdir, 'puntos.geojson')
+    props = df.drop(columns=['lat', 'lon'])
+    return write_point_collection(out, df['lon'], df['lat'], props), out
+
+
+def stage_json(workdir, n, args, df=None):
+    from geojson_writer import write_records
+    out = os.path.join(workdir, 'registros.json')
+    return write_records(out, df), out
+
+
+STAGE_FUNCS = {
+    'wfs': stage_wfs, 'dbf': stage_dbf, 'pba': stage_pba, 'geocode': stage_geocode,
+    'merge': stage_merge, 'geojson': stage_geojson, 'json': stage_json,
+}
+
+
+def run_child(args):
+    """Corre una etapa y escribe su medición en args.result."""
+    workdir = os.path.abspath(args.dir)
+    func = STAGE_FUNCS[args.child]
+    extra = {}
+    if args.child in ('geojson', 'json'):
+        # Los datos en memoria se arman antes de medir
+        extra['df'] = sinteticos.cinemometros_rows(args.size, args.seed, locate=True)
+    # Imports de la etapa fuera del tiempo medido
+    if args.child == 'geocode':
+        import geocode_speedcameras  # noqa: F401
+    elif args.child == 'merge':
+        import merge_cameras  # noqa: F401
+    base_rss = peak_rss_mb()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        start = time.perf_counter()
+        records, output = func(workdir, args.size, args, **extra)
+        seconds = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    with open(args.result, 'w', encoding='utf-8') as f:
+        json.dump({'records': records, 'seconds': seconds, 'peak_rss_mb': peak_rss_mb(),
+                   'base_rss_mb': base_rss, 'output_bytes': _size(output)}, f)
+
+
+# --- Runner ------------------------------------------------------------------------
+
+def start_servers() -> dict:
+    from mock_wfs import start_mock_wfs
+    from fake_geocoder import start_fake_geocoder
+    return {'wfs': start_mock_wfs({}), 'geocoder': start_fake_geocoder()}
+
+
+def run_stage(stage: str, workdir: str, n: int, seed: int, servers: dict, page_size: int, verbose: bool) -> dict:
+    result_file = os.path.join(workdir, f'.{stage}.result.json')
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', stage, '--dir', workdir,
+           '--size', str(n), '--seed', str(seed), '--result', result_file,
+           '--wfs', servers['wfs'].base_url, '--geocoder', servers['geocoder'].domain,
+           '--page-size', str(page_size)]
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    proc = subprocess.run(cmd, env=env, timeout=STAGE_TIMEOUT,
+                          stdout=None if verbose else subprocess.DEVNULL,
+                          stderr=None if verbose else subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{stage} ({n}) falló:\n{(proc.stderr or '')[-2000:]}")
+    with open(result_file, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    os.remove(result_file)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: list, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    Compara contra otra corrida. Es regresión si el throughput cae más de
+    `tolerance` o el pico de RSS crece más de `tolerance`.
+
+    Returns:
+        Una entrada por (etapa, tamaño) presente en ambas corridas
+    """
+    base = {(r['stage'], r['size']): r for r in baseline.get('results', [])}
+    rows = []
+    for r in results:
+        b = base.get((r['stage'], r['size']))
+        if b is None:
+            continue
+        speed = r['records_per_s'] / b['records_per_s'] if b['records_per_s'] else None
+        memory = (r['peak_rss_mb'] / b['peak_rss_mb']) if r.get('peak_rss_mb') and b.get('peak_rss_mb') else None
+        regression = (speed is not None and speed < 1 - tolerance) or (memory is not None and memory > 1 + tolerance)
+        rows.append({'stage': r['stage'], 'size': r['size'], 'speed_ratio': speed,
+                     'rss_ratio': memory, 'regression': regression})
+    return rows
+
+
+def print_results(results):
+    print(f"\n{'etapa':<8} {'registros':>10} {'seg':>8} {'reg/s':>12} {'RSS MB':>8} {'entrada MB':>11} {'salida MB':>10}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:8.1f}" if r['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{r['stage']:<8} {r['size']:>10} {r['seconds']:8.2f} {r['records_per_s']:12.0f} {rss} "
+              f"{r['input_bytes'] / 1e6:11.2f} {r['output_bytes'] / 1e6:10.2f}")
+
+
+def print_comparison(rows, tolerance):
+    print(f"\nComparación con la línea de base (tolerancia {tolerance:.0%}):")
+    for row in rows:
+        speed = f"{row['speed_ratio']:.2f}x" if row['speed_ratio'] is not None else '-'
+        rss = f"{row['rss_ratio']:.2f}x" if row['rss_ratio'] is not None else '-'
+        flag = '  ⚠ REGRESIÓN' if row['regression'] else ''
+        print(f"  {row['stage']:<8} {row['size']:>10}  throughput {speed:>7}  RSS {rss:>7}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las etapas de ingesta con datos sintéticos.')
+    parser.add_argument('--stages', nargs='*', default=STAGES, choices=STAGES)
+    parser.add_argument('--sizes', nargs='*', default=DEFAULT_SIZES, help='Registros por fuente (1k, 10k, 100k, 1m...)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=DEFAULT_OUT, help='JSON de resultados')
+    parser.add_argument('--baseline', default=None, help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Caída de throughput / aumento de RSS tolerados (default {DEFAULT_TOLERANCE})')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Salir con código 1 si hay regresiones')
+    parser.add_argument('--workdir', default=None, help='Directorio para los datos generados (default temporal)')
+    parser.add_argument('--page-size', type=int, default=1000, help='maxFeatures por página del WFS')
+    parser.add_argument('--verbose', action='store_true', help='Mostrar la salida de cada etapa')
+    # Uso interno: una etapa en el proceso hijo
+    parser.add_argument('--child', choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    parser.add_argument('--wfs', help=argparse.SUPPRESS)
+    parser.add_argument('--geocoder', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    root = args.workdir or tempfile.mkdtemp(prefix='bench-ingesta-')
+    servers = start_servers()
+    results = []
+    try:
+        for n in (parse_size(s) for s in args.sizes):
+            workdir = os.path.join(root, str(n))
+            os.makedirs(workdir, exist_ok=True)
+            for stage in args.stages:
+                t0 = time.perf_counter()
+                input_bytes = prepare(stage, workdir, n, args.seed, servers)
+                generated = time.perf_counter() - t0
+                measured = run_stage(stage, workdir, n, args.seed, servers, args.page_size, args.verbose)
+                row = {'stage': stage, 'size': n, 'records': measured['records'],
+                       'seconds': round(measured['seconds'], 4),
+                       'records_per_s': round(n / measured['seconds'], 1) if measured['seconds'] else None,
+                       'peak_rss_mb': measured['peak_rss_mb'], 'base_rss_mb': measured['base_rss_mb'],
+                       'input_bytes': input_bytes, 'output_bytes': measured['output_bytes']}
+                results.append(row)
+                print(f"✓ {stage:<8} {n:>9}: {row['seconds']:.2f} s, {row['records_per_s']:.0f} reg/s "
+                      f"(generación {generated:.1f} s)", flush=True)
+    finally:
+        for server in servers.values():
+            server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_results(results)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump({'version': RESULTS_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'commit': git_commit(), 'python': platform.python_version(),
+                   'platform': platform.platform(), 'seed': args.seed, 'results': results}, f, indent=2)
+    print(f"\n✓ Resultados guardados en: {args.out}")
+
+    if baseline is not None:
+        rows = compare(results, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        if args.fail_on_regression and any(r['regression'] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Consulta de corredor de ruta: qué POIs quedan a menos de N km de un recorrido.
+
+Reemplaza el análisis de ruta de test1.html (turf.buffer de 0.5 km + pointsWithinPolygon
+sobre todo globalMergedData + turf.distance por acierto), que es O(vértices x POIs).
+Acá los POIs se indexan una vez en una grilla regular (CSR: celdas ordenadas más
+rangos), cada segmento de la ruta sólo mira las celdas que toca su BBOX expandido,
+y las distancias punto-segmento se calculan vectorizadas sobre los pares candidatos.
+
+    index = CorridorIndex(load_merged_pois())   # o POIStore(path).as_pois()
+    result = index.query(route_coords, radius_km=0.5)
+    result['counts'], result['hits'], result['nearest']
+
+    python comun/corredor.py ruta_osrm.json --radius 0.5
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from almacen_poi import load_pois
+from poi_data import TYPES, GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+KM_PER_DEG = 111.32
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEG = 0.05
+DEFAULT_RADIUS_KM = 0.5
+MIN_NEAREST_KM = 0.1
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Distancia de gran círculo en km (vectorizada, con broadcasting)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray):
+    """Para rangos [start, start+count) devuelve (índice de rango, valor) de todos sus elementos."""
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, starts[owner] + offsets
+
+
+class CorridorIndex:
+    """
+    Índice de grilla sobre los POIs combinados para consultas de corredor.
+
+    Args:
+        pois: Resultado de poi_data.load_merged_pois
+        cell_deg: Lado de la celda de la grilla en grados
+    """
+
+    def __init__(self, pois: dict, cell_deg: float = CELL_DEG):
+        self.lon = np.asarray(pois['lon'], dtype=float)
+        self.lat = np.asarray(pois['lat'], dtype=float)
+        self.types = np.asarray(pois['type'], dtype=object)
+        self.props = pois.get('props')
+        self.cell_deg = cell_deg
+        self.origin = (float(self.lon.min()) if len(self.lon) else 0.0,
+                       float(self.lat.min()) if len(self.lat) else 0.0)
+        cx, cy = self._cells(self.lon, self.lat)
+        self.ny = int(cy.max()) + 1 if len(cy) else 1
+        keys = cx * self.ny + cy
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _cells(self, lon, lat):
+        cx = np.floor((np.asarray(lon) - self.origin[0]) / self.cell_deg).astype(np.int64)
+        cy = np.floor((np.asarray(lat) - self.origin[1]) / self.cell_deg).astype(np.int64)
+        return cx, cy
+
+    def _candidate_pairs(self, ax, ay, bx, by, radius_km):
+        """Pares (punto, segmento) cuyos puntos caen en celdas tocadas por el BBOX expandido del segmento."""
+        mid_lat = np.radians((ay + by) / 2)
+        pad_lat = radius_km / KM_PER_DEG
+        pad_lon = radius_km / (KM_PER_DEG * np.maximum(np.cos(mid_lat), 1e-6))
+        x0, y0 = self._cells(np.minimum(ax, bx) - pad_lon, np.minimum(ay, by) - pad_lat)
+        x1, y1 = self._cells(np.maximum(ax, bx) + pad_lon, np.maximum(ay, by) + pad_lat)
+        y0 = np.clip(y0, 0, self.ny - 1)
+        y1 = np.clip(y1, -1, self.ny - 1)
+        x0 = np.maximum(x0, 0)
+
+        nx = np.maximum(x1 - x0 + 1, 0)
+        nyc = np.maximum(y1 - y0 + 1, 0)
+        seg, flat = _expand_ranges(np.zeros(len(ax), dtype=np.int64), nx * nyc)
+        cell_x = x0[seg] + flat // np.maximum(nyc[seg], 1)
+        cell_y = y0[seg] + flat % np.maximum(nyc[seg], 1)
+        keys = cell_x * self.ny + cell_y
+
+        lo = np.searchsorted(self.sorted_keys, keys, side='left')
+        hi = np.searchsorted(self.sorted_keys, keys, side='right')
+        pair_owner, pos = _expand_ranges(lo, hi - lo)
+        return self.order[pos], seg[pair_owner]
+
+    def query(self, route, radius_km: float = DEFAULT_RADIUS_KM, start=None,
+              min_nearest_km: float = MIN_NEAREST_KM, types=None) -> dict:
+        """
+        POIs a menos de radius_km de la ruta.
+
+        Args:
+            route: Secuencia de (lon, lat) del recorrido (p.ej. geometry.coordinates de OSRM)
+            radius_km: Ancho del corredor a cada lado
+            start: (lon, lat) desde donde medir 'nearest' (default: primer vértice)
+            min_nearest_km: Distancia mínima desde start para considerar un POI como 'nearest'
+            types: Tipos a considerar (default: todos)
+
+        Returns:
+            dict con 'counts' (por tipo), 'hits' (ordenados a lo largo de la ruta con
+            distance_km a la ruta, chainage_km y start_km) y 'nearest' (o None)
+        """
+        coords = np.asarray(route, dtype=float).reshape(-1, 2)
+        empty = {'counts': {t: 0 for t in TYPES}, 'hits': [], 'nearest': None}
+        if len(coords) == 0 or len(self.lon) == 0:
+            return empty
+        if len(coords) == 1:
+            coords = np.vstack([coords, coords])
+
+        ax, ay = coords[:-1, 0], coords[:-1, 1]
+        bx, by = coords[1:, 0], coords[1:, 1]
+        pts, segs = self._candidate_pairs(ax, ay, bx, by, radius_km)
+        if types is not None:
+            keep = np.isin(self.types[pts], list(types))
+            pts, segs = pts[keep], segs[keep]
+        if len(pts) == 0:
+            return empty
+
+        # Proyección equirectangular local por segmento (km)
+        k_lon = KM_PER_DEG * np.cos(np.radians((ay + by) / 2))
+        sx = (bx - ax) * k_lon
+        sy = (by - ay) * KM_PER_DEG
+        seg_len = np.hypot(sx, sy)
+        chain_start = np.concatenate(([0.0], np.cumsum(seg_len)[:-1]))
+
+        px = (self.lon[pts] - ax[segs]) * k_lon[segs]
+        py = (self.lat[pts] - ay[segs]) * KM_PER_DEG
+        len2 = seg_len[segs] ** 2
+        t = np.where(len2 > 0, (px * sx[segs] + py * sy[segs]) / np.where(len2 > 0, len2, 1), 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        dist = np.hypot(px - t * sx[segs], py - t * sy[segs])
+        chain = chain_start[segs] + t * seg_len[segs]
+
+        within = dist <= radius_km
+        pts, dist, chain = pts[within], dist[within], chain[within]
+        if len(pts) == 0:
+            return empty
+
+        # Un POI puede aparecer en varios segmentos: quedarse con el más cercano
+        order = np.lexsort((dist, pts))
+        pts, dist, chain = pts[order], dist[order], chain[order]
+        first = np.concatenate(([True], pts[1:] != pts[:-1]))
+        pts, dist, chain = pts[first], dist[first], chain[first]
+
+        along = np.argsort(chain, kind='stable')
+        pts, dist, chain = pts[along], dist[along], chain[along]
+
+        sx0, sy0 = start if start is not None else coords[0]
+        from_start = haversine_km(sx0, sy0, self.lon[pts], self.lat[pts])
+
+        hit_types = self.types[pts]
+        counts = {t: int(np.count_nonzero(hit_types == t)) for t in TYPES}
+        hits = [{
+            'index': int(i),
+            'type': hit_types[j],
+            'lon': float(self.lon[i]),
+            'lat': float(self.lat[i]),
+            'distance_km': float(dist[j]),
+            'chainage_km': float(chain[j]),
+            'start_km': float(from_start[j]),
+        } for j, i in enumerate(pts)]
+
+        nearest = None
+        beyond = np.flatnonzero(from_start > min_nearest_km)
+        if len(beyond):
+            nearest = hits[int(beyond[np.argmin(from_start[beyond])])]
+
+        return {'counts': counts, 'hits': hits, 'nearest': nearest}
+
+
+def brute_force_query(pois: dict, route, radius_km: float = DEFAULT_RADIUS_KM, chunk: int = 256) -> np.ndarray:
+    """
+    Referencia O(POIs x segmentos): índices de los POIs dentro del corredor.
+    Sirve para validar y medir CorridorIndex.
+    """
+    coords = np.asarray(route, dtype=float).reshape(-1, 2)
+    ax, ay = coords[:-1, 0], coords[:-1, 1]
+    bx, by = coords[1:, 0], coords[1:, 1]
+    k_lon = KM_PER_DEG * np.cos(np.radians((ay + by) / 2))
+    sx, sy = (bx - ax) * k_lon, (by - ay) * KM_PER_DEG
+    len2 = np.where(sx * sx + sy * sy > 0, sx * sx + sy * sy, 1.0)
+    lon, lat = np.asarray(pois['lon']), np.asarray(pois['lat'])
+    best = np.full(len(lon), np.inf)
+    for s in range(0, len(lon), chunk):
+        px = (lon[s:s + chunk, None] - ax) * k_lon
+        py = (lat[s:s + chunk, None] - ay) * KM_PER_DEG
+        t = np.clip((px * sx + py * sy) / len2, 0, 1)
+        best[s:s + chunk] = np.hypot(px - t * sx, py - t * sy).min(axis=1)
+    return np.flatnonzero(best <= radius_km)
+
+
+def load_route(path: str):
+    """Lee una ruta desde una respuesta OSRM, un GeoJSON LineString/Feature o una lista de [lon, lat]."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        if 'routes' in data:
+            data = data['routes'][0]['geometry']
+        elif data.get('type') == 'FeatureCollection':
+            data = data['features'][0]['geometry']
+        elif data.get('type') == 'Feature':
+            data = data['geometry']
+        data = data['coordinates']
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='POIs dentro del corredor de una ruta.')
+    parser.add_argument('route', help='Ruta OSRM / GeoJSON LineString / lista de [lon, lat]')
+    parser.add_argument('--radius', type=float, default=DEFAULT_RADIUS_KM, help='Radio del corredor en km')
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    parser.add_argument('--store', default=None, help='Almacén de POIs (almacen_poi.py) en lugar de los GeoJSON')
+    args = parser.parse_args()
+
+    index = CorridorIndex(load_pois(args.store, args.gas, args.cameras, args.villas))
+    result = index.query(load_route(args.route), radius_km=args.radius)
+    print(json.dumps({'counts': result['counts'], 'nearest': result['nearest'],
+                      'hits': len(result['hits'])}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
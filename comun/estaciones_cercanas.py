@@ -0,0 +1,307 @@
+"""
+Búsqueda de las k estaciones de servicio más cercanas, con filtros de combustible, bandera y provincia.
+
+Responde "la estación con GNC más cercana" sin mirar el mapa. Los filtros se
+aplican antes de buscar, no después:
+
+- las estaciones se ordenan por categoría (combinación de combustibles,
+  empresabandera y provincia), así un filtro se resuelve como un puñado de
+  rangos contiguos sin recorrer las que no lo cumplen
+- sobre ese subconjunto se arma una grilla regular (CSR, como en corredor.py)
+  con celdas del tamaño justo para su densidad; las grillas por filtro quedan
+  en un LRU
+
+Las consultas van en lote y vectorizadas: todas las posiciones miran a la vez
+el bloque de celdas que las rodea, las distancias son de gran círculo
+(haversine) y una posición queda resuelta cuando su k-ésima distancia no supera
+la distancia mínima a cualquier punto fuera del bloque; las que no, repiten con
+un bloque que alcance esa k-ésima distancia (o del doble de lado si todavía no
+juntaron k candidatas). El resultado es exacto, igual al de la fuerza
+bruta (ver bench_cercanas.py).
+
+    index = NearestStations(load_merged_pois())
+    index.query(-58.38, -34.60, k=3, fuel='gnc')
+    ids, km = index.query_batch(lons, lats, k=5, brand='YPF', province='CORDOBA')
+
+    python comun/estaciones_cercanas.py -58.38 -34.60 --fuel gnc -k 3
+"""
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from almacen_poi import load_pois
+from corredor import EARTH_RADIUS_KM, haversine_km, _expand_ranges
+from poi_data import GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+# Combustible -> texto que lo delata en tipooperador (en minúsculas)
+FUELS = {'gnc': 'gnc', 'liquid': 'líquido', 'glp': 'glp'}
+FUEL_BITS = {fuel: 1 << i for i, fuel in enumerate(FUELS)}
+KM_PER_DEG_LAT = EARTH_RADIUS_KM * np.pi / 180
+POINTS_PER_CELL = 0.25   # promedio sobre el BBOX: casi todo el país son celdas vacías
+MIN_CELL_DEG = 0.005
+MAX_CELL_DEG = 5.0
+GRID_CACHE = 64
+DEFAULT_K = 5
+RESULT_FIELDS = ('empresabandera', 'tipooperador', 'razonsocial', 'direccion', 'localidad', 'provincia')
+
+
+def fuel_mask(tipooperador) -> int:
+    """Bits de FUEL_BITS de los combustibles que vende una estación según tipooperador."""
+    text = tipooperador.lower() if isinstance(tipooperador, str) else ''
+    return sum(bit for fuel, bit in FUEL_BITS.items() if FUELS[fuel] in text)
+
+
+def _as_set(value):
+    if value is None:
+        return None
+    values = [value] if isinstance(value, str) else list(value)
+    return frozenset(v.strip().upper() for v in values)
+
+
+class _Grid:
+    """Grilla regular sobre un subconjunto de estaciones (ids en el orden del índice)."""
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, ids: np.ndarray, points_per_cell: float = POINTS_PER_CELL):
+        self.lon0, self.lat0 = float(lon.min()), float(lat.min())
+        span = max((float(lon.max()) - self.lon0) * (float(lat.max()) - self.lat0), MIN_CELL_DEG ** 2)
+        self.cell = float(np.clip(np.sqrt(span * points_per_cell / len(ids)), MIN_CELL_DEG, MAX_CELL_DEG))
+        cx = np.floor((lon - self.lon0) / self.cell).astype(np.int64)
+        cy = np.floor((lat - self.lat0) / self.cell).astype(np.int64)
+        self.nx, self.ny = int(cx.max()) + 1, int(cy.max()) + 1
+        keys = cx * self.ny + cy
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.lon = lon[order]
+        self.lat = lat[order]
+
+    def knn(self, qlon: np.ndarray, qlat: np.ndarray, k: int):
+        """
+        k vecinos exactos de cada posición.
+
+        Returns:
+            (ids, km) de forma (Q, k); -1 / inf donde hay menos de k estaciones
+        """
+        n_q = len(qlon)
+        best_ids = np.full((n_q, k), -1, dtype=np.int64)
+        best_km = np.full((n_q, k), np.inf)
+        qcx = np.floor((qlon - self.lon0) / self.cell).astype(np.int64)
+        qcy = np.floor((qlat - self.lat0) / self.cell).astype(np.int64)
+        pending = np.arange(n_q)
+        radius = np.ones(n_q, dtype=np.int64)   # bloque de (2r+1) x (2r+1) celdas
+        while len(pending):
+            cx, cy, r = qcx[pending], qcy[pending], radius[pending]
+            x0, x1 = np.maximum(cx - r, 0), np.minimum(cx + r, self.nx - 1)
+            y0, y1 = np.maximum(cy - r, 0), np.minimum(cy + r, self.ny - 1)
+            whole = (cx - r <= 0) & (cx + r >= self.nx - 1) & (cy - r <= 0) & (cy + r >= self.ny - 1)
+
+            # Columnas del bloque por consulta y, por columna, el rango de claves y0..y1
+            ncols = np.where((x1 >= x0) & (y1 >= y0), x1 - x0 + 1, 0)
+            col_owner, col = _expand_ranges(x0, ncols)
+            lo = np.searchsorted(self.keys, col * self.ny + y0[col_owner], side='left')
+            hi = np.searchsorted(self.keys, col * self.ny + y1[col_owner], side='right')
+            pair_col, pos = _expand_ranges(lo, hi - lo)
+            owner = col_owner[pair_col]
+            q = pending[owner]
+            km = haversine_km(qlon[q], qlat[q], self.lon[pos], self.lat[pos])
+
+            # Los k mejores por consulta (empates: el id menor)
+            order = np.lexsort((self.ids[pos], km, owner))
+            owner, pos, km = owner[order], pos[order], km[order]
+            start = np.searchsorted(owner, np.arange(len(pending)))
+            rank = np.arange(len(owner)) - start[owner]
+            top = rank < k
+            found = np.bincount(owner[top], minlength=len(pending))
+            kth = np.full(len(pending), np.inf)
+            full = top & (rank == k - 1)
+            kth[owner[full]] = km[full]
+
+            # Distancia mínima a cualquier punto fuera del bloque
+            dlat = np.minimum(qlat[pending] - (self.lat0 + (cy - r) * self.cell),
+                              self.lat0 + (cy + r + 1) * self.cell - qlat[pending])
+            dlon = np.minimum(qlon[pending] - (self.lon0 + (cx - r) * self.cell),
+                              self.lon0 + (cx + r + 1) * self.cell - qlon[pending])
+            guard_lon = EARTH_RADIUS_KM * np.arcsin(np.cos(np.radians(qlat[pending]))
+                                                    * np.sin(np.radians(np.minimum(dlon, 90.0))))
+            guard = np.minimum(dlat * KM_PER_DEG_LAT, guard_lon)
+            done = whole | ((found == k) & (kth <= guard))
+
+            keep = top & done[owner]
+            rows = pending[owner[keep]]
+            best_ids[rows, rank[keep]] = self.ids[pos[keep]]
+            best_km[rows, rank[keep]] = km[keep]
+            # Con k candidatos ya se sabe hasta dónde hay que mirar; si no, duplicar el bloque
+            cell_km = self.cell * KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(np.abs(qlat[pending]) + r * self.cell)), 0.01)
+            needed = np.ceil(np.minimum(kth, 1e5) / cell_km).astype(np.int64) + 1
+            radius[pending] = np.where(found == k, np.maximum(needed, r + 1), r * 2)
+            pending = pending[~done]
+        return best_ids, best_km
+
+
+class NearestStations:
+    """
+    Índice de vecinos más cercanos sobre las estaciones de servicio.
+
+    Args:
+        pois: Resultado de poi_data.load_merged_pois (o POIStore.as_pois); se usan las de type 'gas'
+        points_per_cell: Estaciones promedio por celda en las grillas
+    """
+
+    def __init__(self, pois: dict, points_per_cell: float = POINTS_PER_CELL):
+        gas = np.flatnonzero(np.asarray(pois['type']) == 'gas')
+        props = [pois['props'][i] for i in gas]
+        self.source_index = gas
+        self.props = props
+        fuel = np.array([fuel_mask(p.get('tipooperador')) for p in props], dtype=np.uint8)
+        self.brands, brand = np.unique([str(p.get('empresabandera') or '').upper() for p in props],
+                                       return_inverse=True)
+        self.provinces, province = np.unique([str(p.get('provincia') or '').upper() for p in props],
+                                             return_inverse=True)
+
+        # Categoría = (combustibles, bandera, provincia); las estaciones quedan ordenadas por categoría
+        table, category = np.unique(np.column_stack([fuel, brand, province]), axis=0, return_inverse=True)
+        category = category.ravel()
+        order = np.argsort(category, kind='stable')
+        self.order = order
+        self._position = np.empty_like(order)
+        self._position[order] = np.arange(len(order))
+        self.lon = np.asarray(pois['lon'], dtype=float)[gas][order]
+        self.lat = np.asarray(pois['lat'], dtype=float)[gas][order]
+        self.cat_fuel, self.cat_brand, self.cat_province = table[:, 0], table[:, 1], table[:, 2]
+        bounds = np.searchsorted(category[order], np.arange(len(table) + 1))
+        self.cat_start, self.cat_end = bounds[:-1], bounds[1:]
+        self.points_per_cell = points_per_cell
+        self._grids = OrderedDict()
+
+    def __len__(self):
+        return len(self.lon)
+
+    def _filter_key(self, fuel=None, brand=None, province=None):
+        fuels = _as_set(fuel)
+        if fuels is not None:
+            unknown = {f.lower() for f in fuels} - set(FUELS)
+            if unknown:
+                raise ValueError(f"Combustibles desconocidos: {sorted(unknown)} (válidos: {list(FUELS)})")
+            fuels = frozenset(f.lower() for f in fuels)
+        return fuels, _as_set(brand), _as_set(province)
+
+    def subset(self, fuel=None, brand=None, province=None) -> np.ndarray:
+        """Posiciones (en el orden del índice) de las estaciones que cumplen el filtro."""
+        fuels, brands, provinces = self._filter_key(fuel, brand, province)
+        allowed = np.ones(len(self.cat_start), dtype=bool)
+        if fuels is not None:
+            bits = sum(FUEL_BITS[f] for f in fuels)
+            allowed &= (self.cat_fuel & bits) != 0
+        if brands is not None:
+            allowed &= np.isin(self.cat_brand, np.flatnonzero(np.isin(self.brands, list(brands))))
+        if provinces is not None:
+            allowed &= np.isin(self.cat_province, np.flatnonzero(np.isin(self.provinces, list(provinces))))
+        cats = np.flatnonzero(allowed)
+        return _expand_ranges(self.cat_start[cats], self.cat_end[cats] - self.cat_start[cats])[1]
+
+    def _grid(self, key):
+        grid = self._grids.get(key)
+        if grid is not None:
+            self._grids.move_to_end(key)
+            return grid
+        ids = self.subset(*key)
+        grid = _Grid(self.lon[ids], self.lat[ids], ids, self.points_per_cell) if len(ids) else None
+        self._grids[key] = grid
+        while len(self._grids) > GRID_CACHE:
+            self._grids.popitem(last=False)
+        return grid
+
+    def query_batch(self, lon, lat, k: int = DEFAULT_K, fuel=None, brand=None, province=None):
+        """
+        k estaciones más cercanas a cada posición.
+
+        Args:
+            lon, lat: Posiciones (escalares o arrays)
+            k: Vecinos por posición
+            fuel: 'gnc', 'liquid', 'glp' o lista (vende alguno de ellos)
+            brand: empresabandera o lista
+            province: provincia o lista
+
+        Returns:
+            (ids, km) de forma (Q, k): ids son índices en los arrays de `pois`
+            (-1 y inf donde no hay k estaciones que cumplan el filtro, y en
+            las posiciones inválidas: NaN, infinitas o fuera de rango, como
+            un fix de GPS perdido)
+        """
+        qlon = np.atleast_1d(np.asarray(lon, dtype=float))
+        qlat = np.atleast_1d(np.asarray(lat, dtype=float))
+        ids = np.full((len(qlon), k), -1, dtype=np.int64)
+        km = np.full((len(qlon), k), np.inf)
+        # Una posición no finita cae en una celda basura y la búsqueda por anillos no termina nunca
+        valid = np.isfinite(qlon) & np.isfinite(qlat) & (np.abs(qlon) <= 180.0) & (np.abs(qlat) <= 90.0)
+        grid = self._grid(self._filter_key(fuel, brand, province))
+        if grid is None or not valid.any():
+            return ids, km
+        found, km[valid] = grid.knn(qlon[valid], qlat[valid], k)
+        ids[valid] = np.where(found >= 0, self.source_index[self.order[np.maximum(found, 0)]], -1)
+        return ids, km
+
+    def query(self, lon: float, lat: float, k: int = DEFAULT_K, **filters) -> list:
+        """Como query_batch para una posición, con las estaciones como dicts."""
+        ids, km = self.query_batch(lon, lat, k, **filters)
+        results = []
+        for i, d in zip(ids[0], km[0]):
+            if i < 0:
+                break
+            local = int(np.searchsorted(self.source_index, i))
+            props = self.props[local]
+            j = self._position[local]
+            result = {'index': int(i), 'distance_km': round(float(d), 3),
+                      'lon': float(self.lon[j]), 'lat': float(self.lat[j])}
+            result.update({field: props.get(field) for field in RESULT_FIELDS})
+            results.append(result)
+        return results
+
+
+def brute_force_nearest(index: NearestStations, lon, lat, k: int = DEFAULT_K, **filters):
+    """
+    Referencia: distancia a todas las estaciones y el filtro recién después.
+    Mismo formato y mismos desempates que NearestStations.query_batch.
+    """
+    qlon = np.atleast_1d(np.asarray(lon, dtype=float))
+    qlat = np.atleast_1d(np.asarray(lat, dtype=float))
+    keep = np.zeros(len(index), dtype=bool)
+    keep[index.subset(**filters)] = True
+    source = index.source_index[index.order]
+    ids = np.full((len(qlon), k), -1, dtype=np.int64)
+    km = np.full((len(qlon), k), np.inf)
+    for q in range(len(qlon)):
+        d = haversine_km(qlon[q], qlat[q], index.lon, index.lat)
+        candidates = np.flatnonzero(keep)
+        best = candidates[np.lexsort((candidates, d[candidates]))][:k]
+        ids[q, :len(best)] = source[best]
+        km[q, :len(best)] = d[best]
+    return ids, km
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estaciones de servicio más cercanas a una posición.')
+    parser.add_argument('lon', type=float)
+    parser.add_argument('lat', type=float)
+    parser.add_argument('-k', type=int, default=DEFAULT_K, help=f'Cantidad de estaciones (default {DEFAULT_K})')
+    parser.add_argument('--fuel', nargs='*', choices=list(FUELS), default=None)
+    parser.add_argument('--brand', nargs='*', default=None, help='empresabandera (p.ej. YPF)')
+    parser.add_argument('--province', nargs='*', default=None)
+    parser.add_argument('--store', default=None, help='Almacén de POIs (almacen_poi.py) en lugar de los GeoJSON')
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    args = parser.parse_args()
+
+    index = NearestStations(load_pois(args.store, args.gas, args.cameras, args.villas))
+    results = index.query(args.lon, args.lat, args.k, fuel=args.fuel, brand=args.brand, province=args.province)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
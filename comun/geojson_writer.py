@@ -0,0 +1,273 @@
+"""
+Serializador columnar de GeoJSON/JSON compartido por los scripts de datos.
+
+Recibe tablas por columnas (arrays de coordenadas más columnas de propiedades,
+p.ej. un DataFrame) y escribe un FeatureCollection de puntos por bloques, sin
+armar una Series ni un dict por fila. Cada columna se codifica a fragmentos JSON
+de una sola vez y los NaN/None se convierten a null con una máscara.
+
+write_features hace lo mismo con features ya armados que llegan de un
+generador (p.ej. un extractor que lee por streaming). write_point_chunks y
+write_record_chunks reciben las columnas por bloques (p.ej. de a un RecordBatch
+de Arrow) y producen la misma salida sin tener nunca la tabla entera convertida.
+
+La salida es JSON compacto con un feature por línea; con minify=True va todo
+en una sola línea, y precision= cuantiza las coordenadas a N decimales.
+
+Uso desde otro directorio del repo:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+    from geojson_writer import write_point_collection
+"""
+import json
+from json.encoder import encode_basestring
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 5000
+
+_FEATURE_HEAD = '{"type":"Feature","geometry":{"type":"Point","coordinates":['
+
+
+def _encode_other(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def encode_column(values) -> np.ndarray:
+    """
+    Codifica una columna completa a fragmentos JSON.
+
+    Args:
+        values: Array-like (lista, ndarray o Series)
+
+    Returns:
+        ndarray de str con un fragmento JSON por valor ('null' para NaN/None)
+    """
+    arr = values.to_numpy() if isinstance(values, (pd.Series, pd.Index)) else np.asarray(values)
+    kind = arr.dtype.kind
+
+    if kind == 'b':
+        return np.where(arr, 'true', 'false').astype(object)
+    if kind in 'iu':
+        return arr.astype(str).astype(object)
+    if kind == 'f':
+        out = arr.astype(str).astype(object)
+        out[~np.isfinite(arr)] = 'null'
+        return out
+
+    # Columnas object/str: strings con el codificador en C, el resto con json.dumps
+    arr = arr.astype(object)
+    null = pd.isna(arr)
+    out = np.empty(len(arr), dtype=object)
+    out[null] = 'null'
+    idx = np.flatnonzero(~null)
+    out[idx] = [encode_basestring(v) if isinstance(v, str) else _encode_other(v) for v in arr[idx]]
+    return out
+
+
+def _key_prefixes(names: Sequence[str], opener: str) -> list:
+    return [(opener if i == 0 else ',') + encode_basestring(str(name)) + ':' for i, name in enumerate(names)]
+
+
+def _object_rows(names: Sequence[str], encoded: Sequence[np.ndarray], n: int, opener: str = '{') -> list:
+    """Arma el cuerpo '{"k":v,...' de cada fila a partir de columnas ya codificadas."""
+    if not names:
+        return [opener] * n
+    prefixes = _key_prefixes(names, opener)
+    rows = [prefixes[0] + v for v in encoded[0]]
+    for prefix, col in zip(prefixes[1:], encoded[1:]):
+        rows = [r + prefix + v for r, v in zip(rows, col)]
+    return rows
+
+
+def _as_column(values) -> np.ndarray:
+    return values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values, dtype=object)
+
+
+def _coordinates(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype=float)
+
+
+def _collection_head(header: Mapping = None) -> str:
+    head = '{"type":"FeatureCollection",'
+    for key, value in (header or {}).items():
+        head += encode_basestring(key) + ':' + json.dumps(value, ensure_ascii=False, separators=(',', ':')) + ','
+    return head
+
+
+def _write_point_blocks(path: str, blocks, minify: bool, header: Mapping) -> int:
+    """Escribe bloques (lon, lat, nombres, columnas) ya filtrados a coordenadas válidas."""
+    sep = ',' if minify else ',\n'
+    nl = '' if minify else '\n'
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(_collection_head(header) + '"features":[' + nl)
+        for lon, lat, names, columns in blocks:
+            if not len(lon):
+                continue
+            xs = encode_column(lon)
+            ys = encode_column(lat)
+            props = _object_rows(names, [encode_column(col) for col in columns], len(lon))
+            lines = [_FEATURE_HEAD + x + ',' + y + ']},"properties":' + p + '}}'
+                     for x, y, p in zip(xs, ys, props)]
+            if written:
+                f.write(sep)
+            f.write(sep.join(lines))
+            written += len(lines)
+        f.write(nl + ']}' + nl)
+    return written
+
+
+def write_point_collection(path: str, lon, lat, properties: Mapping[str, Iterable] = None,
+                           chunk_size: int = CHUNK_SIZE, precision: int = None,
+                           minify: bool = False, header: Mapping = None) -> int:
+    """
+    Escribe un FeatureCollection de puntos a partir de columnas.
+
+    Las filas sin coordenadas válidas se descartan.
+
+    Args:
+        path: Archivo de salida
+        lon: Columna de longitudes
+        lat: Columna de latitudes
+        properties: Nombre de propiedad -> columna (un DataFrame sirve tal cual)
+        chunk_size: Features codificados por bloque
+        precision: Decimales a conservar en las coordenadas (None = sin redondear)
+        minify: Sin saltos de línea entre features
+        header: Miembros extra del FeatureCollection, escritos antes de "features"
+
+    Returns:
+        Cantidad de features escritos
+    """
+    lon = _coordinates(lon)
+    lat = _coordinates(lat)
+    properties = properties if properties is not None else {}
+    names = list(properties.keys())
+    columns = [_as_column(properties[name]) for name in names]
+
+    if precision is not None:
+        lon = np.round(lon, precision)
+        lat = np.round(lat, precision)
+
+    keep = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+    blocks = ((lon[idx], lat[idx], names, [col[idx] for col in columns])
+              for idx in (keep[start:start + chunk_size] for start in range(0, len(keep), chunk_size)))
+    return _write_point_blocks(path, blocks, minify, header)
+
+
+def write_point_chunks(path: str, chunks: Iterable, precision: int = None,
+                       minify: bool = False, header: Mapping = None) -> int:
+    """
+    Como write_point_collection, pero las columnas llegan por bloques: `chunks`
+    produce tuplas (lon, lat, properties), p.ej. de a un RecordBatch de Arrow,
+    y sólo el bloque actual se convierte y codifica. La salida es la misma que
+    con las columnas completas.
+
+    Returns:
+        Cantidad de features escritos
+    """
+    def blocks():
+        for lon, lat, properties in chunks:
+            lon = _coordinates(lon)
+            lat = _coordinates(lat)
+            if precision is not None:
+                lon = np.round(lon, precision)
+                lat = np.round(lat, precision)
+            names = list(properties.keys())
+            keep = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+            yield lon[keep], lat[keep], names, [_as_column(properties[name])[keep] for name in names]
+
+    return _write_point_blocks(path, blocks(), minify, header)
+
+
+def write_features(path: str, features: Iterable[Mapping], chunk_size: int = CHUNK_SIZE,
+                   minify: bool = False, header: Mapping = None) -> int:
+    """
+    Escribe un FeatureCollection a partir de un iterable de features (dicts
+    GeoJSON), p.ej. un generador: se consume de a chunk_size features sin
+    materializar la colección.
+
+    Args:
+        path: Archivo de salida
+        features: Iterable de features
+        chunk_size: Features acumulados antes de cada escritura
+        minify: Sin saltos de línea entre features
+        header: Miembros extra del FeatureCollection, escritos antes de "features"
+
+    Returns:
+        Cantidad de features escritos
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str).encode
+    sep = ',' if minify else ',\n'
+    nl = '' if minify else '\n'
+    head = '{"type":"FeatureCollection",'
+    for key, value in (header or {}).items():
+        head += encode_basestring(key) + ':' + encode(value) + ','
+
+    written = 0
+    buffer = []
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(head + '"features":[' + nl)
+        for feature in features:
+            buffer.append(encode(feature))
+            if len(buffer) >= chunk_size:
+                f.write((sep if written else '') + sep.join(buffer))
+                written += len(buffer)
+                buffer = []
+        if buffer:
+            f.write((sep if written else '') + sep.join(buffer))
+            written += len(buffer)
+        f.write(nl + ']}' + nl)
+    return written
+
+
+def _write_record_blocks(path: str, blocks) -> int:
+    """Escribe bloques (nombres, columnas) como objetos de un array JSON."""
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for names, data in blocks:
+            n = len(data[0]) if data else 0
+            if not n:
+                continue
+            rows = _object_rows(names, [encode_column(col) for col in data], n)
+            if written:
+                f.write(',\n')
+            f.write(',\n'.join(r + '}' for r in rows))
+            written += n
+        f.write('\n]\n')
+    return written
+
+
+def write_records(path: str, columns: Mapping[str, Iterable], chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Escribe un array JSON de objetos (una fila por objeto) a partir de columnas.
+
+    Args:
+        path: Archivo de salida
+        columns: Nombre -> columna (un DataFrame sirve tal cual)
+        chunk_size: Filas codificadas por bloque
+
+    Returns:
+        Cantidad de objetos escritos
+    """
+    names = list(columns.keys())
+    data = [_as_column(columns[name]) for name in names]
+    n = len(data[0]) if data else 0
+    blocks = ((names, [col[start:start + chunk_size] for col in data]) for start in range(0, n, chunk_size))
+    _write_record_blocks(path, blocks)
+    return n
+
+
+def write_record_chunks(path: str, chunks: Iterable[Mapping[str, Iterable]]) -> int:
+    """
+    Como write_records, pero las columnas llegan por bloques (p.ej. un
+    DataFrame por RecordBatch de Arrow); sólo el bloque actual se codifica.
+
+    Returns:
+        Cantidad de objetos escritos
+    """
+    blocks = ((list(chunk.keys()), [_as_column(chunk[name]) for name in chunk.keys()]) for chunk in chunks)
+    return _write_record_blocks(path, blocks)
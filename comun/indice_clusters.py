@@ -0,0 +1,352 @@
+"""
+Índice jerárquico de clusters precalculado, equivalente al clustering de MapLibre.
+
+test1.html agrupa 'merged-data' en el navegador (clusterRadius: 80) y suma
+gasCount/cameraCount/villaCount en 'gas'/'cam'/'villa'. Este módulo hace lo
+mismo una sola vez por build, con el algoritmo de supercluster: un KD-tree
+estático por nivel de zoom, desde max_zoom hacia 0, agrupando los puntos que
+caen dentro del radio de cada semilla. Con los mismos parámetros que MapLibre
+(radio 80 px sobre teselas de 512 px, max_zoom 17, min_points 2) los conteos
+coinciden con los del mapa y son idénticos para todos los clientes.
+
+    index = ClusterIndex().load(pois)
+    index.get_clusters((-59, -35, -58, -34), 10)
+    index.get_leaves(cluster_id, limit=20)
+
+    python comun/indice_clusters.py --out dist/clusters
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from geojson_writer import write_point_collection
+from almacen_poi import load_pois
+from poi_data import GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+RADIUS = 80
+TILE_SIZE = 512
+MIN_ZOOM = 0
+MAX_ZOOM = 17
+MIN_POINTS = 2
+NODE_SIZE = 64
+COUNT_FIELDS = {'gas': 'gas', 'camera': 'cam', 'villa': 'villa'}
+MAX_LAT = 85.0511287798
+
+
+class KDBush:
+    """KD-tree estático sobre puntos 2D (mismo esquema que kdbush): orden por medianas, hojas de NODE_SIZE."""
+
+    def __init__(self, xs: np.ndarray, ys: np.ndarray, node_size: int = NODE_SIZE):
+        self.node_size = node_size
+        self.ids = np.arange(len(xs))
+        self.xs = np.asarray(xs, dtype=float).copy()
+        self.ys = np.asarray(ys, dtype=float).copy()
+        if len(xs):
+            self._sort(0, len(xs) - 1, 0)
+
+    def _sort(self, left: int, right: int, axis: int):
+        stack = [(left, right, axis)]
+        while stack:
+            left, right, axis = stack.pop()
+            if right - left <= self.node_size:
+                continue
+            m = (left + right) >> 1
+            coords = self.xs if axis == 0 else self.ys
+            order = np.argpartition(coords[left:right + 1], m - left) + left
+            self.ids[left:right + 1] = self.ids[order]
+            self.xs[left:right + 1] = self.xs[order]
+            self.ys[left:right + 1] = self.ys[order]
+            stack.append((left, m - 1, 1 - axis))
+            stack.append((m + 1, right, 1 - axis))
+
+    def range(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """Índices originales de los puntos dentro del rectángulo."""
+        out = []
+        stack = [(0, len(self.ids) - 1, 0)]
+        xs, ys = self.xs, self.ys
+        while stack:
+            left, right, axis = stack.pop()
+            if right < left:
+                continue
+            if right - left <= self.node_size:
+                sl = slice(left, right + 1)
+                mask = (xs[sl] >= min_x) & (xs[sl] <= max_x) & (ys[sl] >= min_y) & (ys[sl] <= max_y)
+                out.append(self.ids[sl][mask])
+                continue
+            m = (left + right) >> 1
+            x, y = xs[m], ys[m]
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                out.append(self.ids[m:m + 1])
+            c = x if axis == 0 else y
+            lo, hi = (min_x, max_x) if axis == 0 else (min_y, max_y)
+            if lo <= c:
+                stack.append((left, m - 1, 1 - axis))
+            if hi >= c:
+                stack.append((m + 1, right, 1 - axis))
+        return np.concatenate(out) if out else np.empty(0, dtype=int)
+
+    def within(self, qx: float, qy: float, r: float) -> np.ndarray:
+        """Índices originales de los puntos a distancia <= r de (qx, qy)."""
+        out = []
+        stack = [(0, len(self.ids) - 1, 0)]
+        xs, ys = self.xs, self.ys
+        r2 = r * r
+        while stack:
+            left, right, axis = stack.pop()
+            if right < left:
+                continue
+            if right - left <= self.node_size:
+                sl = slice(left, right + 1)
+                dx = xs[sl] - qx
+                dy = ys[sl] - qy
+                out.append(self.ids[sl][dx * dx + dy * dy <= r2])
+                continue
+            m = (left + right) >> 1
+            x, y = xs[m], ys[m]
+            if (x - qx) ** 2 + (y - qy) ** 2 <= r2:
+                out.append(self.ids[m:m + 1])
+            c, q = (x, qx) if axis == 0 else (y, qy)
+            if q - r <= c:
+                stack.append((left, m - 1, 1 - axis))
+            if q + r >= c:
+                stack.append((m + 1, right, 1 - axis))
+        return np.concatenate(out) if out else np.empty(0, dtype=int)
+
+
+def lng_x(lon):
+    return np.asarray(lon, dtype=float) / 360.0 + 0.5
+
+
+def lat_y(lat):
+    s = np.sin(np.radians(np.clip(lat, -MAX_LAT, MAX_LAT)))
+    y = 0.5 - 0.25 * np.log((1 + s) / (1 - s)) / np.pi
+    return np.clip(y, 0, 1)
+
+
+def x_lng(x):
+    return (np.asarray(x) - 0.5) * 360.0
+
+
+def y_lat(y):
+    y2 = (180 - np.asarray(y) * 360) * np.pi / 180
+    return 360 * np.arctan(np.exp(y2)) / np.pi - 90
+
+
+class _Level:
+    """Puntos/clusters de un nivel de zoom: arrays paralelos más su KD-tree."""
+
+    def __init__(self, x, y, count, ids, parent, counts):
+        self.x, self.y, self.count, self.ids, self.parent = x, y, count, ids, parent
+        self.counts = counts  # {'gas': array, 'cam': array, 'villa': array}
+        self.tree = KDBush(x, y)
+
+
+class ClusterIndex:
+    """
+    Jerarquía de clusters por zoom al estilo supercluster.
+
+    Los ids de cluster se codifican como en supercluster: ((origen << 5) + zoom + 1) + n_puntos,
+    de modo que a partir del id se recupera el nivel y el punto semilla.
+    """
+
+    def __init__(self, radius: int = RADIUS, tile_size: int = TILE_SIZE, min_zoom: int = MIN_ZOOM,
+                 max_zoom: int = MAX_ZOOM, min_points: int = MIN_POINTS):
+        self.radius = radius
+        self.tile_size = tile_size
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.min_points = min_points
+        self.levels = {}
+        self.props = []
+        self.types = None
+
+    def load(self, pois: dict) -> 'ClusterIndex':
+        """
+        Construye todos los niveles a partir de poi_data.load_merged_pois.
+        """
+        self.props = pois['props']
+        self.types = pois['type']
+        n = len(pois['lon'])
+        counts = {field: (self.types == t).astype(np.int64) for t, field in COUNT_FIELDS.items()}
+        level = _Level(lng_x(pois['lon']), lat_y(pois['lat']), np.ones(n, dtype=np.int64),
+                       np.arange(n, dtype=np.int64), np.full(n, -1, dtype=np.int64), counts)
+        self.levels[self.max_zoom + 1] = level
+        for z in range(self.max_zoom, self.min_zoom - 1, -1):
+            level = self._cluster(level, z)
+            self.levels[z] = level
+        return self
+
+    def _cluster(self, level: _Level, zoom: int) -> _Level:
+        r = self.radius / (self.tile_size * (1 << zoom))
+        n_points = len(self.props)
+        size = len(level.x)
+        visited = np.zeros(size, dtype=bool)
+        x, y, count = level.x, level.y, level.count
+        out_x, out_y, out_count, out_ids = [], [], [], []
+        out_counts = {field: [] for field in level.counts}
+
+        def _keep(i):
+            out_x.append(x[i])
+            out_y.append(y[i])
+            out_count.append(count[i])
+            out_ids.append(level.ids[i])
+            for field, arr in level.counts.items():
+                out_counts[field].append(arr[i])
+
+        for i in range(size):
+            if visited[i]:
+                continue
+            visited[i] = True
+            neighbors = level.tree.within(x[i], y[i], r)
+            neighbors = neighbors[~visited[neighbors]]
+            total = count[i] + count[neighbors].sum()
+
+            if total >= self.min_points and len(neighbors):
+                members = np.concatenate(([i], neighbors))
+                visited[neighbors] = True
+                weights = count[members]
+                cid = ((i << 5) + (zoom + 1)) + n_points
+                level.parent[members] = cid
+                out_x.append(float((x[members] * weights).sum() / total))
+                out_y.append(float((y[members] * weights).sum() / total))
+                out_count.append(int(total))
+                out_ids.append(cid)
+                for field, arr in level.counts.items():
+                    out_counts[field].append(int(arr[members].sum()))
+            else:
+                _keep(i)
+                if total > 1:
+                    for j in neighbors:
+                        visited[j] = True
+                        _keep(j)
+
+        m = len(out_x)
+        return _Level(np.asarray(out_x, dtype=float), np.asarray(out_y, dtype=float),
+                      np.asarray(out_count, dtype=np.int64), np.asarray(out_ids, dtype=np.int64),
+                      np.full(m, -1, dtype=np.int64),
+                      {f: np.asarray(v, dtype=np.int64) for f, v in out_counts.items()})
+
+    def _limit_zoom(self, zoom) -> int:
+        return max(self.min_zoom, min(int(zoom), self.max_zoom + 1))
+
+    def _feature(self, level: _Level, i: int) -> dict:
+        lon, lat = float(x_lng(level.x[i])), float(y_lat(level.y[i]))
+        if level.count[i] > 1:
+            props = {'cluster': True, 'cluster_id': int(level.ids[i]), 'point_count': int(level.count[i])}
+            props.update({field: int(arr[i]) for field, arr in level.counts.items()})
+        else:
+            props = dict(self.props[int(level.ids[i])])
+        return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': props}
+
+    def get_clusters(self, bbox, zoom) -> list:
+        """
+        Clusters y puntos sueltos visibles en un BBOX a un zoom dado.
+
+        Args:
+            bbox: (min_lon, min_lat, max_lon, max_lat)
+            zoom: Nivel de zoom (se trunca a entero)
+
+        Returns:
+            Lista de features GeoJSON; los clusters llevan cluster_id, point_count y gas/cam/villa
+        """
+        level = self.levels[self._limit_zoom(zoom)]
+        min_lon, min_lat, max_lon, max_lat = bbox
+        ids = level.tree.range(float(lng_x(min_lon)), float(lat_y(max_lat)),
+                               float(lng_x(max_lon)), float(lat_y(min_lat)))
+        return [self._feature(level, int(i)) for i in ids]
+
+    getClusters = get_clusters
+
+    def _origin(self, cluster_id: int):
+        n = len(self.props)
+        return (cluster_id - n) >> 5, (cluster_id - n) % 32
+
+    def get_children(self, cluster_id: int) -> list:
+        """Hijos inmediatos (un nivel más de zoom) de un cluster."""
+        origin, origin_zoom = self._origin(cluster_id)
+        level = self.levels.get(origin_zoom)
+        if level is None or origin >= len(level.x):
+            raise ValueError(f"No existe el cluster {cluster_id}")
+        r = self.radius / (self.tile_size * (1 << (origin_zoom - 1)))
+        ids = level.tree.within(level.x[origin], level.y[origin], r)
+        children = [self._feature(level, int(i)) for i in ids if level.parent[i] == cluster_id]
+        if not children:
+            raise ValueError(f"No existe el cluster {cluster_id}")
+        return children
+
+    def get_leaves(self, cluster_id: int, limit: int = 10, offset: int = 0) -> list:
+        """
+        Puntos originales de un cluster, con paginación.
+
+        Args:
+            cluster_id: Id devuelto por get_clusters
+            limit: Cantidad máxima de hojas (None = todas)
+            offset: Hojas a saltear
+
+        Returns:
+            Lista de features GeoJSON de los POIs originales
+        """
+        leaves = []
+        stack = [cluster_id]
+        while stack:
+            for child in self.get_children(stack.pop()):
+                props = child['properties']
+                if props.get('cluster'):
+                    stack.append(props['cluster_id'])
+                else:
+                    leaves.append(child)
+        leaves = leaves[offset:]
+        return leaves if limit is None else leaves[:limit]
+
+    getLeaves = get_leaves
+
+    def dump(self, out_dir: str) -> dict:
+        """
+        Escribe un GeoJSON por zoom (clusters_z{z}.geojson) con clusters y puntos sueltos.
+
+        Returns:
+            dict zoom -> cantidad de features
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        written = {}
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            level = self.levels[z]
+            is_cluster = level.count > 1
+            point_type = np.where(is_cluster, None, self.types[np.where(is_cluster, 0, level.ids)])
+            properties = {
+                'cluster_id': np.where(is_cluster, level.ids, -1),
+                'point_count': level.count,
+                'type': point_type,
+                **level.counts,
+            }
+            path = os.path.join(out_dir, f'clusters_z{z}.geojson')
+            written[z] = write_point_collection(path, x_lng(level.x), y_lat(level.y), properties,
+                                                precision=6, minify=True)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precalcula los clusters del mapa por zoom.')
+    parser.add_argument('--out', default=os.path.join('dist', 'clusters'), help='Directorio de salida')
+    parser.add_argument('--radius', type=int, default=RADIUS)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    parser.add_argument('--store', default=None, help='Almacén de POIs (almacen_poi.py) en lugar de los GeoJSON')
+    args = parser.parse_args()
+
+    pois = load_pois(args.store, args.gas, args.cameras, args.villas)
+    index = ClusterIndex(radius=args.radius, max_zoom=args.max_zoom).load(pois)
+    written = index.dump(args.out)
+    for z, n in written.items():
+        print(f"z{z}: {n} features")
+    print(f"✓ Clusters guardados en: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Formato columnar para los intermedios entre etapas del build.
+
+Los archivos que una etapa deja para otra (caché de geocodificación,
+cinemómetros geocodificados, cámaras CABA, estaciones de servicio) se guardan
+como Parquet con un esquema fijo por intermedio (ESQUEMAS). Al escribir, cada
+columna se convierte una sola vez al tipo declarado; al leer se verifica el
+esquema del archivo y se cargan sólo las columnas pedidas, ya tipadas, sin
+volver a inferir nada. Los CSV/XLSX quedan sólo como artefactos de exportación.
+
+    write_table(df, 'caba_full_data.parquet', 'caba_full_data')
+    df = read_table('caba_full_data.parquet', 'caba_full_data', columns=['Name', 'Latitud', 'Longitud'])
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+COMPRESSION = 'zstd'
+SCHEMA_KEY = b'mapnfs.esquema'
+
+
+def _strings(*names):
+    return [pa.field(n, pa.string()) for n in names]
+
+
+ESQUEMAS = {
+    # geocode_speedcameras.py: una fila por dirección única
+    'unique_cache': pa.schema(
+        _strings('lugar_de_instalacion')
+        + [pa.field('lat', pa.float64()), pa.field('lon', pa.float64())]
+        + _strings('formatted_address')),
+    # geocode_speedcameras.py: una fila por verificación, con su ubicación.
+    # fecha_de_verificacion queda como texto: hay valores como 'Primitiva'
+    'cinemometros_geocoded': pa.schema(
+        _strings('marca', 'modelo', 'nro_de_serie', 'lugar_de_instalacion', 'fecha_de_verificacion', 'tipo')
+        + [pa.field('lat', pa.float64()), pa.field('lon', pa.float64())]
+        + _strings('formatted_address')),
+    # process_caba_dbf.py: los campos del DBF de cámaras CABA
+    'caba_full_data': pa.schema(
+        _strings('Name', 'descriptio', 'timestamp', 'begin', 'end', 'altitudeMo', 'tessellate', 'extrude',
+                 'visibility', 'drawOrder', 'icon', 'Tipo_de_fi')
+        + [pa.field('Latitud', pa.float64()), pa.field('Longitud', pa.float64())]
+        + _strings('Conducta_f', 'unnamed__1', 'unnamed__2', 'unnamed__3')),
+    # extraer_wfs.py: ambas capas del WFS combinadas
+    'estaciones': pa.schema(
+        _strings('tipooperador', 'empresabandera', 'razonsocial', 'cuit', 'direccion', 'localidad', 'provincia')
+        + [pa.field('Longitude', pa.float64()), pa.field('Latitude', pa.float64())]),
+}
+
+
+class SchemaError(ValueError):
+    """El archivo (o el DataFrame a escribir) no coincide con el esquema del intermedio."""
+
+
+def parquet_path(path: str) -> str:
+    """'x/caba_full_data.csv' -> 'x/caba_full_data.parquet'"""
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def _column(values: pd.Series, field: pa.Field) -> pa.Array:
+    if pa.types.is_string(field.type):
+        values = values.astype('string')
+    elif pa.types.is_floating(field.type):
+        # Los CSV de origen usan coma decimal en algunos campos
+        if values.dtype == object or pd.api.types.is_string_dtype(values):
+            values = values.astype('string').str.replace(',', '.', regex=False)
+        values = pd.to_numeric(values, errors='coerce')
+    elif pa.types.is_boolean(field.type):
+        values = values.astype('boolean')
+    return pa.array(values, type=field.type, from_pandas=True)
+
+
+def to_table(df: pd.DataFrame, name: str) -> pa.Table:
+    """
+    Convierte un DataFrame al esquema del intermedio `name`.
+
+    Raises:
+        SchemaError: Si faltan o sobran columnas respecto del esquema
+    """
+    schema = ESQUEMAS[name]
+    missing = [n for n in schema.names if n not in df.columns]
+    extra = [c for c in df.columns if c not in schema.names]
+    if missing or extra:
+        raise SchemaError(f"{name}: faltan {missing or '-'}, sobran {extra or '-'}")
+    arrays = [_column(df[f.name], f) for f in schema]
+    return pa.Table.from_arrays(arrays, schema=schema.with_metadata({SCHEMA_KEY: name.encode('utf-8')}))
+
+
+def write_table(df: pd.DataFrame, path: str, name: str) -> int:
+    """
+    Escribe `df` como Parquet con el esquema `name`, de forma atómica
+    (archivo temporal + rename). Devuelve la cantidad de filas.
+    """
+    table = to_table(df, name)
+    tmp = path + '.tmp'
+    pq.write_table(table, tmp, compression=COMPRESSION)
+    os.replace(tmp, path)
+    return table.num_rows
+
+
+def check_schema(path: str, name: str) -> pa.Schema:
+    """
+    Verifica que el Parquet en `path` tenga exactamente el esquema `name`
+    (mismas columnas, mismo orden y tipos). Lee sólo el pie del archivo.
+
+    Raises:
+        SchemaError: Si el archivo no corresponde al intermedio
+    """
+    expected = ESQUEMAS[name]
+    actual = pq.read_schema(path)
+    tag = (actual.metadata or {}).get(SCHEMA_KEY)
+    if tag is not None and tag.decode('utf-8') != name:
+        raise SchemaError(f"{path}: es un intermedio '{tag.decode('utf-8')}', se esperaba '{name}'")
+    if not actual.remove_metadata().equals(expected):
+        diff = [f"{f.name}: {f.type}" for f in actual if expected.get_field_index(f.name) < 0
+                or expected.field(f.name).type != f.type]
+        missing = [n for n in expected.names if n not in actual.names]
+        raise SchemaError(f"{path}: no coincide con el esquema '{name}' "
+                          f"(distintas: {diff or '-'}, faltan: {missing or '-'})")
+    return actual
+
+
+def read_arrow(path: str, name: str, columns=None) -> pa.Table:
+    """Como read_table, pero devuelve la tabla Arrow sin pasar por pandas."""
+    schema = check_schema(path, name)
+    unknown = [c for c in columns or () if c not in schema.names]
+    if unknown:
+        raise SchemaError(f"{name}: columnas desconocidas {unknown}")
+    return pq.read_table(path, columns=list(columns) if columns else None)
+
+
+def read_table(path: str, name: str, columns=None) -> pd.DataFrame:
+    """
+    Lee un intermedio verificando su esquema; con `columns` sólo se
+    decodifican esas columnas.
+    """
+    return read_arrow(path, name, columns).to_pandas()
@@ -0,0 +1,401 @@
+"""
+Orquestador incremental del build de datos.
+
+Cada etapa es un script existente con sus entradas y salidas declaradas en
+ETAPAS; las dependencias entre etapas se deducen de qué etapa produce cada
+archivo que otra lee. Después de cada corrida exitosa se guarda en
+.orquestador/sellos.json el sha256 de las entradas (incluido el código de la
+etapa) y de las salidas. Una etapa vuelve a correr sólo si cambió alguna
+entrada, falta o fue modificada una salida, o cambiaron sus argumentos; si una
+etapa corre pero deja sus salidas idénticas, las que dependen de ella no se
+rehacen. Las etapas independientes corren en paralelo (--jobs).
+
+Las etapas remotas (WFS de Energía, geocodificador) dependen de datos que el
+hash local no ve: sólo se refrescan con --refresh, cuando se las nombra
+explícitamente o cuando cambió algo local.
+
+    python comun/orquestador.py                    # todo lo que cambió
+    python comun/orquestador.py camaras            # camaras y lo que necesita
+    python comun/orquestador.py --dry-run
+    python comun/orquestador.py --list
+    python comun/orquestador.py --args geocode="--domain localhost:8765 --rate 50"
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = os.path.join(ROOT, '.orquestador')
+STAMPS_FILE = os.path.join(STATE_DIR, 'sellos.json')
+STAMPS_VERSION = 1
+DEFAULT_JOBS = 4
+
+ESTACIONES = 'estaciones de servicio'
+FOTOMULTAS = 'fotomultas'
+CABA_SHP = [f'{FOTOMULTAS}/caba/camaras-fijas-de-control-vehicular.{ext}' for ext in ('dbf', 'shp', 'shx', 'cpg')]
+GAS_GEOJSON = f'{ESTACIONES}/estaciones_servicio_argentina.geojson'
+CAMERAS_GEOJSON = f'{FOTOMULTAS}/speed_cameras.geojson'
+VILLAS_GEOJSON = 'villas/renabap-2023-12-06.geojson'
+POI_CODE = ['comun/poi_data.py', 'comun/geojson_writer.py']
+
+
+class Etapa(NamedTuple):
+    name: str
+    cwd: str            # relativo a ROOT
+    command: list       # script (relativo a cwd) y argumentos
+    inputs: list        # archivos o directorios relativos a ROOT, código incluido
+    outputs: list
+    remote: bool = False
+    description: str = ''
+
+
+ETAPAS = [
+    Etapa('estaciones', ESTACIONES, ['extraer_wfs.py'],
+          inputs=[f'{ESTACIONES}/{m}' for m in ('extraer_wfs.py', 'exportar.py', 'wfs_fetch.py', 'wfs_harvest.py')]
+                 + ['comun/geojson_writer.py', 'comun/intermedios.py'],
+          outputs=[f'{ESTACIONES}/estaciones_servicio_argentina.{ext}'
+                   for ext in ('parquet', 'csv', 'xlsx', 'geojson', 'json')],
+          remote=True, description='Estaciones de servicio desde el WFS de Energía'),
+    Etapa('caba_csv', FOTOMULTAS, ['process_caba_dbf.py', '--no-merge'],
+          inputs=CABA_SHP + [f'{FOTOMULTAS}/{m}' for m in ('process_caba_dbf.py', 'shapefile_reader.py')]
+                 + ['comun/intermedios.py'],
+          outputs=[f'{FOTOMULTAS}/caba_full_data.parquet', f'{FOTOMULTAS}/caba_full_data.csv'],
+          description='Shapefile de cámaras CABA a CSV'),
+    Etapa('geocode', FOTOMULTAS, ['geocode_speedcameras.py'],
+          inputs=[f'{FOTOMULTAS}/{f}' for f in ('cinemometros.csv', 'caba_full_data.parquet', 'MEDIDORESPBA.HTML',
+                                                 'geocode_speedcameras.py', 'geocode_pipeline.py', 'geocode_cache.py',
+                                                 'address_canon.py', 'route_km_geocoder.py', 'medidores_stream.py')]
+                 + ['comun/intermedios.py'],
+          outputs=[f'{FOTOMULTAS}/cinemometros_geocoded.parquet', f'{FOTOMULTAS}/cinemometros_geocoded.csv',
+                   f'{FOTOMULTAS}/unique_cache.parquet'],
+          remote=True, description='Geocodificación de los cinemómetros nacionales'),
+    Etapa('camaras', FOTOMULTAS, ['merge_cameras.py'],
+          inputs=CABA_SHP + [f'{FOTOMULTAS}/{f}' for f in (
+              'MEDIDORESPBA.HTML', 'camaras-fijas-de-control-vehicular.csv', 'cinemometros_geocoded.parquet',
+              'merge_cameras.py', 'camera_merge.py', 'cinemometros_model.py', 'address_canon.py',
+              'extract_cameras.py', 'medidores_stream.py', 'process_caba_dbf.py', 'shapefile_reader.py')]
+                 + ['comun/intermedios.py'],
+          outputs=[CAMERAS_GEOJSON],
+          description='Unión de todas las fuentes de cámaras'),
+    Etapa('produccion', '.', ['comun/perfil_produccion.py'],
+          inputs=[GAS_GEOJSON, CAMERAS_GEOJSON, 'comun/perfil_produccion.py', 'comun/geojson_writer.py'],
+          outputs=['dist/build-manifest.json'],
+          description='Capas minificadas y precomprimidas en dist/'),
+    Etapa('teselas', '.', ['comun/teselas_mvt.py'],
+          inputs=[GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON, 'comun/teselas_mvt.py'] + POI_CODE,
+          outputs=['dist/pois.mbtiles'],
+          description='Pirámide MVT de POIs'),
+    Etapa('clusters', '.', ['comun/indice_clusters.py'],
+          inputs=[GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON, 'comun/indice_clusters.py'] + POI_CODE,
+          outputs=['dist/clusters'],
+          description='Clusters precalculados por zoom'),
+    Etapa('almacen', '.', ['comun/almacen_poi.py', '--build'],
+          inputs=[GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON, 'comun/almacen_poi.py'] + POI_CODE,
+          outputs=['dist/pois.store'],
+          description='Almacén binario de POIs (mmap) para servidor, corredor y clusters'),
+    Etapa('consultas', '.', ['comun/servidor_consultas.py', '--build', '--store', 'dist/pois.store'],
+          inputs=['dist/pois.store', 'comun/servidor_consultas.py', 'comun/indice_clusters.py',
+                  'comun/almacen_poi.py'] + POI_CODE,
+          outputs=['dist/consultas.npz'],
+          description='Snapshot del índice del servidor de consultas'),
+]
+
+
+def build_graph(etapas):
+    """
+    Valida el DAG y devuelve {etapa: [etapas de las que depende]}. Cada salida
+    debe tener un único productor y no puede haber ciclos.
+    """
+    producer = {}
+    for etapa in etapas:
+        for out in etapa.outputs:
+            if out in producer:
+                raise ValueError(f"{out} lo producen {producer[out]} y {etapa.name}")
+            producer[out] = etapa.name
+    deps = {e.name: sorted({producer[i] for i in e.inputs if producer.get(i) not in (None, e.name)})
+            for e in etapas}
+    for etapa in etapas:
+        if set(etapa.inputs) & set(etapa.outputs):
+            raise ValueError(f"{etapa.name} lee y escribe el mismo archivo")
+
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Ciclo entre etapas: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in deps[name]:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in deps:
+        visit(name, [])
+    return deps
+
+
+class StampStore:
+    """
+    Sellos por etapa y caché de hashes de archivos.
+
+    Los hashes se recalculan sólo cuando cambia el tamaño o el mtime del
+    archivo, así que chequear un árbol sin cambios no relee los datos.
+    """
+
+    def __init__(self, path: str = STAMPS_FILE):
+        self.path = path
+        self.stamps = {}
+        self.files = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STAMPS_VERSION:
+                self.stamps = state.get('stamps', {})
+                self.files = state.get('files', {})
+
+    def file_hash(self, rel: str):
+        """sha256 de un archivo o directorio (relativo a ROOT); None si no existe."""
+        path = os.path.join(ROOT, rel)
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for base, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    child = os.path.relpath(os.path.join(base, name), ROOT)
+                    digest.update(f"{os.path.relpath(child, rel)}\0{self.file_hash(child)}\n".encode('utf-8'))
+            return digest.hexdigest()
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            cached = self.files.get(rel)
+        if cached and cached[:2] == key:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self.lock:
+            self.files[rel] = key + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def fingerprint(self, paths) -> dict:
+        return {p: self.file_hash(p) for p in paths}
+
+    def get(self, name: str):
+        return self.stamps.get(name)
+
+    def record(self, etapa: Etapa, args, inputs: dict):
+        stamp = {
+            'args': args,
+            'inputs': inputs,
+            'outputs': self.fingerprint(etapa.outputs),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with self.lock:
+            self.stamps[etapa.name] = stamp
+        self.save()
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': STAMPS_VERSION, 'stamps': self.stamps, 'files': self.files},
+                          f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def stale_reason(etapa: Etapa, stamps: StampStore, args, inputs: dict, refresh: bool = False):
+    """Motivo por el que la etapa tiene que correr, o None si está al día."""
+    stamp = stamps.get(etapa.name)
+    if stamp is None:
+        return 'sin sello'
+    if stamp.get('args') != args:
+        return 'cambiaron los argumentos'
+    changed = [p for p, h in inputs.items() if stamp['inputs'].get(p) != h]
+    if changed:
+        return f"cambió {changed[0]}" + (f" (+{len(changed) - 1})" if len(changed) > 1 else '')
+    outputs = stamps.fingerprint(etapa.outputs)
+    missing = [p for p, h in outputs.items() if h is None]
+    if missing:
+        return f"falta {missing[0]}"
+    modified = [p for p, h in outputs.items() if stamp['outputs'].get(p) != h]
+    if modified:
+        return f"{modified[0]} fue modificado"
+    if etapa.remote and refresh:
+        return 'refresco de datos remotos'
+    return None
+
+
+def select(etapas, deps, names):
+    """Las etapas pedidas y todas las que necesitan, en orden topológico."""
+    by_name = {e.name: e for e in etapas}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise SystemExit(f"Etapas desconocidas: {', '.join(unknown)} (ver --list)")
+    wanted = set()
+
+    def add(name):
+        if name not in wanted:
+            wanted.add(name)
+            for dep in deps[name]:
+                add(dep)
+
+    for name in names or by_name:
+        add(name)
+    return [e for e in etapas if e.name in wanted]
+
+
+def run_stage(etapa: Etapa, args) -> int:
+    """Corre el script de la etapa, con cada línea de salida prefijada con su nombre."""
+    cmd = [sys.executable] + etapa.command + list(args)
+    env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+    proc = subprocess.Popen(cmd, cwd=os.path.join(ROOT, etapa.cwd), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding='utf-8', errors='replace')
+    for line in proc.stdout:
+        print(f"[{etapa.name}] {line.rstrip()}", flush=True)
+    return proc.wait()
+
+
+def run(etapas, deps, stamps: StampStore, stage_args: dict, jobs: int = DEFAULT_JOBS,
+        force: bool = False, refresh=(), dry_run: bool = False) -> dict:
+    """
+    Ejecuta las etapas pendientes respetando el DAG. Cada etapa se evalúa
+    recién cuando terminaron sus dependencias, con el hash de lo que éstas
+    dejaron. Devuelve {etapa: 'ok' | 'al día' | 'falló' | 'omitida' | 'correría'}.
+    """
+    status = {}
+    pending = {e.name: e for e in etapas}
+    running = {}
+    selected = set(pending)
+
+    def ready(name):
+        return all(d in status or d not in selected for d in deps[name])
+
+    def decide(etapa):
+        blocked = [d for d in deps[etapa.name] if status.get(d) in ('falló', 'omitida')]
+        if blocked:
+            print(f"- {etapa.name}: omitida, falló {blocked[0]}")
+            return 'omitida', None
+        args = stage_args.get(etapa.name, [])
+        inputs = stamps.fingerprint(etapa.inputs)
+        upstream = [d for d in deps[etapa.name] if status.get(d) == 'correría']
+        reason = 'forzada' if force else (
+            f"depende de {upstream[0]}" if upstream else
+            stale_reason(etapa, stamps, args, inputs, etapa.name in refresh))
+        if reason is None:
+            print(f"= {etapa.name}: al día")
+            return 'al día', None
+        if reason == 'sin sello' and etapa.remote and etapa.name not in refresh \
+                and all(h is not None for h in stamps.fingerprint(etapa.outputs).values()):
+            # Primera corrida sobre salidas ya descargadas: se adoptan en vez de volver a pedirlas
+            print(f"= {etapa.name}: se adoptan las salidas existentes (--refresh para volver a descargar)")
+            if not dry_run:
+                stamps.record(etapa, args, inputs)
+            return 'al día', None
+        print(f"> {etapa.name}: {reason}")
+        if dry_run:
+            return 'correría', None
+        return None, (args, inputs)
+
+    def execute(etapa, args, inputs):
+        start = time.perf_counter()
+        code = run_stage(etapa, args)
+        elapsed = time.perf_counter() - start
+        if code != 0:
+            print(f"! {etapa.name}: salió con código {code} ({elapsed:.1f} s)")
+            return 'falló'
+        stamps.record(etapa, args, inputs)
+        print(f"✓ {etapa.name}: {elapsed:.1f} s")
+        return 'ok'
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in [n for n in pending if ready(n)]:
+                etapa = pending.pop(name)
+                result, job = decide(etapa)
+                if job is None:
+                    status[name] = result
+                else:
+                    running[pool.submit(execute, etapa, *job)] = name
+            if not running:
+                if pending and not any(ready(n) for n in pending):
+                    raise RuntimeError(f"Etapas bloqueadas: {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                status[running.pop(future)] = future.result()
+    return status
+
+
+def parse_stage_args(values, names) -> dict:
+    """['geocode=--rate 5 --workers 4'] -> {'geocode': ['--rate', '5', '--workers', '4']}"""
+    out = {}
+    for value in values or []:
+        name, _, rest = value.partition('=')
+        if name not in names:
+            raise SystemExit(f"--args: etapa desconocida {name!r}")
+        out.setdefault(name, []).extend(shlex.split(rest))
+    return out
+
+
+def print_stages(etapas, deps, stamps: StampStore):
+    for etapa in etapas:
+        stamp = stamps.get(etapa.name)
+        flags = ' (remota)' if etapa.remote else ''
+        print(f"{etapa.name:<11} {etapa.description}{flags}")
+        print(f"{'':<11} depende de: {', '.join(deps[etapa.name]) or '-'}")
+        print(f"{'':<11} salidas: {', '.join(etapa.outputs)}")
+        print(f"{'':<11} última corrida: {stamp['time'] if stamp else 'nunca'}")
+
+
+def main():
+    names = [e.name for e in ETAPAS]
+    parser = argparse.ArgumentParser(description='Build incremental de los datos del mapa.')
+    parser.add_argument('stages', nargs='*', help=f"Etapas a construir (default todas): {', '.join(names)}")
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_JOBS, help=f'Etapas en paralelo (default {DEFAULT_JOBS})')
+    parser.add_argument('--force', action='store_true', help='Correr las etapas seleccionadas aunque estén al día')
+    parser.add_argument('--refresh', action='store_true', help='Volver a consultar las fuentes remotas')
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar qué correría, sin correr nada')
+    parser.add_argument('--list', action='store_true', help='Listar las etapas y sus dependencias')
+    parser.add_argument('--args', action='append', metavar='ETAPA=ARGS',
+                        help='Argumentos extra para el script de una etapa (se puede repetir)')
+    args = parser.parse_args()
+
+    deps = build_graph(ETAPAS)
+    stamps = StampStore()
+    if args.list:
+        print_stages(ETAPAS, deps, stamps)
+        return
+
+    etapas = select(ETAPAS, deps, args.stages)
+    refresh = {e.name for e in etapas if e.remote and (args.refresh or e.name in args.stages)}
+    status = run(etapas, deps, stamps, parse_stage_args(args.args, names), jobs=args.jobs,
+                 force=args.force, refresh=refresh, dry_run=args.dry_run)
+    if not args.dry_run:
+        stamps.save()
+    counts = {}
+    for value in status.values():
+        counts[value] = counts.get(value, 0) + 1
+    print(', '.join(f"{v}: {n}" for v, n in counts.items()))
+    if 'falló' in counts or 'omitida' in counts:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
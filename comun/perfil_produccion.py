@@ -0,0 +1,173 @@
+"""
+Perfil de salida "producción" para las capas que descarga el mapa.
+
+A partir de los GeoJSON de trabajo (indentados, con precisión completa y todas
+las propiedades) genera en dist/:
+  - JSON minificado con coordenadas cuantizadas (--precision, 6 por defecto)
+  - sólo las propiedades que lee test1.html, con claves abreviadas y un
+    diccionario "keys" (abreviada -> original) en la cabecera del FeatureCollection
+  - hermanos precomprimidos .gz y .br (este último si está instalado brotli)
+  - dist/build-manifest.json con el hash de contenido de cada artefacto
+
+Los nombres de archivo llevan el hash, así que se pueden servir con caché
+inmutable y el manifest indica cuál pedir.
+
+    python comun/perfil_produccion.py --precision 6
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import string
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from geojson_writer import write_point_collection
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIST_DIR = os.path.join(ROOT, 'dist')
+MANIFEST_NAME = 'build-manifest.json'
+DEFAULT_PRECISION = 6
+
+# Capa -> GeoJSON de origen y propiedades que el mapa efectivamente lee
+LAYERS = {
+    'estaciones': {
+        'source': os.path.join(ROOT, 'estaciones de servicio', 'estaciones_servicio_argentina.geojson'),
+        'keep': ['tipooperador', 'empresabandera', 'direccion'],
+    },
+    'camaras': {
+        'source': os.path.join(ROOT, 'fotomultas', 'speed_cameras.geojson'),
+        'keep': ['calleRuta', 'ubicacion', 'direccion', 'velocidadPermitida'],
+    },
+}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def short_keys(names):
+    """Asigna claves de una letra (a, b, ..., z, A, ...) en el orden dado."""
+    alphabet = string.ascii_lowercase + string.ascii_uppercase
+    if len(names) > len(alphabet):
+        raise ValueError(f"Demasiadas propiedades para abreviar: {len(names)}")
+    return dict(zip(names, alphabet))
+
+
+def load_point_columns(path: str, keep):
+    """Lee un GeoJSON de puntos y devuelve (lon, lat, {propiedad: columna}) sólo con `keep`."""
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f).get('features', [])
+    points = [f for f in features if (f.get('geometry') or {}).get('type') == 'Point']
+    coords = np.array([f['geometry']['coordinates'][:2] for f in points], dtype=float).reshape(-1, 2)
+    props = [f.get('properties') or {} for f in points]
+    columns = {}
+    for name in keep:
+        col = [p.get(name) for p in props]
+        # Una propiedad que nunca aparece no aporta nada al mapa
+        if any(v not in (None, '') for v in col):
+            columns[name] = col
+    return coords[:, 0], coords[:, 1], columns
+
+
+def write_precompressed(path: str):
+    """Escribe path.gz (y path.br si hay brotli) junto al archivo; devuelve las rutas creadas."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    outputs = []
+    gz_path = path + '.gz'
+    with open(gz_path, 'wb') as f:
+        # mtime=0 para que el .gz sea reproducible byte a byte
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    outputs.append(gz_path)
+    if brotli is not None:
+        br_path = path + '.br'
+        with open(br_path, 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        outputs.append(br_path)
+    return outputs
+
+
+def build_layer(name: str, source: str, keep, out_dir: str = DIST_DIR,
+                precision: int = DEFAULT_PRECISION) -> dict:
+    """
+    Genera el artefacto de producción de una capa y sus precomprimidos.
+
+    Returns:
+        Entrada del manifest para la capa
+    """
+    lon, lat, columns = load_point_columns(source, keep)
+    keys = short_keys(list(columns))
+    properties = {keys[k]: v for k, v in columns.items()}
+    header = {'keys': {short: original for original, short in keys.items()}}
+
+    tmp_path = os.path.join(out_dir, f'{name}.tmp.geojson')
+    count = write_point_collection(tmp_path, lon, lat, properties,
+                                   precision=precision, minify=True, header=header)
+    sha = _sha256(tmp_path)
+    final_name = f'{name}.{sha[:10]}.geojson'
+    final_path = os.path.join(out_dir, final_name)
+    os.replace(tmp_path, final_path)
+
+    entry = {
+        'file': final_name,
+        'sha256': sha,
+        'features': count,
+        'bytes': os.path.getsize(final_path),
+        'source_bytes': os.path.getsize(source),
+    }
+    for compressed in write_precompressed(final_path):
+        ext = compressed.rsplit('.', 1)[1]
+        entry[f'{ext}_bytes'] = os.path.getsize(compressed)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera los artefactos de producción del mapa.')
+    parser.add_argument('--out', default=DIST_DIR, help='Directorio de salida (default dist/)')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION, help='Decimales de las coordenadas')
+    parser.add_argument('--layers', nargs='*', default=list(LAYERS), help='Capas a generar')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if brotli is None:
+        print("⚠ brotli no está instalado; se generan sólo los .gz")
+
+    manifest = {'precision': args.precision, 'layers': {}}
+    for name in args.layers:
+        cfg = LAYERS[name]
+        if not os.path.exists(cfg['source']):
+            print(f"⚠ Falta {cfg['source']}; se omite la capa {name}")
+            continue
+        entry = build_layer(name, cfg['source'], cfg['keep'], args.out, args.precision)
+        manifest['layers'][name] = entry
+        print(f"✓ {name}: {entry['features']} features, {entry['source_bytes']} -> {entry['bytes']} bytes"
+              f" (gz {entry.get('gz_bytes')}, br {entry.get('br_bytes')})")
+
+    # Borrar artefactos viejos de las capas regeneradas que ya no figuran en el manifest
+    for name, entry in manifest['layers'].items():
+        for fname in os.listdir(args.out):
+            if (fname.startswith(name + '.') and fname.endswith(('.geojson', '.geojson.gz', '.geojson.br'))
+                    and not fname.startswith(entry['file'])):
+                os.remove(os.path.join(args.out, fname))
+
+    manifest_path = os.path.join(args.out, MANIFEST_NAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"✓ Manifest guardado en: {manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Carga de la capa combinada de POIs que arma test1.html (estaciones, cámaras y villas).
+
+Replica en Python lo que hace fetchDataAndCluster en el navegador: cada feature
+recibe `type` ('gas', 'camera' o 'villa'), las estaciones además `fuel_type`
+('gnc' o 'liquid' según tipooperador) y las villas se reducen a su centroide.
+El resultado es columnar (arrays de coordenadas y tipo) más la lista de
+propiedades, para que los módulos de teselas, clusters y consultas no tengan
+que rehacer este paso.
+"""
+import json
+import os
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GAS_GEOJSON = os.path.join(ROOT, 'estaciones de servicio', 'estaciones_servicio_argentina.geojson')
+CAMERAS_GEOJSON = os.path.join(ROOT, 'fotomultas', 'speed_cameras.geojson')
+VILLAS_GEOJSON = os.path.join(ROOT, 'villas', 'renabap-2023-12-06.geojson')
+
+TYPES = ('gas', 'camera', 'villa')
+
+
+def fuel_type(tipooperador) -> str:
+    """Misma regla que el mapa: 'gnc' si tipooperador menciona GNC, si no 'liquid'."""
+    return 'gnc' if isinstance(tipooperador, str) and 'gnc' in tipooperador.lower() else 'liquid'
+
+
+def _rings(geometry):
+    gtype = geometry.get('type')
+    coords = geometry.get('coordinates') or []
+    if gtype == 'Polygon':
+        return coords
+    if gtype == 'MultiPolygon':
+        return [ring for poly in coords for ring in poly]
+    return []
+
+
+def geometry_centroid(geometry):
+    """
+    Centroide como lo calcula turf.centroid: promedio de los vértices, sin
+    repetir el vértice de cierre de cada anillo.
+
+    Returns:
+        (lon, lat) o None si la geometría no tiene vértices
+    """
+    if geometry is None:
+        return None
+    if geometry.get('type') == 'Point':
+        return tuple(geometry['coordinates'][:2])
+    pts = []
+    for ring in _rings(geometry):
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring = ring[:-1]
+        pts.extend(p[:2] for p in ring)
+    if not pts:
+        return None
+    arr = np.asarray(pts, dtype=float)
+    return float(arr[:, 0].mean()), float(arr[:, 1].mean())
+
+
+def _load_features(path):
+    if not path or not os.path.exists(path):
+        print(f"⚠ No existe {path}; la capa queda vacía")
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('features', [])
+
+
+def load_merged_pois(gas_path: str = GAS_GEOJSON, cameras_path: str = CAMERAS_GEOJSON,
+                     villas_path: str = VILLAS_GEOJSON) -> dict:
+    """
+    Carga y combina las tres capas del mapa.
+
+    Returns:
+        dict con 'lon' y 'lat' (float64), 'type' (array de str) y 'props'
+        (lista de dicts con las propiedades originales más type/fuel_type)
+    """
+    lon, lat, types, props = [], [], [], []
+
+    def _add(point, kind, properties):
+        lon.append(point[0])
+        lat.append(point[1])
+        types.append(kind)
+        props.append(properties)
+
+    for f in _load_features(gas_path):
+        point = geometry_centroid(f.get('geometry'))
+        if point is None:
+            continue
+        p = dict(f.get('properties') or {})
+        p['type'] = 'gas'
+        p['fuel_type'] = fuel_type(p.get('tipooperador'))
+        _add(point, 'gas', p)
+
+    for f in _load_features(cameras_path):
+        point = geometry_centroid(f.get('geometry'))
+        if point is None:
+            continue
+        p = dict(f.get('properties') or {})
+        p['type'] = 'camera'
+        _add(point, 'camera', p)
+
+    for f in _load_features(villas_path):
+        point = geometry_centroid(f.get('geometry'))
+        if point is None:
+            continue
+        p = dict(f.get('properties') or {})
+        p['type'] = 'villa'
+        _add(point, 'villa', p)
+
+    return {
+        'lon': np.asarray(lon, dtype=float),
+        'lat': np.asarray(lat, dtype=float),
+        'type': np.asarray(types, dtype=object),
+        'props': props,
+    }
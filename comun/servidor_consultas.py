@@ -0,0 +1,455 @@
+"""
+Servidor asíncrono de consultas por BBOX/zoom sobre la capa combinada del mapa.
+
+fetchDataAndCluster (test1.html) descarga completos los GeoJSON de estaciones,
+cámaras y villas y los combina en el navegador, sea cual sea la vista. Este
+servidor responde sólo lo visible:
+
+    GET /features?bbox=-58.6,-34.8,-58.3,-34.5&zoom=12&types=gas:gnc,camera:speed
+
+- bbox: min_lon,min_lat,max_lon,max_lat (default: todo)
+- zoom: hasta CLUSTER_MAX_ZOOM los puntos se agrupan en una grilla de RADIUS px
+  (mismos conteos gas/cam/villa que clusterProperties); sin zoom o por encima,
+  se devuelven los puntos sueltos
+- types: lista de tipos y filtros por tipo (ver FILTERS), p.ej. 'gas:gnc'
+  sólo estaciones con GNC o 'camera:speed' sólo cámaras con velocidadPermitida
+
+Las respuestas van en gzip cuando el cliente lo acepta, con ETag derivado del
+snapshot y de la consulta normalizada: un If-None-Match que coincide recibe 304
+sin recalcular nada. Las respuestas recientes quedan en un LRU.
+
+Al arrancar se carga un snapshot del índice (arrays NumPy + cada feature ya
+serializada), sin volver a parsear GeoJSON:
+
+    python comun/servidor_consultas.py --build            # dist/consultas.npz
+    python comun/servidor_consultas.py --port 8090
+    python comun/bench_consultas.py --concurrency 32      # p50/p99
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from indice_clusters import RADIUS, TILE_SIZE, MAX_ZOOM, lng_x, lat_y, x_lng, y_lat
+from almacen_poi import load_pois
+from poi_data import TYPES, ROOT, GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+SNAPSHOT_FILE = os.path.join(ROOT, 'dist', 'consultas.npz')
+SNAPSHOT_VERSION = 1
+CELL_DEG = 0.1
+CLUSTER_MAX_ZOOM = MAX_ZOOM
+COUNT_FIELDS = ('gas', 'cam', 'villa')   # en el orden de TYPES
+CACHE_ENTRIES = 512
+GZIP_LEVEL = 5
+MIN_GZIP_BYTES = 512
+MAX_HEADER_BYTES = 16 * 1024
+
+FLAG_GNC = 1
+FLAG_SPEED = 2
+
+# token de 'types' -> (tipo, bits que deben estar prendidos, bits que deben estar apagados)
+FILTERS = {
+    'gas': ('gas', 0, 0),
+    'gas:gnc': ('gas', FLAG_GNC, 0),
+    'gas:liquid': ('gas', 0, FLAG_GNC),
+    'camera': ('camera', 0, 0),
+    'camera:speed': ('camera', FLAG_SPEED, 0),
+    'villa': ('villa', 0, 0),
+}
+
+FEATURES_HEAD = b'{"type":"FeatureCollection","features":['
+FEATURES_TAIL = b']}'
+
+
+def _has_speed_limit(value) -> bool:
+    try:
+        return float(value) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _encode_feature(lon: float, lat: float, props: dict) -> bytes:
+    return json.dumps({'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                       'properties': props}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class QueryIndex:
+    """
+    Índice de consulta: POIs ordenados por celda de una grilla regular (CSR, como
+    corredor.CorridorIndex) con las features ya serializadas en un único heap.
+    """
+
+    ARRAYS = ('lon', 'lat', 'mx', 'my', 'type', 'flags', 'keys', 'offsets', 'heap')
+
+    def __init__(self, arrays: dict, meta: dict):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.cell_deg = meta['cell_deg']
+        self.origin = tuple(meta['origin'])
+        self.ny = meta['ny']
+        self.digest = meta['digest']
+        self.heap_bytes = self.heap.tobytes()
+
+    def __len__(self):
+        return len(self.lon)
+
+    @classmethod
+    def from_pois(cls, pois: dict, cell_deg: float = CELL_DEG) -> 'QueryIndex':
+        """Construye el índice a partir de poi_data.load_merged_pois."""
+        lon = np.asarray(pois['lon'], dtype=float)
+        lat = np.asarray(pois['lat'], dtype=float)
+        origin = (float(lon.min()), float(lat.min())) if len(lon) else (0.0, 0.0)
+        cx = np.floor((lon - origin[0]) / cell_deg).astype(np.int64)
+        cy = np.floor((lat - origin[1]) / cell_deg).astype(np.int64)
+        ny = int(cy.max()) + 1 if len(cy) else 1
+        keys = cx * ny + cy
+        order = np.argsort(keys, kind='stable')
+
+        codes = np.array([TYPES.index(t) for t in pois['type']], dtype=np.uint8)
+        flags = np.zeros(len(lon), dtype=np.uint8)
+        chunks = []
+        for i, p in enumerate(pois['props']):
+            if p.get('fuel_type') == 'gnc':
+                flags[i] |= FLAG_GNC
+            if _has_speed_limit(p.get('velocidadPermitida')):
+                flags[i] |= FLAG_SPEED
+        for i in order:
+            chunks.append(_encode_feature(float(lon[i]), float(lat[i]), pois['props'][i]))
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(c) for c in chunks])
+        heap = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+
+        lon, lat = lon[order], lat[order]
+        arrays = {
+            'lon': lon, 'lat': lat, 'mx': lng_x(lon), 'my': lat_y(lat),
+            'type': codes[order], 'flags': flags[order], 'keys': keys[order],
+            'offsets': offsets, 'heap': heap,
+        }
+        digest = hashlib.sha1()
+        for name in cls.ARRAYS:
+            digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+        meta = {'version': SNAPSHOT_VERSION, 'cell_deg': cell_deg, 'origin': list(origin), 'ny': ny,
+                'digest': digest.hexdigest()[:16], 'counts': {t: int((codes == k).sum()) for k, t in enumerate(TYPES)}}
+        return cls(arrays, meta)
+
+    def save(self, path: str):
+        """Escribe el snapshot (npz sin comprimir) de forma atómica."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        meta = np.frombuffer(json.dumps(self.meta).encode('utf-8'), dtype=np.uint8)
+        np.savez(tmp, meta=meta, **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'QueryIndex':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+            if meta.get('version') != SNAPSHOT_VERSION:
+                raise ValueError(f"{path}: versión de snapshot {meta.get('version')}, se esperaba {SNAPSHOT_VERSION}")
+            return cls({name: data[name] for name in cls.ARRAYS}, meta)
+
+    def select(self, bbox, filters=None) -> np.ndarray:
+        """
+        Posiciones (en el orden del snapshot) de los POIs dentro del BBOX que pasan los filtros.
+
+        Args:
+            bbox: (min_lon, min_lat, max_lon, max_lat), bordes inclusive
+            filters: Tokens de FILTERS (None = todos los tipos)
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        min_lon, min_lat, max_lon, max_lat = bbox
+        x0, x1 = (int(np.floor((v - self.origin[0]) / self.cell_deg)) for v in (min_lon, max_lon))
+        y0, y1 = (int(np.floor((v - self.origin[1]) / self.cell_deg)) for v in (min_lat, max_lat))
+        y0, y1 = max(y0, 0), min(y1, self.ny - 1)
+        x0 = max(x0, 0)
+        x1 = min(x1, int(self.keys[-1] // self.ny))
+        if x1 < x0 or y1 < y0:
+            return np.empty(0, dtype=np.int64)
+
+        # Por columna de la grilla las celdas y0..y1 son un rango contiguo de claves
+        columns = np.arange(x0, x1 + 1, dtype=np.int64) * self.ny
+        lo = np.searchsorted(self.keys, columns + y0, side='left')
+        hi = np.searchsorted(self.keys, columns + y1, side='right')
+        lengths = hi - lo
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        pos = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + np.arange(total)
+
+        lon, lat = self.lon[pos], self.lat[pos]
+        keep = (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+        if filters is not None:
+            codes, flags = self.type[pos], self.flags[pos]
+            wanted = np.zeros(len(pos), dtype=bool)
+            for token in filters:
+                kind, on, off = FILTERS[token]
+                wanted |= (codes == TYPES.index(kind)) & ((flags & on) == on) & ((flags & off) == 0)
+            keep &= wanted
+        return pos[keep]
+
+    def features(self, positions) -> list:
+        """Features ya serializadas (bytes) de las posiciones dadas."""
+        heap, offsets = self.heap_bytes, self.offsets
+        return [heap[offsets[i]:offsets[i + 1]] for i in positions.tolist()]
+
+    def clustered(self, positions, zoom: int) -> list:
+        """
+        Agrupa las posiciones en celdas de RADIUS px a ese zoom. Las celdas con un
+        solo punto devuelven la feature original; el resto un cluster con
+        point_count y los conteos gas/cam/villa en el centroide de sus puntos.
+        """
+        if len(positions) == 0:
+            return []
+        r = RADIUS / (TILE_SIZE * (1 << zoom))
+        cx = np.floor(self.mx[positions] / r).astype(np.int64)
+        cy = np.floor(self.my[positions] / r).astype(np.int64)
+        cells, inverse, count = np.unique(cx * (1 << 32) + cy, return_inverse=True, return_counts=True)
+        out = self.features(positions[count[inverse] == 1])
+        many = np.flatnonzero(count > 1)
+        if len(many) == 0:
+            return out
+        mx = np.bincount(inverse, weights=self.mx[positions], minlength=len(cells))[many] / count[many]
+        my = np.bincount(inverse, weights=self.my[positions], minlength=len(cells))[many] / count[many]
+        codes = self.type[positions]
+        by_type = [np.bincount(inverse[codes == k], minlength=len(cells))[many] for k in range(len(TYPES))]
+        for j, (lon, lat) in enumerate(zip(x_lng(mx).tolist(), y_lat(my).tolist())):
+            props = {'cluster': True, 'point_count': int(count[many[j]])}
+            props.update({field: int(by_type[k][j]) for k, field in enumerate(COUNT_FIELDS)})
+            out.append(_encode_feature(round(lon, 6), round(lat, 6), props))
+        return out
+
+    def render(self, bbox, zoom, filters) -> bytes:
+        """FeatureCollection de la consulta, ya serializada."""
+        positions = self.select(bbox, filters)
+        if zoom is not None and zoom <= CLUSTER_MAX_ZOOM:
+            parts = self.clustered(positions, zoom)
+        else:
+            parts = self.features(positions)
+        return FEATURES_HEAD + b','.join(parts) + FEATURES_TAIL
+
+
+def parse_query(query: str):
+    """
+    Normaliza los parámetros de /features.
+
+    Returns:
+        (bbox, zoom, filters) listo para usar como clave de caché
+
+    Raises:
+        ValueError: Parámetros inválidos
+    """
+    params = {k: v[-1] for k, v in parse_qs(query).items()}
+    bbox = (-180.0, -90.0, 180.0, 90.0)
+    if params.get('bbox'):
+        parts = [float(v) for v in params['bbox'].split(',')]
+        # float() acepta 'nan' e 'inf', que después rompen la grilla
+        if (len(parts) != 4 or not all(math.isfinite(v) for v in parts)
+                or parts[0] > parts[2] or parts[1] > parts[3]):
+            raise ValueError("bbox debe ser min_lon,min_lat,max_lon,max_lat")
+        bbox = tuple(round(v, 6) for v in parts)
+    zoom = None
+    if params.get('zoom'):
+        zoom = float(params['zoom'])
+        if not math.isfinite(zoom):
+            raise ValueError("zoom debe ser un número finito")
+        zoom = max(0, min(int(zoom), 24))
+    filters = None
+    if params.get('types'):
+        tokens = sorted(set(t.strip() for t in params['types'].split(',') if t.strip()))
+        unknown = [t for t in tokens if t not in FILTERS]
+        if unknown:
+            raise ValueError(f"types desconocidos: {','.join(unknown)} (válidos: {','.join(FILTERS)})")
+        filters = tuple(tokens)
+    return bbox, zoom, filters
+
+
+class QueryServer:
+    """
+    Servidor HTTP/1.1 mínimo (keep-alive, sólo GET) sobre asyncio. Las consultas
+    que no están en caché se resuelven en un pool de hilos para no frenar el loop.
+    """
+
+    def __init__(self, index: QueryIndex, cache_entries: int = CACHE_ENTRIES, workers: int = None):
+        self.index = index
+        self.cache = OrderedDict()
+        self.cache_entries = cache_entries
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1))
+        self.stats = {'requests': 0, 'not_modified': 0, 'cache_hits': 0, 'errors': 0}
+        self.server = None
+
+    def etag(self, key) -> str:
+        return '"%s-%s"' % (self.index.digest, hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16])
+
+    def _build(self, key):
+        body = self.index.render(*key)
+        compressed = gzip.compress(body, GZIP_LEVEL) if len(body) >= MIN_GZIP_BYTES else None
+        return body, compressed
+
+    async def _response(self, key):
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            self.stats['cache_hits'] += 1
+            return entry
+        entry = await asyncio.get_running_loop().run_in_executor(self.executor, self._build, key)
+        self.cache[key] = entry
+        while len(self.cache) > self.cache_entries:
+            self.cache.popitem(last=False)
+        return entry
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._send(writer, 400, b'bad request', keep_alive=False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() != 'HTTP/1.0')
+                try:
+                    await self._dispatch(writer, method, target, headers, keep_alive)
+                except ConnectionError:
+                    break
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, writer, method, target, headers, keep_alive):
+        self.stats['requests'] += 1
+        try:
+            await self._route(writer, method, target, headers, keep_alive)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # Un error inesperado responde 500 en vez de cortar la conexión sin respuesta
+            self.stats['errors'] += 1
+            print(f"Error atendiendo {method} {target}: {e!r}", file=sys.stderr)
+            await self._send(writer, 500, b'internal server error', keep_alive)
+
+    async def _route(self, writer, method, target, headers, keep_alive):
+        if method not in ('GET', 'HEAD'):
+            await self._send(writer, 405, b'method not allowed', keep_alive)
+            return
+        url = urlsplit(target)
+        if url.path == '/health':
+            body = json.dumps({'features': len(self.index), 'snapshot': self.index.digest,
+                               'counts': self.index.meta.get('counts'), **self.stats}).encode('utf-8')
+            await self._send(writer, 200, body, keep_alive, 'application/json')
+            return
+        if url.path != '/features':
+            await self._send(writer, 404, b'not found', keep_alive)
+            return
+        try:
+            key = parse_query(url.query)
+        except ValueError as e:
+            await self._send(writer, 400, str(e).encode('utf-8'), keep_alive)
+            return
+
+        etag = self.etag(key)
+        if etag in (t.strip() for t in headers.get('if-none-match', '').split(',')):
+            self.stats['not_modified'] += 1
+            await self._send(writer, 304, b'', keep_alive, etag=etag)
+            return
+        body, compressed = await self._response(key)
+        use_gzip = compressed is not None and 'gzip' in headers.get('accept-encoding', '')
+        await self._send(writer, 200, compressed if use_gzip else body, keep_alive, 'application/geo+json',
+                         etag=etag, encoded=use_gzip, head_only=method == 'HEAD')
+
+    async def _send(self, writer, status, body, keep_alive, content_type='text/plain; charset=utf-8',
+                    etag=None, encoded=False, head_only=False):
+        reason = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+                  405: 'Method Not Allowed', 500: 'Internal Server Error'}[status]
+        lines = [f'HTTP/1.1 {status} {reason}', f'Content-Type: {content_type}',
+                 'Access-Control-Allow-Origin: *', f'Content-Length: {len(body)}',
+                 'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        if etag:
+            lines += [f'ETag: {etag}', 'Cache-Control: no-cache', 'Vary: Accept-Encoding']
+        if encoded:
+            lines.append('Content-Encoding: gzip')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if body and not head_only and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8090):
+        self.server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        return self.server
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+
+def load_index(snapshot: str = SNAPSHOT_FILE, rebuild: bool = False, gas: str = GAS_GEOJSON,
+               cameras: str = CAMERAS_GEOJSON, villas: str = VILLAS_GEOJSON, store: str = None) -> QueryIndex:
+    """
+    Abre el snapshot; si no existe (o rebuild) lo arma desde el almacén de POIs
+    (almacen_poi.py) o, sin almacén, desde los GeoJSON, y lo guarda.
+    """
+    if not rebuild and os.path.exists(snapshot):
+        return QueryIndex.load(snapshot)
+    index = QueryIndex.from_pois(load_pois(store, gas, cameras, villas))
+    index.save(snapshot)
+    return index
+
+
+async def serve(index: QueryIndex, host: str, port: int):
+    server = QueryServer(index)
+    await server.start(host, port)
+    print(f"Sirviendo {len(index)} POIs en http://{host}:{server.port}/features", flush=True)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consultas por BBOX/zoom sobre la capa combinada del mapa.')
+    parser.add_argument('--snapshot', default=SNAPSHOT_FILE, help='Snapshot del índice (npz)')
+    parser.add_argument('--build', action='store_true', help='Sólo (re)construir el snapshot y salir')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruir el snapshot antes de servir')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    parser.add_argument('--store', default=None, help='Almacén de POIs (almacen_poi.py) en lugar de los GeoJSON')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    index = load_index(args.snapshot, args.build or args.rebuild, args.gas, args.cameras, args.villas, args.store)
+    print(f"✓ Índice: {len(index)} POIs {index.meta['counts']} en {(time.perf_counter() - t0) * 1000:.1f} ms")
+    if args.build:
+        print(f"✓ Snapshot guardado en: {args.snapshot}")
+        return
+    try:
+        asyncio.run(serve(index, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
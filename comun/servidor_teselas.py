@@ -0,0 +1,137 @@
+"""
+Servidor local de teselas para la pirámide generada por teselas_mvt.py.
+
+Sirve /{z}/{x}/{y}.pbf desde un MBTiles o un árbol de directorios (las teselas
+ya están en gzip, se envían con Content-Encoding: gzip) y /tiles.json con el
+TileJSON para apuntar una fuente 'vector' de MapLibre:
+
+    python comun/servidor_teselas.py dist/pois.mbtiles --port 8080
+    map.addSource('pois', { type: 'vector', url: 'http://localhost:8080/tiles.json' })
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TILE_RE = re.compile(r'^/(\d+)/(\d+)/(\d+)\.pbf$')
+
+
+class MBTilesSource:
+    """Lee teselas de un MBTiles (una conexión por hilo)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def metadata(self) -> dict:
+        return dict(self._conn().execute('SELECT name, value FROM metadata').fetchall())
+
+    def tile(self, z: int, x: int, y: int):
+        row = self._conn().execute(
+            'SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?',
+            (z, x, (1 << z) - 1 - y)).fetchone()
+        return row[0] if row else None
+
+
+class DirectorySource:
+    """Lee teselas de un árbol z/x/y.pbf."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def metadata(self) -> dict:
+        with open(os.path.join(self.path, 'metadata.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def tile(self, z: int, x: int, y: int):
+        try:
+            with open(os.path.join(self.path, str(z), str(x), f'{y}.pbf'), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+def open_source(path: str):
+    return DirectorySource(path) if os.path.isdir(path) else MBTilesSource(path)
+
+
+def tilejson(metadata: dict, base_url: str) -> dict:
+    info = {
+        'tilejson': '3.0.0',
+        'name': metadata.get('name'),
+        'tiles': [base_url + '/{z}/{x}/{y}.pbf'],
+        'minzoom': int(metadata.get('minzoom', 0)),
+        'maxzoom': int(metadata.get('maxzoom', 14)),
+    }
+    if metadata.get('bounds'):
+        info['bounds'] = [float(v) for v in metadata['bounds'].split(',')]
+    if metadata.get('json'):
+        info.update(json.loads(metadata['json']))
+    return info
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/tiles.json':
+            host = self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]
+            body = json.dumps(tilejson(self.server.source.metadata(), f'http://{host}')).encode('utf-8')
+            self._send(200, body, 'application/json')
+            return
+        m = TILE_RE.match(path)
+        if not m:
+            self._send(404, b'not found', 'text/plain')
+            return
+        data = self.server.source.tile(*(int(g) for g in m.groups()))
+        if data is None:
+            # Tesela vacía: 204 para que MapLibre no lo trate como error
+            self._send(204, b'', 'application/x-protobuf')
+            return
+        self._send(200, data, 'application/x-protobuf', gzip=True)
+
+    def _send(self, status, body, content_type, gzip=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sirve una pirámide MVT local.')
+    parser.add_argument('source', help='MBTiles o directorio generado por teselas_mvt.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), TileHandler)
+    server.daemon_threads = True
+    server.source = open_source(args.source)
+    print(f"Sirviendo {args.source} en http://{args.host}:{args.port}/tiles.json")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
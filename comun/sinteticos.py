@@ -0,0 +1,287 @@
+"""
+Generadores deterministas de datos sintéticos para los benchmarks de ingesta.
+
+Cada generador produce, para una cantidad n de registros (de 1k a 1M) y una
+semilla, el mismo archivo byte a byte, con la forma de la fuente real:
+
+  - gml_layer:         respuesta GetFeature del WFS de Energía (ms:<typename>)
+  - write_shapefile:   .dbf/.shp/.shx/.cpg de puntos con los campos del shapefile CABA
+  - pba_html:          página de MEDIDORESPBA.HTML con bloques receivedArr.push({...})
+  - cinemometros_rows: filas de cinemometros.csv (varias verificaciones por equipo)
+  - caba_csv:          camaras-fijas-de-control-vehicular.csv (';' y coma decimal)
+
+Las coordenadas caen dentro de Argentina y las direcciones se repiten como en
+los datos reales, para que la deduplicación y las cachés trabajen igual.
+
+    python comun/sinteticos.py --n 100000 --out /tmp/sinteticos
+"""
+import argparse
+import os
+import struct
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+# Caja aproximada de Argentina continental
+LON_RANGE = (-73.5, -53.6)
+LAT_RANGE = (-55.0, -21.8)
+# Sólo CABA, para las cámaras porteñas
+CABA_LON_RANGE = (-58.53, -58.36)
+CABA_LAT_RANGE = (-34.70, -34.53)
+
+PROVINCIAS = ['BUENOS AIRES', 'CORDOBA', 'SANTA FE', 'MENDOZA', 'TUCUMAN', 'ENTRE RIOS', 'SALTA',
+              'CHACO', 'CORRIENTES', 'MISIONES', 'NEUQUEN', 'RIO NEGRO', 'CHUBUT', 'SAN JUAN']
+BANDERAS = ['YPF', 'SHELL C.A.P.S.A.', 'AXION ENERGY', 'PUMA', 'BLANCA', 'GULF', 'REFINOR', 'DAPSA']
+TIPOS_OPERADOR = ['Combustibles líquidos únicamente', 'GNC únicamente', 'Combustibles líquidos y GNC']
+LOCALIDADES = ['CAPITAL', 'ROSARIO', 'LA PLATA', 'MAR DEL PLATA', 'SAN MIGUEL', 'VILLA MARIA',
+               'RESISTENCIA', 'PARANA', 'GODOY CRUZ', 'RIO CUARTO', 'BAHIA BLANCA', 'TANDIL']
+CALLES = ['AV. SAN MARTIN', 'BELGRANO', 'RIVADAVIA', 'AV. MITRE', 'SARMIENTO', '25 DE MAYO',
+          'AV. CORRIENTES', 'ITALIA', 'ESPAÑA', 'LAS HERAS', 'AV. LIBERTADOR', 'COLÓN']
+MARCAS = [('ANCA', 'NEO'), ('LUTEC', 'LT-200'), ('SICE', 'MS-2'), ('VIALSEG', 'TRACK-1')]
+CONDUCTAS = ['Semaforo rojo y senda peatonal', 'Exceso de velocidad', 'Giro indebido', 'Estacionamiento']
+
+WFS_NS = 'http://www.opengis.net/wfs'
+GML_NS = 'http://www.opengis.net/gml'
+MS_NS = 'http://mapserver.gis.umn.edu/mapserver'
+
+# Campos del shapefile CABA (mismos nombres y tipos que el real, anchos más chicos)
+CABA_DBF_FIELDS = [
+    ('Name', 'C', 60), ('descriptio', 'C', 200), ('timestamp', 'C', 24), ('begin', 'C', 24), ('end', 'C', 24),
+    ('altitudeMo', 'C', 10), ('tessellate', 'N', 10), ('extrude', 'N', 10), ('visibility', 'N', 10),
+    ('drawOrder', 'N', 10), ('icon', 'C', 10), ('Tipo_de_fi', 'C', 30), ('Latitud', 'C', 12),
+    ('Longitud', 'C', 12), ('Conducta_f', 'C', 40), ('unnamed__1', 'C', 10), ('unnamed__2', 'C', 10),
+    ('unnamed__3', 'C', 10),
+]
+
+
+def _rng(seed: int, salt: int) -> np.random.Generator:
+    return np.random.default_rng([seed, salt])
+
+
+def points(n: int, seed: int = 0, lon_range=LON_RANGE, lat_range=LAT_RANGE):
+    """(lon, lat) uniformes dentro de la caja, redondeadas a 6 decimales."""
+    rng = _rng(seed, 1)
+    return (np.round(rng.uniform(*lon_range, n), 6), np.round(rng.uniform(*lat_range, n), 6))
+
+
+def _pick(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(len(values), size=n)]
+
+
+def street_addresses(n: int, seed: int = 0):
+    rng = _rng(seed, 2)
+    calles = _pick(rng, CALLES, n)
+    numeros = rng.integers(1, 5000, n)
+    return [f"{c} {k}" for c, k in zip(calles, numeros)]
+
+
+def gml_layer(n: int, typename: str = 'res1104_mmino_eess', seed: int = 0) -> list:
+    """
+    Los n gml:featureMember de una capa del WFS, ya serializados (bytes), en el
+    formato que devuelve MapServer. Unir con gml_document() para una respuesta completa.
+    """
+    rng = _rng(seed, 3)
+    lon, lat = points(n, seed)
+    operador = _pick(rng, TIPOS_OPERADOR, n)
+    bandera = _pick(rng, BANDERAS, n)
+    provincia = _pick(rng, PROVINCIAS, n)
+    localidad = _pick(rng, LOCALIDADES, n)
+    direccion = street_addresses(n, seed)
+    cuit = rng.integers(20_000_000_000, 34_000_000_000, n)
+    members = []
+    for i in range(n):
+        members.append((
+            f'<gml:featureMember><ms:{typename}>'
+            f'<ms:msGeometry><gml:Point><gml:coordinates>{lon[i]},{lat[i]}</gml:coordinates></gml:Point></ms:msGeometry>'
+            f'<ms:tipooperador>{operador[i]}</ms:tipooperador>'
+            f'<ms:empresabandera>{escape(bandera[i])}</ms:empresabandera>'
+            f'<ms:razonsocial>ESTACION {i} S.A.</ms:razonsocial>'
+            f'<ms:cuit>{str(cuit[i])[:2]}-{str(cuit[i])[2:10]}-{str(cuit[i])[10]}</ms:cuit>'
+            f'<ms:direccion>{escape(direccion[i])}</ms:direccion>'
+            f'<ms:localidad>{localidad[i]}</ms:localidad>'
+            f'<ms:provincia>{provincia[i]}</ms:provincia>'
+            f'</ms:{typename}></gml:featureMember>\n').encode('utf-8'))
+    return members
+
+
+def gml_document(members) -> bytes:
+    head = (f'<?xml version="1.0" encoding="UTF-8"?>\n<wfs:FeatureCollection xmlns:wfs="{WFS_NS}" '
+            f'xmlns:gml="{GML_NS}" xmlns:ms="{MS_NS}">\n').encode('utf-8')
+    return head + b''.join(members) + b'</wfs:FeatureCollection>\n'
+
+
+def caba_records(n: int, seed: int = 0) -> pd.DataFrame:
+    """Atributos de n cámaras CABA con los campos del DBF (todo texto, como en el shapefile)."""
+    rng = _rng(seed, 4)
+    lon, lat = points(n, seed, CABA_LON_RANGE, CABA_LAT_RANGE)
+    conducta = _pick(rng, CONDUCTAS, n)
+    tipo = _pick(rng, ['Analítica de video', 'Cinemómetro', 'Fotomulta'], n)
+    speed = _pick(rng, ['', '40', '60', '70'], n)
+    names = street_addresses(n, seed)
+    desc = [f"Tipo de fiscalizador: {t}<br>Velocidad permitida: {s} km/h<br>Conducta fiscalizada: {c}"
+            if s else f"Tipo de fiscalizador: {t}<br>Conducta fiscalizada: {c}"
+            for t, s, c in zip(tipo, speed, conducta)]
+    df = pd.DataFrame({name: '' for name, _, _ in CABA_DBF_FIELDS}, index=range(n))
+    df['Name'] = names
+    df['descriptio'] = desc
+    df['tessellate'] = '-1'
+    df['extrude'] = '0'
+    df['visibility'] = '-1'
+    df['drawOrder'] = '**********'
+    df['Tipo_de_fi'] = tipo
+    df['Latitud'] = [f"{v:.6f}" for v in lat]
+    df['Longitud'] = [f"{v:.6f}" for v in lon]
+    df['Conducta_f'] = conducta
+    return df
+
+
+def write_dbf(path: str, df: pd.DataFrame, fields=CABA_DBF_FIELDS, encoding: str = 'utf-8'):
+    """dBase III con campos de ancho fijo; los valores se truncan o rellenan con espacios."""
+    n = len(df)
+    record_len = 1 + sum(width for _, _, width in fields)
+    header_len = 32 + 32 * len(fields) + 1
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<BBBBIHH20x', 3, 124, 1, 1, n, header_len, record_len))
+        for name, kind, width in fields:
+            f.write(struct.pack('<11sc4xBB14x', name.encode('ascii'), kind.encode('ascii'), width, 0))
+        f.write(b'\x0D')
+        table = np.zeros(n, dtype=[('_deleted', 'S1')] + [(name, f'S{width}') for name, _, width in fields])
+        table['_deleted'] = b' '
+        for name, kind, width in fields:
+            encoded = [v.encode(encoding)[:width] for v in df[name].astype(str)]
+            if kind in 'NF':
+                table[name] = [v.rjust(width) for v in encoded]
+            else:
+                table[name] = [v.ljust(width) for v in encoded]
+        f.write(table.tobytes())
+        f.write(b'\x1A')
+
+
+def write_shapefile(stem: str, n: int, seed: int = 0) -> str:
+    """Escribe stem.dbf/.shp/.shx/.cpg con n cámaras CABA; devuelve la ruta del .dbf."""
+    df = caba_records(n, seed)
+    lon = df['Longitud'].astype(float).to_numpy()
+    lat = df['Latitud'].astype(float).to_numpy()
+    bbox = (lon.min(), lat.min(), lon.max(), lat.max()) if n else (0.0, 0.0, 0.0, 0.0)
+
+    def header(length_words):
+        return (struct.pack('>i20xi', 9994, length_words) + struct.pack('<ii4d4d', 1000, 1, *bbox, 0, 0, 0, 0))
+
+    shp = np.zeros(n, dtype=[('num', '>i4'), ('len', '>i4'), ('type', '<i4'), ('x', '<f8'), ('y', '<f8')])
+    shp['num'] = np.arange(1, n + 1)
+    shp['len'] = 10
+    shp['type'] = 1
+    shp['x'], shp['y'] = lon, lat
+    shx = np.zeros(n, dtype=[('offset', '>i4'), ('len', '>i4')])
+    shx['offset'] = (100 + 28 * np.arange(n)) // 2
+    shx['len'] = 10
+
+    with open(stem + '.shp', 'wb') as f:
+        f.write(header((100 + 28 * n) // 2))
+        f.write(shp.tobytes())
+    with open(stem + '.shx', 'wb') as f:
+        f.write(header((100 + 8 * n) // 2))
+        f.write(shx.tobytes())
+    with open(stem + '.cpg', 'w', encoding='ascii') as f:
+        f.write('UTF-8')
+    write_dbf(stem + '.dbf', df)
+    return stem + '.dbf'
+
+
+def pba_html(path: str, n: int, seed: int = 0):
+    """Página con n bloques receivedArr.push({...}) como MEDIDORESPBA.HTML."""
+    rng = _rng(seed, 5)
+    lon, lat = points(n, seed, (-63.4, -56.7), (-41.0, -33.3))
+    rutas = [f"Ruta Provincial {k}" for k in rng.integers(1, 100, max(1, n // 8))]
+    ruta = _pick(rng, rutas, n)
+    sentido = _pick(rng, ['Ascendente', 'Descendente'], n)
+    speed = _pick(rng, ['', '60', '80', '100', '110'], n)
+    km = rng.integers(1, 600, n)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><head><title>Medidores PBA</title></head><body>\n<script>var receivedArr = [];</script>\n')
+        for i in range(n):
+            f.write(f'''<script>
+    receivedArr.push({{
+        nroSerie: "SYN_{i:07d}",
+        calleRuta: "{ruta[i]}",
+        velocidadPermitida: "{speed[i]}",
+        sentido: "{sentido[i]}",
+        latitud: "{lat[i]}",
+        longitud: "{lon[i]}",
+        // nroKilometro: "{km[i]}",
+    }})
+</script>
+''')
+        f.write('</body></html>\n')
+
+
+def cinemometros_rows(n: int, seed: int = 0, locate: bool = False) -> pd.DataFrame:
+    """
+    n filas de cinemometros.csv: un equipo cada ~4 filas (verificaciones
+    anuales) y ~20 filas por dirección. Con locate=True agrega lat/lon y
+    formatted_address como cinemometros_geocoded.
+    """
+    rng = _rng(seed, 6)
+    n_addresses = max(1, n // 20)
+    provincia = _pick(rng, PROVINCIAS, n_addresses)
+    localidad = _pick(rng, LOCALIDADES, n_addresses)
+    rutas = rng.integers(1, 300, n_addresses)
+    kms = rng.integers(0, 2000, n_addresses) + rng.integers(0, 10, n_addresses) / 10
+    addresses = np.asarray([f"Ruta Nacional N° {r} - km {str(k).replace('.', ',')}, en jurisdicción de la "
+                            f"localidad de {l.title()}, provincia de {p.title()}"
+                            for r, k, l, p in zip(rutas, kms, localidad, provincia)], dtype=object)
+    device = np.arange(n) // 4
+    address_of_device = rng.integers(n_addresses, size=device[-1] + 1 if n else 0)
+    marca = rng.integers(len(MARCAS), size=device[-1] + 1 if n else 0)
+    fechas = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, n), unit='D')
+    df = pd.DataFrame({
+        'marca': [MARCAS[m][0] for m in marca[device]],
+        'modelo': [MARCAS[m][1] for m in marca[device]],
+        'nro_de_serie': [f"SYN-{d:07d}" for d in device],
+        'lugar_de_instalacion': addresses[address_of_device[device]],
+        'fecha_de_verificacion': fechas.strftime('%Y-%m-%d'),
+        'tipo': _pick(rng, ['Fijo', 'Móvil'], n),
+    })
+    if locate:
+        lon, lat = points(n_addresses, seed)
+        idx = address_of_device[device]
+        df['lat'] = lat[idx]
+        df['lon'] = lon[idx]
+        df['formatted_address'] = df['lugar_de_instalacion'] + ' (synthetic)'
+    return df
+
+
+def caba_csv(path: str, n: int, seed: int = 0):
+    """camaras-fijas-de-control-vehicular.csv: ';' como separador y coma decimal."""
+    rng = _rng(seed, 7)
+    lon, lat = points(n, seed + 1, CABA_LON_RANGE, CABA_LAT_RANGE)
+    df = pd.DataFrame({
+        'tipo_de_fiscalizador': _pick(rng, ['Analitica de video', 'Cinemometro'], n),
+        'ubicacion': street_addresses(n, seed + 1),
+        'latitud': [f"{v:.7f}".replace('.', ',') for v in lat],
+        'longitud': [f"{v:.7f}".replace('.', ',') for v in lon],
+    })
+    df.to_csv(path, sep=';', index=False, encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos de todas las fuentes.')
+    parser.add_argument('--n', type=int, default=10000, help='Registros por fuente')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help='Directorio de salida')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join(args.out, 'caba'), exist_ok=True)
+    for layer in ('res1104_mmino_eess', 'res1104_mmino_dist'):
+        with open(os.path.join(args.out, f'{layer}.xml'), 'wb') as f:
+            f.write(gml_document(gml_layer(args.n, layer, args.seed + (layer == 'res1104_mmino_dist'))))
+    write_shapefile(os.path.join(args.out, 'caba', 'camaras-fijas-de-control-vehicular'), args.n, args.seed)
+    pba_html(os.path.join(args.out, 'MEDIDORESPBA.HTML'), args.n, args.seed)
+    cinemometros_rows(args.n, args.seed).to_csv(os.path.join(args.out, 'cinemometros.csv'), index=False)
+    caba_csv(os.path.join(args.out, 'camaras-fijas-de-control-vehicular.csv'), args.n, args.seed)
+    print(f"✓ {args.n} registros por fuente en {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Pirámide de teselas vectoriales (Mapbox Vector Tiles) para la capa combinada de POIs.
+
+Toma las salidas de extraer_wfs.py, merge_cameras.py y los polígonos de villas
+(ver poi_data.load_merged_pois) y genera las teselas z0–z14 de una capa 'pois'.
+Cada punto conserva los atributos de TILE_ATTRIBUTES (type, fuel_type,
+velocidadPermitida). Cuando una tesela tendría más de MAX_POINTS_PER_TILE
+puntos, éstos se agregan en una grilla de AGG_GRID x AGG_GRID celdas y cada
+celda se emite como un punto con point_count y los conteos gas/cam/villa (los
+mismos nombres que usa clusterProperties en test1.html). Así el tamaño de cada
+tesela queda acotado sin importar el tamaño del dataset nacional.
+
+La codificación protobuf está hecha a mano (sólo geometrías POINT), sin
+dependencias externas. La salida puede ser un MBTiles o un árbol z/x/y.pbf:
+
+    python comun/teselas_mvt.py --format mbtiles --out dist/pois.mbtiles
+    python comun/servidor_teselas.py dist/pois.mbtiles
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import sqlite3
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from poi_data import load_merged_pois, GAS_GEOJSON, CAMERAS_GEOJSON, VILLAS_GEOJSON
+
+EXTENT = 4096
+LAYER_NAME = 'pois'
+MIN_ZOOM = 0
+MAX_ZOOM = 14
+MAX_POINTS_PER_TILE = 500
+AGG_GRID = 64
+TILE_ATTRIBUTES = ('type', 'fuel_type', 'velocidadPermitida')
+COUNT_ATTRIBUTES = {'gas': 'gas', 'camera': 'cam', 'villa': 'villa'}
+MAX_LAT = 85.0511287798
+
+
+# --- Codificación protobuf -------------------------------------------------
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _key(field: int, wire: int) -> bytes:
+    return _varint((field << 3) | wire)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values) -> bytes:
+    return _bytes_field(field, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+
+def encode_point_layer(name: str, features, extent: int = EXTENT) -> bytes:
+    """
+    Codifica una capa MVT de puntos.
+
+    Args:
+        name: Nombre de la capa
+        features: Iterable de (id o None, x, y, {atributo: valor}) en coordenadas de tesela
+        extent: Extensión de la tesela
+
+    Returns:
+        Mensaje Layer serializado
+    """
+    keys, values = {}, {}
+    body = []
+    for fid, x, y, attrs in features:
+        tags = []
+        for k, v in attrs.items():
+            if v is None or v == '':
+                continue
+            ki = keys.setdefault(k, len(keys))
+            vkey = (type(v).__name__, v)
+            vi = values.setdefault(vkey, len(values))
+            tags.extend((ki, vi))
+        feat = b''
+        if fid is not None:
+            feat += _key(1, 0) + _varint(int(fid))
+        if tags:
+            feat += _packed(2, tags)
+        feat += _key(3, 0) + _varint(1)  # GeomType.POINT
+        feat += _packed(4, (9, _zigzag(int(x)), _zigzag(int(y))))  # MoveTo(1)
+        body.append(_bytes_field(2, feat))
+
+    layer = _key(15, 0) + _varint(2) + _bytes_field(1, name.encode('utf-8'))
+    layer += b''.join(body)
+    layer += b''.join(_bytes_field(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_bytes_field(4, _encode_value(v)) for _, v in values)
+    layer += _key(5, 0) + _varint(extent)
+    return layer
+
+
+def encode_tile(layers) -> bytes:
+    """Arma un Tile con las capas ya codificadas por encode_point_layer."""
+    return b''.join(_bytes_field(3, layer) for layer in layers)
+
+
+# --- Pirámide ----------------------------------------------------------------
+
+def project(lon: np.ndarray, lat: np.ndarray):
+    """Proyecta a Web Mercator normalizado en [0, 1) (x hacia el este, y hacia el sur)."""
+    lat = np.clip(lat, -MAX_LAT, MAX_LAT)
+    x = (lon + 180.0) / 360.0
+    s = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+
+def _tile_attributes(props: dict, attributes) -> dict:
+    return {a: props.get(a) for a in attributes if props.get(a) not in (None, '')}
+
+
+def build_zoom(z: int, mx: np.ndarray, my: np.ndarray, types: np.ndarray, props,
+               attributes=TILE_ATTRIBUTES, max_points: int = MAX_POINTS_PER_TILE,
+               grid: int = AGG_GRID):
+    """
+    Genera las teselas de un nivel de zoom.
+
+    Yields:
+        (z, x, y, bytes del tile sin comprimir)
+    """
+    world = (1 << z) * EXTENT
+    px = np.minimum((mx * world).astype(np.int64), world - 1)
+    py = np.minimum((my * world).astype(np.int64), world - 1)
+    tx, ty = px // EXTENT, py // EXTENT
+    lx, ly = px - tx * EXTENT, py - ty * EXTENT
+
+    tile_key = tx * (1 << z) + ty
+    order = np.argsort(tile_key, kind='stable')
+    keys_sorted = tile_key[order]
+    bounds = np.flatnonzero(np.diff(keys_sorted)) + 1
+    for group in np.split(order, bounds):
+        if not len(group):
+            continue
+        x, y = int(tx[group[0]]), int(ty[group[0]])
+        if len(group) <= max_points:
+            feats = ((i + 1, lx[i], ly[i], _tile_attributes(props[i], attributes)) for i in group)
+        else:
+            feats = _aggregate(lx[group], ly[group], types[group], grid)
+        yield z, x, y, encode_tile([encode_point_layer(LAYER_NAME, feats)])
+
+
+def _aggregate(lx, ly, types, grid):
+    """Agrega puntos por celda de grilla; cada celda sale en el centroide de sus puntos."""
+    cell = EXTENT // grid
+    cid = (lx // cell) * grid + (ly // cell)
+    uniq, inverse = np.unique(cid, return_inverse=True)
+    n = len(uniq)
+    count = np.bincount(inverse, minlength=n)
+    cx = np.bincount(inverse, weights=lx, minlength=n) / count
+    cy = np.bincount(inverse, weights=ly, minlength=n) / count
+    per_type = {attr: np.bincount(inverse, weights=(types == t), minlength=n).astype(int)
+                for t, attr in COUNT_ATTRIBUTES.items()}
+    for j in range(n):
+        attrs = {'point_count': int(count[j])}
+        attrs.update({attr: int(v[j]) for attr, v in per_type.items()})
+        yield None, cx[j], cy[j], attrs
+
+
+def build_pyramid(pois: dict, min_zoom: int = MIN_ZOOM, max_zoom: int = MAX_ZOOM,
+                  attributes=TILE_ATTRIBUTES, max_points: int = MAX_POINTS_PER_TILE,
+                  grid: int = AGG_GRID):
+    """
+    Genera todas las teselas de la pirámide.
+
+    Args:
+        pois: Resultado de poi_data.load_merged_pois
+        min_zoom, max_zoom: Rango de zooms
+        attributes: Atributos que se copian a cada punto
+        max_points: Puntos individuales máximos por tesela antes de agregar
+        grid: Celdas por lado de la grilla de agregación
+
+    Yields:
+        (z, x, y, bytes del tile sin comprimir)
+    """
+    mx, my = project(pois['lon'], pois['lat'])
+    for z in range(min_zoom, max_zoom + 1):
+        yield from build_zoom(z, mx, my, pois['type'], pois['props'], attributes, max_points, grid)
+
+
+# --- Salidas -------------------------------------------------------------------
+
+def _metadata(pois: dict, min_zoom: int, max_zoom: int, attributes) -> dict:
+    lon, lat = pois['lon'], pois['lat']
+    bounds = [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())] if len(lon) else [-180, -85, 180, 85]
+    fields = {a: 'String' for a in attributes}
+    fields.update({'point_count': 'Number', **{v: 'Number' for v in COUNT_ATTRIBUTES.values()}})
+    return {
+        'name': 'MapNFS POIs',
+        'format': 'pbf',
+        'minzoom': str(min_zoom),
+        'maxzoom': str(max_zoom),
+        'bounds': ','.join(str(b) for b in bounds),
+        'center': f'{(bounds[0] + bounds[2]) / 2},{(bounds[1] + bounds[3]) / 2},{min(max_zoom, 4)}',
+        'json': json.dumps({'vector_layers': [{'id': LAYER_NAME, 'fields': fields,
+                                               'minzoom': min_zoom, 'maxzoom': max_zoom}]}),
+    }
+
+
+def write_mbtiles(path: str, tiles, metadata: dict) -> int:
+    """Escribe las teselas (gzip) en un MBTiles; devuelve la cantidad escrita."""
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+    conn.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+    conn.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+    conn.executemany('INSERT INTO metadata VALUES (?, ?)', metadata.items())
+    count = 0
+    for z, x, y, data in tiles:
+        # MBTiles usa filas TMS (origen abajo)
+        conn.execute('INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                     (z, x, (1 << z) - 1 - y, gzip.compress(data, mtime=0)))
+        count += 1
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+    return count
+
+
+def write_directory(path: str, tiles, metadata: dict) -> int:
+    """Escribe las teselas (gzip) como path/z/x/y.pbf más path/metadata.json."""
+    count = 0
+    for z, x, y, data in tiles:
+        tile_dir = os.path.join(path, str(z), str(x))
+        os.makedirs(tile_dir, exist_ok=True)
+        with open(os.path.join(tile_dir, f'{y}.pbf'), 'wb') as f:
+            f.write(gzip.compress(data, mtime=0))
+        count += 1
+    with open(os.path.join(path, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera la pirámide MVT de la capa combinada de POIs.')
+    parser.add_argument('--out', default=os.path.join('dist', 'pois.mbtiles'), help='MBTiles o directorio de salida')
+    parser.add_argument('--format', choices=['mbtiles', 'dir'], default='mbtiles')
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM)
+    parser.add_argument('--max-points', type=int, default=MAX_POINTS_PER_TILE,
+                        help='Puntos individuales por tesela antes de agregar en grilla')
+    parser.add_argument('--gas', default=GAS_GEOJSON)
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--villas', default=VILLAS_GEOJSON)
+    args = parser.parse_args()
+
+    pois = load_merged_pois(args.gas, args.cameras, args.villas)
+    print(f"POIs cargados: {len(pois['lon'])}")
+
+    tiles = build_pyramid(pois, args.min_zoom, args.max_zoom, max_points=args.max_points)
+    metadata = _metadata(pois, args.min_zoom, args.max_zoom, TILE_ATTRIBUTES)
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    os.makedirs(out_dir, exist_ok=True)
+    if args.format == 'mbtiles':
+        count = write_mbtiles(args.out, tiles, metadata)
+    else:
+        count = write_directory(args.out, tiles, metadata)
+    print(f"✓ {count} teselas z{args.min_zoom}-z{args.max_zoom} guardadas en: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
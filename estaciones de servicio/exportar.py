@@ -0,0 +1,171 @@
+"""
+Exportación en paralelo de las estaciones de servicio (CSV, XLSX, GeoJSON, JSON).
+
+Parte de la copia tipada que deja extraer_wfs.py (estaciones_servicio_argentina.parquet):
+la decodifica una sola vez a un snapshot Arrow IPC sin comprimir, y cada
+formato se escribe en su propio proceso, que mapea ese snapshot en memoria en
+modo sólo lectura. Los procesos leen la tabla Arrow sobre el mapeo sin volver a
+parsearla y la recorren de a BATCH_ROWS filas: sólo el bloque actual se convierte
+a pandas/Python, así ningún proceso arma una copia privada de todas las columnas.
+El XLSX se escribe con openpyxl en modo write-only, fila por fila, sin armar la
+hoja en memoria.
+
+Cada salida se escribe en un temporal y se renombra al final, así el mapa nunca
+descarga un GeoJSON a medio escribir. Al terminar se informa tiempo y tamaño por
+formato:
+
+    python exportar.py
+    python exportar.py --formats geojson json --serial
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from geojson_writer import write_point_chunks, write_record_chunks
+from intermedios import read_arrow
+
+SNAPSHOT_FILE = 'estaciones_servicio_argentina.parquet'
+BASE_NAME = 'estaciones_servicio_argentina'
+FORMATOS = ['csv', 'xlsx', 'geojson', 'json']
+SHEET_NAME = 'Sheet1'   # el mismo nombre que ponía DataFrame.to_excel
+BATCH_ROWS = 5000       # filas convertidas por vez en cada proceso
+COORDS = ['Longitude', 'Latitude']
+
+
+class Resultado(NamedTuple):
+    formato: str
+    path: str
+    filas: int
+    segundos: float
+    bytes: int
+
+
+def _load_snapshot(path: str) -> pa.Table:
+    """Tabla Arrow sobre el snapshot IPC mapeado en memoria (sin copiar los buffers)."""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _frames(table: pa.Table):
+    """DataFrames de a BATCH_ROWS filas; cada uno se libera antes de convertir el siguiente."""
+    for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+        yield batch.to_pandas()
+
+
+def _write_csv(table, path):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        for i, df in enumerate(_frames(table)):
+            df.to_csv(f, header=i == 0, index=False)
+        if not table.num_rows:
+            f.write(','.join(table.column_names) + '\n')
+    return table.num_rows
+
+
+def _write_xlsx(table, path):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET_NAME)
+    ws.append(table.column_names)
+    # to_pylist deja None para los nulos: celdas vacías, como to_excel
+    for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            ws.append(row)
+    wb.save(path)
+    return table.num_rows
+
+
+def _write_geojson(table, path):
+    chunks = ((df['Longitude'], df['Latitude'], df.drop(columns=COORDS)) for df in _frames(table))
+    return write_point_chunks(path, chunks)
+
+
+def _write_json(table, path):
+    return write_record_chunks(path, _frames(table))
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'xlsx': _write_xlsx,
+    'geojson': _write_geojson,
+    'json': _write_json,
+}
+
+
+def export_format(formato: str, snapshot: str, out_dir: str = '.') -> Resultado:
+    """
+    Escribe un formato a partir del snapshot: primero a un temporal en el mismo
+    directorio y después os.replace() sobre el destino.
+    """
+    start = time.perf_counter()
+    table = _load_snapshot(snapshot)
+    path = os.path.join(out_dir, f'{BASE_NAME}.{formato}')
+    tmp = os.path.join(out_dir, f'{BASE_NAME}.tmp.{formato}')
+    try:
+        filas = WRITERS[formato](table, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return Resultado(formato, path, filas, time.perf_counter() - start, os.path.getsize(path))
+
+
+def export_all(source: str = SNAPSHOT_FILE, formatos=FORMATOS, out_dir: str = '.',
+               parallel: bool = True) -> list:
+    """
+    Exporta `formatos` desde el Parquet `source`.
+
+    Args:
+        source: Copia tipada de las estaciones (esquema 'estaciones')
+        formatos: Subconjunto de FORMATOS
+        out_dir: Directorio de salida
+        parallel: Un proceso por formato; False los escribe uno tras otro
+
+    Returns:
+        Lista de Resultado, en el orden de `formatos`
+    """
+    unknown = [f for f in formatos if f not in WRITERS]
+    if unknown:
+        raise ValueError(f"Formatos desconocidos: {unknown}")
+    table = read_arrow(source, 'estaciones')
+
+    with tempfile.TemporaryDirectory(prefix='exportar-') as tmp_dir:
+        snapshot = os.path.join(tmp_dir, 'estaciones.arrow')
+        with pa.OSFile(snapshot, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        if parallel and len(formatos) > 1:
+            with ProcessPoolExecutor(max_workers=len(formatos)) as pool:
+                futures = [pool.submit(export_format, f, snapshot, out_dir) for f in formatos]
+                return [future.result() for future in futures]
+        return [export_format(f, snapshot, out_dir) for f in formatos]
+
+
+def print_report(resultados, total: float = None):
+    for r in resultados:
+        print(f"✓ {r.formato:<8} {r.filas:>7} filas  {r.segundos:6.2f} s  {r.bytes / 1e6:7.2f} MB  -> {r.path}")
+    if total is not None:
+        print(f"  total    {total:.2f} s (suma por formato {sum(r.segundos for r in resultados):.2f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta las estaciones de servicio a CSV, XLSX, GeoJSON y JSON.')
+    parser.add_argument('--source', default=SNAPSHOT_FILE, help=f'Parquet de entrada (default {SNAPSHOT_FILE})')
+    parser.add_argument('--formats', nargs='*', default=FORMATOS, choices=FORMATOS, help='Formatos a generar')
+    parser.add_argument('--out', default='.', help='Directorio de salida')
+    parser.add_argument('--serial', action='store_true', help='Escribir los formatos uno tras otro, en este proceso')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    resultados = export_all(args.source, args.formats, args.out, parallel=not args.serial)
+    print_report(resultados, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
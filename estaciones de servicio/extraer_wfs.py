@@ -1,35 +1,214 @@
 import requests
 import xml.etree.ElementTree as ET
 import pandas as pd
-import json
-from typing import List, Dict, Tuple
+import os
+import sys
+import argparse
+import time
+from typing import List, Dict, Tuple, Iterator, IO
 
-def extract_wfs_data(typename: str) -> pd.DataFrame:
+from wfs_fetch import (WFS_URL, REQUEST_TIMEOUT, CACHE_DIR, get_session, fetch_layer,
+                       load_exported, mark_exported, clear_exported)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from intermedios import write_table
+from exportar import export_all, print_report
+
+NAMESPACES = {
+    'gml': 'http://www.opengis.net/gml',
+    'ms': 'http://mapserver.gis.umn.edu/mapserver',
+    'wfs': 'http://www.opengis.net/wfs'
+}
+
+# Atributos de cada feature que se vuelcan al DataFrame (en este orden)
+CAMPOS = ['tipooperador', 'empresabandera', 'razonsocial', 'cuit',
+          'direccion', 'localidad', 'provincia']
+COLUMNAS = CAMPOS + ['Longitude', 'Latitude']
+
+# Nodos GML que pueden contener coordenadas, en orden de preferencia
+COORD_TAGS = tuple(f"{{{NAMESPACES['gml']}}}{t}" for t in ('coordinates', 'pos', 'posList'))
+
+LAYERS = ['res1104_mmino_eess', 'res1104_mmino_dist']
+
+OUTPUT_FILES = [
+    'estaciones_servicio_argentina.csv',
+    'estaciones_servicio_argentina.xlsx',
+    'estaciones_servicio_argentina.geojson',
+    'estaciones_servicio_argentina.json',
+]
+# Copia tipada que leen las etapas siguientes; los archivos de OUTPUT_FILES son exportaciones
+# (ver exportar.py)
+SNAPSHOT_FILE = 'estaciones_servicio_argentina.parquet'
+
+# Tamaño de página por defecto para el modo streaming (maxFeatures)
+PAGE_SIZE = 1000
+
+
+def _parse_coords_text(text: str) -> Tuple[float, float]:
+    txt = text.strip()
+    # Algunos GML usan coma, otros espacio. Normalizar a separador por espacios
+    if ',' in txt and ' ' not in txt:
+        parts = [p.strip() for p in txt.split(',') if p.strip()]
+    else:
+        # reemplazar comas por espacios y dividir por cualquier whitespace
+        parts = [p for p in txt.replace(',', ' ').split() if p]
+    if len(parts) >= 2:
+        try:
+            lon = float(parts[0])
+            lat = float(parts[1])
+            return lon, lat
+        except Exception:
+            try:
+                lon = float(parts[-2]); lat = float(parts[-1])
+                return lon, lat
+            except Exception:
+                return None, None
+    return None, None
+
+
+def iter_wfs_records(source: IO[bytes], typename: str) -> Iterator[Dict]:
+    """
+    Recorre una respuesta GetFeature con iterparse y genera un registro por feature.
+
+    Cada elemento ms:<typename> se libera apenas se emite su registro, de modo
+    que nunca hay más de un feature en memoria.
+
+    Args:
+        source: Archivo o stream binario con el XML (p.ej. response.raw)
+        typename: Nombre de la capa WFS
+
+    Yields:
+        Diccionarios con las claves de COLUMNAS
+    """
+    feature_tag = f"{{{NAMESPACES['ms']}}}{typename}"
+    field_tags = {f"{{{NAMESPACES['ms']}}}{campo}": campo for campo in CAMPOS}
+
+    context = ET.iterparse(source, events=('start', 'end'))
+    _, root = next(context)
+
+    record = None
+    coord_rank = len(COORD_TAGS)
+    for event, elem in context:
+        tag = elem.tag
+        if event == 'start':
+            if tag == feature_tag:
+                record = dict.fromkeys(COLUMNAS)
+                found = set()
+                coord_rank = len(COORD_TAGS)
+            continue
+
+        if record is None:
+            continue
+
+        if tag == feature_tag:
+            yield record
+            record = None
+            # Liberar el feature ya emitido (y su featureMember contenedor)
+            elem.clear()
+            root.clear()
+        elif tag in field_tags:
+            # Igual que find('.//campo'): gana la primera aparición
+            campo = field_tags[tag]
+            if campo not in found:
+                found.add(campo)
+                record[campo] = elem.text
+        elif tag in COORD_TAGS:
+            rank = COORD_TAGS.index(tag)
+            if rank < coord_rank and elem.text and elem.text.strip():
+                coord_rank = rank
+                record['Longitude'], record['Latitude'] = _parse_coords_text(elem.text)
+
+
+def iter_wfs_pages(typename: str, page_size: int = PAGE_SIZE,
+                   session: requests.Session = None, base_url: str = WFS_URL) -> Iterator[Dict]:
+    """
+    Pagina una capa WFS con maxFeatures/startIndex leyendo cada respuesta en streaming.
+
+    Args:
+        typename: Nombre de la capa WFS
+        page_size: Cantidad de features pedidas por página
+        session: Sesión HTTP a reutilizar (por defecto la compartida)
+        base_url: URL del servicio WFS
+
+    Yields:
+        Diccionarios con las claves de COLUMNAS
+    """
+    http = session or get_session()
+    start = 0
+    first_prev = None
+    while True:
+        params = {
+            'VERSION': '1.0.0',
+            'SERVICE': 'WFS',
+            'REQUEST': 'GetFeature',
+            'TYPENAME': typename,
+            'MAXFEATURES': page_size,
+            'STARTINDEX': start,
+        }
+        count = 0
+        first = None
+        with http.get(base_url, params=params, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            for record in iter_wfs_records(response.raw, typename):
+                if count == 0:
+                    first = record
+                    # Si el servidor ignora STARTINDEX devuelve siempre la misma página
+                    if first_prev is not None and record == first_prev:
+                        print(f"⚠ El servidor ignora STARTINDEX en {typename}; se corta la paginación")
+                        return
+                count += 1
+                yield record
+        if count < page_size:
+            break
+        first_prev = first
+        start += count
+
+
+def read_cached_layer(path: str, typename: str) -> pd.DataFrame:
+    """
+    Parsea en streaming un GetFeature guardado en disco por fetch_layer.
+
+    Args:
+        path: Ruta al XML cacheado
+        typename: Nombre de la capa WFS
+
+    Returns:
+        DataFrame con las columnas de COLUMNAS
+    """
+    with open(path, 'rb') as f:
+        return pd.DataFrame.from_records(iter_wfs_records(f, typename), columns=COLUMNAS)
+
+
+def extract_wfs_data(typename: str, streaming: bool = False,
+                     page_size: int = PAGE_SIZE, base_url: str = WFS_URL) -> pd.DataFrame:
     """
     Extrae datos de un servicio WFS y los convierte a DataFrame
     
     Args:
         typename: Nombre de la capa WFS (res1104_mmino_eess o res1104_mmino_dist)
+        streaming: Si es True, pagina la capa y la parsea de forma incremental
+        page_size: Features por página en modo streaming
+        base_url: URL del servicio WFS
     
     Returns:
         DataFrame con los datos procesados
     """
+    if streaming:
+        return pd.DataFrame.from_records(iter_wfs_pages(typename, page_size, base_url=base_url),
+                                         columns=COLUMNAS)
+
     # Construir URL
-    url = f"https://sig.energia.gob.ar/wmspubmap?VERSION=1.0.0&SERVICE=WFS&REQUEST=GetFeature&TYPENAME={typename}"
+    url = f"{base_url}?VERSION=1.0.0&SERVICE=WFS&REQUEST=GetFeature&TYPENAME={typename}"
     
     # Realizar petición
-    response = requests.get(url)
+    response = get_session().get(url, timeout=REQUEST_TIMEOUT)
     response.encoding = 'utf-8'
     
     # Parsear XML
     root = ET.fromstring(response.content)
     
-    # Definir namespaces
-    namespaces = {
-        'gml': 'http://www.opengis.net/gml',
-        'ms': 'http://mapserver.gis.umn.edu/mapserver',
-        'wfs': 'http://www.opengis.net/wfs'
-    }
+    namespaces = NAMESPACES
     
     # Extraer features
     features = root.findall(f'.//{{{namespaces["ms"]}}}{typename}', namespaces)
@@ -38,33 +217,12 @@ def extract_wfs_data(typename: str) -> pd.DataFrame:
     
     def _find_coord_element(f):
         # Buscar distintos nodos de GML que puedan contener coordenadas
-        for tag in ("{http://www.opengis.net/gml}coordinates", "{http://www.opengis.net/gml}pos", "{http://www.opengis.net/gml}posList"):
+        for tag in COORD_TAGS:
             el = f.find('.//' + tag)
             if el is not None and (el.text and el.text.strip()):
                 return el
         return None
 
-    def _parse_coords_text(text: str) -> Tuple[float, float]:
-        txt = text.strip()
-        # Algunos GML usan coma, otros espacio. Normalizar a separador por espacios
-        if ',' in txt and ' ' not in txt:
-            parts = [p.strip() for p in txt.split(',') if p.strip()]
-        else:
-            # reemplazar comas por espacios y dividir por cualquier whitespace
-            parts = [p for p in txt.replace(',', ' ').split() if p]
-        if len(parts) >= 2:
-            try:
-                lon = float(parts[0])
-                lat = float(parts[1])
-                return lon, lat
-            except Exception:
-                try:
-                    lon = float(parts[-2]); lat = float(parts[-1])
-                    return lon, lat
-                except Exception:
-                    return None, None
-        return None, None
-
     for feature in features:
         # Extraer coordenadas (robusto: coordinates, pos, posList)
         coord_elem = _find_coord_element(feature)
@@ -100,16 +258,54 @@ def extract_wfs_data(typename: str) -> pd.DataFrame:
     return df
 
 
-def main():
+def main(argv=None):
     """
     Función principal que combina los datos de ambas capas WFS
     """
+    parser = argparse.ArgumentParser(description='Extrae estaciones de servicio del WFS de Energía.')
+    parser.add_argument('--stream', action='store_true', help='Paginar y parsear las capas en streaming (memoria acotada)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help=f'Features por página en modo streaming (default {PAGE_SIZE})')
+    parser.add_argument('--force', action='store_true', help='Reconstruir las salidas aunque el WFS no haya cambiado')
+    parser.add_argument('--tiles', action='store_true', help='Cosechar ambas capas por mosaicos BBOX en paralelo')
+    parser.add_argument('--workers', type=int, default=8, help='Hilos para el modo --tiles (default 8)')
+    parser.add_argument('--url', default=WFS_URL, help='URL del servicio WFS')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='Caché de descargas del WFS')
+    args = parser.parse_args(argv)
+
+    def _extract(layer):
+        if args.tiles:
+            return harvested[layer]
+        if args.stream:
+            return extract_wfs_data(layer, streaming=True, page_size=args.page_size, base_url=args.url)
+        return read_cached_layer(fetched[layer].path, layer)
+
+    if args.tiles:
+        from wfs_harvest import harvest_layers
+        print("Cosechando capas por mosaicos...")
+        harvested, failed_tiles = harvest_layers(LAYERS, max_workers=args.workers, base_url=args.url)
+        if failed_tiles:
+            # Una cosecha con huecos no pisa las salidas: el mapa sigue con las de la corrida anterior
+            print(f"✗ {len(failed_tiles)} mosaicos no pudieron descargarse; se conservan las salidas anteriores:")
+            for layer, bbox in failed_tiles:
+                print(f"  - {layer} {bbox}")
+            sys.exit(1)
+    elif not args.stream:
+        # Descarga condicional a la caché; si nada cambió no hace falta reconstruir
+        fetched = {layer: fetch_layer(layer, base_url=args.url, cache_dir=args.cache_dir) for layer in LAYERS}
+        # Contra lo último exportado, no contra la última descarga: si una corrida
+        # descargó datos nuevos y falló al exportarlos, ésta tiene que rehacerlo
+        exported = load_exported(args.cache_dir)
+        unchanged = all(exported.get(layer) == r.sha256 for layer, r in fetched.items())
+        if unchanged and not args.force and all(os.path.exists(p) for p in OUTPUT_FILES + [SNAPSHOT_FILE]):
+            print("✓ El WFS no cambió desde la última corrida; se omiten parseo y exportación")
+            return None
+
     print("Extrayendo datos de res1104_mmino_eess...")
-    df_eess = extract_wfs_data('res1104_mmino_eess')
+    df_eess = _extract('res1104_mmino_eess')
     print(f"✓ {len(df_eess)} registros extraídos")
     
     print("\nExtrayendo datos de res1104_mmino_dist...")
-    df_dist = extract_wfs_data('res1104_mmino_dist')
+    df_dist = _extract('res1104_mmino_dist')
     print(f"✓ {len(df_dist)} registros extraídos")
     
     # Combinar ambos DataFrames
@@ -131,55 +327,17 @@ def main():
     print(f"\nPrimeras filas:")
     print(df_combined.head())
     
-    # Guardar resultados
-    output_file = 'estaciones_servicio_argentina.csv'
-    df_combined.to_csv(output_file, index=False, encoding='utf-8-sig')
-    print(f"\n✓ Datos guardados en: {output_file}")
-    
-    # Opcional: Guardar en Excel
-    output_excel = 'estaciones_servicio_argentina.xlsx'
-    df_combined.to_excel(output_excel, index=False, engine='openpyxl')
-    print(f"✓ Datos guardados en: {output_excel}")
-
-    # Guardar como GeoJSON (sólo registros con coordenadas válidas)
-    geojson_file = 'estaciones_servicio_argentina.geojson'
-    features = []
-    for _, row in df_combined.dropna(subset=['Longitude', 'Latitude']).iterrows():
-        properties = row.drop(labels=['Longitude', 'Latitude']).to_dict()
-        # Convertir NaN por None para JSON
-        for k, v in list(properties.items()):
-            if pd.isna(v):
-                properties[k] = None
-        feat = {
-            'type': 'Feature',
-            'geometry': {
-                'type': 'Point',
-                'coordinates': [float(row['Longitude']), float(row['Latitude'])]
-            },
-            'properties': properties
-        }
-        features.append(feat)
-    fc = {'type': 'FeatureCollection', 'features': features}
-    with open(geojson_file, 'w', encoding='utf-8') as f:
-        json.dump(fc, f, ensure_ascii=False, indent=2)
-    print(f"✓ GeoJSON guardado en: {geojson_file}")
-
-    # Guardar JSON (array de objetos con lat/lon y propiedades)
-    json_file = 'estaciones_servicio_argentina.json'
-    rows = []
-    for _, row in df_combined.iterrows():
-        obj = row.to_dict()
-        # asegurar tipos serializables
-        for k, v in list(obj.items()):
-            if pd.isna(v):
-                obj[k] = None
-            elif isinstance(v, (pd.Timestamp,)):
-                obj[k] = str(v)
-        rows.append(obj)
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
-    print(f"✓ JSON guardado en: {json_file}")
-    
+    # Guardar resultados; hasta que la exportación termine las salidas no corresponden a ninguna descarga
+    clear_exported(args.cache_dir)
+    count = write_table(df_combined, SNAPSHOT_FILE, 'estaciones')
+    print(f"\n✓ {count} registros guardados en: {SNAPSHOT_FILE}")
+
+    # Los cuatro formatos en paralelo desde la copia tipada, cada uno con escritura atómica
+    start = time.perf_counter()
+    print_report(export_all(SNAPSHOT_FILE, out_dir='.'), time.perf_counter() - start)
+    if not args.tiles and not args.stream:
+        mark_exported({layer: r.sha256 for layer, r in fetched.items()}, args.cache_dir)
+
     return df_combined
 
 
@@ -1,6 +1,7 @@
-import requests
 import xml.etree.ElementTree as ET
 
+from wfs_fetch import fetch_layer
+
 NAMESPACES = {
     'gml': 'http://www.opengis.net/gml',
     'ms': 'http://mapserver.gis.umn.edu/mapserver',
@@ -12,14 +13,11 @@ LAYERS = [
     'res1104_mmino_dist'
 ]
 
-BASE_URL = 'https://sig.energia.gob.ar/wmspubmap?VERSION=1.0.0&SERVICE=WFS&REQUEST=GetFeature&TYPENAME='
-
 for layer in LAYERS:
-    url = BASE_URL + layer
     print('\n--- LAYER:', layer, '---')
-    r = requests.get(url, timeout=30)
-    r.encoding = 'utf-8'
-    root = ET.fromstring(r.content)
+    # Reutiliza la caché de extraer_wfs: sólo se descarga si la capa cambió
+    result = fetch_layer(layer, timeout=30)
+    root = ET.parse(result.path).getroot()
 
     # Encontrar el primer elemento que corresponde al feature
     # Los features suelen tener el prefijo ms: o directamente el nombre
@@ -0,0 +1,188 @@
+"""
+Servidor WFS local de prueba que sirve respuestas GetFeature enlatadas.
+
+Sirve, por capa, un XML fijo tomado de un directorio (<typename>.xml) con
+ETag/Last-Modified y respuestas 304, y respeta BBOX y MAXFEATURES/STARTINDEX.
+Puede además truncar a propósito las primeras respuestas para ejercitar los
+reintentos. Sirve para probar extraer_wfs, wfs_fetch y wfs_harvest sin salir a
+sig.energia.gob.ar:
+
+    python mock_wfs.py --dir /tmp/wfs --port 8765
+    python extraer_wfs.py --url http://127.0.0.1:8765/wmspubmap
+"""
+import argparse
+import hashlib
+import threading
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+WFS_NS = 'http://www.opengis.net/wfs'
+GML_NS = 'http://www.opengis.net/gml'
+MS_NS = 'http://mapserver.gis.umn.edu/mapserver'
+
+for _prefix, _uri in (('wfs', WFS_NS), ('gml', GML_NS), ('ms', MS_NS)):
+    ET.register_namespace(_prefix, _uri)
+
+HEADER = (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+          f'<wfs:FeatureCollection xmlns:wfs="{WFS_NS}" xmlns:gml="{GML_NS}" xmlns:ms="{MS_NS}">\n').encode('utf-8')
+FOOTER = b'</wfs:FeatureCollection>\n'
+
+
+def _member_coords(member):
+    for tag in ('coordinates', 'pos'):
+        el = member.find(f'.//{{{GML_NS}}}{tag}')
+        if el is not None and el.text:
+            parts = el.text.replace(',', ' ').split()
+            return float(parts[0]), float(parts[1])
+    return None
+
+
+class CannedLayer:
+    """Una capa enlatada: los featureMember ya serializados más su validador HTTP."""
+
+    def __init__(self, body: bytes):
+        root = ET.fromstring(body)
+        self.members = []
+        self.coords = []
+        for m in root.findall(f'{{{GML_NS}}}featureMember'):
+            self.members.append(ET.tostring(m, encoding='utf-8').replace(b"<?xml version='1.0' encoding='utf-8'?>\n", b''))
+            self.coords.append(_member_coords(m))
+        self.set_body(body)
+
+    @classmethod
+    def from_members(cls, members, coords, body: bytes = b'') -> 'CannedLayer':
+        """Capa armada con featureMember ya serializados, sin parsear XML (capas sintéticas grandes)."""
+        layer = cls.__new__(cls)
+        layer.members = list(members)
+        layer.coords = list(coords)
+        layer.set_body(body or HEADER + b''.join(layer.members) + FOOTER)
+        return layer
+
+    def in_bbox(self, bbox):
+        """Índices de los features dentro del BBOX (bordes inclusive, como MapServer)."""
+        x0, y0, x1, y1 = bbox
+        return [i for i, c in enumerate(self.coords)
+                if c is not None and x0 <= c[0] <= x1 and y0 <= c[1] <= y1]
+
+    def set_body(self, body: bytes):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = formatdate(usegmt=True)
+
+
+class MockWFSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, layers):
+        super().__init__(address, MockWFSHandler)
+        self.layers = layers
+        self.request_log = []
+        self.log_lock = threading.Lock()
+        # Cantidad de próximas respuestas parciales que se cortan a la mitad
+        self.truncate_next = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/wmspubmap'
+
+
+class MockWFSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        query = {k.upper(): v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with self.server.log_lock:
+            self.server.request_log.append(query)
+
+        layer = self.server.layers.get(query.get('TYPENAME', ''))
+        if layer is None:
+            self._send(404, b'unknown typename')
+            return
+
+        partial = 'MAXFEATURES' in query or 'STARTINDEX' in query or 'BBOX' in query
+        if not partial:
+            inm = self.headers.get('If-None-Match')
+            ims = self.headers.get('If-Modified-Since')
+            if inm == layer.etag or (inm is None and ims == layer.last_modified):
+                self._send(304, b'', layer)
+                return
+            self._send(200, layer.body, layer)
+            return
+
+        if 'BBOX' in query:
+            indices = layer.in_bbox([float(v) for v in query['BBOX'].split(',')[:4]])
+        else:
+            indices = range(len(layer.members))
+        start = int(query.get('STARTINDEX', 0))
+        count = int(query.get('MAXFEATURES', len(indices)))
+        body = HEADER + b''.join(layer.members[i] for i in indices[start:start + count]) + FOOTER
+
+        with self.server.log_lock:
+            truncate = self.server.truncate_next > 0
+            if truncate:
+                self.server.truncate_next -= 1
+        if truncate:
+            body = body[:len(body) // 2]
+        self._send(200, body)
+
+    def _send(self, status: int, body: bytes, layer: CannedLayer = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/xml; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        if layer is not None:
+            self.send_header('ETag', layer.etag)
+            self.send_header('Last-Modified', layer.last_modified)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def load_layers(xml_dir: str) -> dict:
+    """Carga cada <typename>.xml del directorio como capa enlatada."""
+    return {p.stem: CannedLayer(p.read_bytes()) for p in sorted(Path(xml_dir).glob('*.xml'))}
+
+
+def start_mock_wfs(layers: dict, host: str = '127.0.0.1', port: int = 0) -> MockWFSServer:
+    """
+    Levanta el servidor en un hilo de fondo.
+
+    Args:
+        layers: typename -> CannedLayer
+        host: Interfaz donde escuchar
+        port: Puerto (0 = uno libre)
+
+    Returns:
+        El servidor en marcha; usar server.base_url y server.shutdown()
+    """
+    server = MockWFSServer((host, port), layers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WFS local con respuestas enlatadas.')
+    parser.add_argument('--dir', required=True, help='Directorio con un <typename>.xml por capa')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--truncate', type=int, default=0, help='Truncar las primeras N respuestas parciales')
+    args = parser.parse_args()
+
+    layers = load_layers(args.dir)
+    server = MockWFSServer((args.host, args.port), layers)
+    server.truncate_next = args.truncate
+    print(f"Sirviendo {', '.join(layers)} en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
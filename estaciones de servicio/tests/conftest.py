@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'comun'))
+
+from mock_wfs import CannedLayer, start_mock_wfs
+from sinteticos import gml_document, gml_layer
+
+LAYERS = ['res1104_mmino_eess', 'res1104_mmino_dist']
+
+
+def canned_layers(n: int = 40, seed: int = 0) -> dict:
+    """Las dos capas de extraer_wfs con n estaciones sintéticas cada una."""
+    return {name: CannedLayer(gml_document(gml_layer(n, name, seed + i))) for i, name in enumerate(LAYERS)}
+
+
+@pytest.fixture
+def wfs():
+    """WFS local con las dos capas; se apaga al terminar el test."""
+    server = start_mock_wfs(canned_layers())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio de trabajo vacío: extraer_wfs escribe sus salidas en el cwd."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,52 @@
+import filecmp
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import exportar
+from intermedios import write_table
+
+
+@pytest.fixture
+def source(tmp_path):
+    n = 23
+    df = pd.DataFrame({
+        'tipooperador': ['OPERADOR'] * n,
+        'empresabandera': ['YPF', 'SHELL', None] * 7 + ['AXION', 'PUMA'],
+        'razonsocial': [f'Razón "{i}", S.A.' for i in range(n)],
+        'cuit': [str(30000000000 + i) for i in range(n)],
+        'direccion': ['Av. Siempre Viva\n742'] + ['Ruta 2 km 10'] * (n - 1),
+        'localidad': ['Lezama'] * n,
+        'provincia': ['BUENOS AIRES'] * n,
+        'Longitude': np.linspace(-60, -57, n),
+        'Latitude': np.linspace(-36, -35, n),
+    })
+    df.loc[3, 'Longitude'] = np.nan
+    path = str(tmp_path / 'estaciones.parquet')
+    write_table(df, path, 'estaciones')
+    return path
+
+
+def test_batches_give_the_same_files(source, tmp_path, monkeypatch):
+    whole, batched = tmp_path / 'whole', tmp_path / 'batched'
+    whole.mkdir()
+    batched.mkdir()
+    exportar.export_all(source, out_dir=str(whole), parallel=False)
+    monkeypatch.setattr(exportar, 'BATCH_ROWS', 4)
+    resultados = exportar.export_all(source, out_dir=str(batched), parallel=False)
+
+    assert {r.formato: r.filas for r in resultados} == {'csv': 23, 'xlsx': 23, 'geojson': 22, 'json': 23}
+    for formato in ('csv', 'geojson', 'json'):
+        name = f'{exportar.BASE_NAME}.{formato}'
+        assert filecmp.cmp(whole / name, batched / name, shallow=False), formato
+    xlsx = f'{exportar.BASE_NAME}.xlsx'
+    assert pd.read_excel(whole / xlsx).equals(pd.read_excel(batched / xlsx))
+
+    with open(batched / f'{exportar.BASE_NAME}.json', encoding='utf-8') as f:
+        records = json.load(f)
+    assert records[2]['empresabandera'] is None
+    assert pd.read_csv(batched / f'{exportar.BASE_NAME}.csv', encoding='utf-8-sig')['direccion'][0] == 'Av. Siempre Viva\n742'
+    assert not any(name.endswith('.tmp.' + f) for name in os.listdir(batched) for f in exportar.FORMATOS)
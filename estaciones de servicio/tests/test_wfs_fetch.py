@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+import extraer_wfs
+from mock_wfs import HEADER, FOOTER
+from wfs_fetch import fetch_layer, load_exported
+
+LAYER = 'res1104_mmino_eess'
+
+
+def _run(wfs, cache_dir, *extra):
+    return extraer_wfs.main(['--url', wfs.base_url, '--cache-dir', str(cache_dir), *extra])
+
+
+def test_first_fetch_downloads_and_caches(wfs, tmp_path):
+    result = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    assert result.status == 200 and result.changed
+    with open(result.path, 'rb') as f:
+        assert f.read() == wfs.layers[LAYER].body
+
+
+def test_revalidation_returns_304(wfs, tmp_path):
+    first = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    second = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    assert second.status == 304 and not second.changed
+    assert second.sha256 == first.sha256
+    assert wfs.request_log[-1] == {'VERSION': '1.0.0', 'SERVICE': 'WFS', 'REQUEST': 'GetFeature', 'TYPENAME': LAYER}
+
+
+def test_same_body_with_new_validator_is_unchanged(wfs, tmp_path):
+    first = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    # Un servidor que rota el ETag sin que cambie el contenido: 200 con el mismo cuerpo
+    wfs.layers[LAYER].etag = '"rotado"'
+    second = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    assert second.status == 200 and not second.changed
+    assert second.sha256 == first.sha256
+
+
+def test_changed_body_is_reported(wfs, tmp_path):
+    first = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    layer = wfs.layers[LAYER]
+    layer.set_body(HEADER + b''.join(layer.members[:-1]) + FOOTER)
+    second = fetch_layer(LAYER, base_url=wfs.base_url, cache_dir=str(tmp_path))
+    assert second.status == 200 and second.changed
+    assert second.sha256 != first.sha256
+
+
+def test_unchanged_wfs_skips_rebuild(wfs, workdir):
+    cache = workdir / 'cache'
+    df = _run(wfs, cache)
+    assert len(df) == 80
+    assert set(load_exported(str(cache))) == set(extraer_wfs.LAYERS)
+    assert _run(wfs, cache) is None
+
+
+def test_failed_export_is_redone_next_run(wfs, workdir, monkeypatch):
+    cache = workdir / 'cache'
+    _run(wfs, cache)
+    # El WFS cambia y la exportación de esa corrida falla después de la descarga
+    layer = wfs.layers[LAYER]
+    layer.set_body(HEADER + b''.join(layer.members[:-1]) + FOOTER)
+
+    def broken_export(*args, **kwargs):
+        raise RuntimeError('disco lleno')
+
+    export_all = extraer_wfs.export_all
+    monkeypatch.setattr(extraer_wfs, 'export_all', broken_export)
+    with pytest.raises(RuntimeError):
+        _run(wfs, cache)
+    assert load_exported(str(cache)) == {}
+    monkeypatch.setattr(extraer_wfs, 'export_all', export_all)
+
+    # La descarga ya quedó en caché (304), pero las salidas siguen siendo las viejas: hay que rehacerlas
+    df = _run(wfs, cache)
+    assert df is not None and len(df) == 79
+    assert len(pd.read_csv(os.path.join(workdir, 'estaciones_servicio_argentina.csv'))) == 79
+    assert _run(wfs, cache) is None
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+import extraer_wfs
+import wfs_harvest
+from mock_wfs import CannedLayer, HEADER, FOOTER
+
+CSV = 'estaciones_servicio_argentina.csv'
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(wfs_harvest, 'RETRY_BACKOFF', 0.0)
+
+
+def _with_extra_members(wfs, layer_name, *extra):
+    """Reemplaza la capa por otra con los featureMember extra al final."""
+    layer = wfs.layers[layer_name]
+    wfs.layers[layer_name] = CannedLayer(HEADER + b''.join(layer.members + list(extra)) + FOOTER)
+
+
+def _run(wfs, workdir):
+    return extraer_wfs.main(['--tiles', '--url', wfs.base_url, '--cache-dir', str(workdir / 'cache')])
+
+
+def test_tiles_cover_every_feature_once(wfs, workdir):
+    df = _run(wfs, workdir)
+    assert len(df) == 80
+    assert all('BBOX' in q for q in wfs.request_log)
+
+
+def test_transient_tile_failures_are_retried(wfs, workdir):
+    wfs.truncate_next = 5
+    df = _run(wfs, workdir)
+    assert len(df) == 80
+    assert len(pd.read_csv(workdir / CSV)) == 80
+
+
+def test_failed_tiles_keep_previous_outputs(wfs, workdir):
+    _run(wfs, workdir)
+    before = {name: os.path.getmtime(workdir / name)
+              for name in extraer_wfs.OUTPUT_FILES + [extraer_wfs.SNAPSHOT_FILE]}
+
+    layer = wfs.layers['res1104_mmino_eess']
+    layer.set_body(HEADER + b''.join(layer.members[:-1]) + FOOTER)
+    wfs.truncate_next = 10 ** 6
+    with pytest.raises(SystemExit) as exc:
+        _run(wfs, workdir)
+    assert exc.value.code != 0
+    after = {name: os.path.getmtime(workdir / name) for name in before}
+    assert after == before
+    assert len(pd.read_csv(workdir / CSV)) == 80
+
+
+def test_same_cuit_and_coordinates_in_one_tile_are_kept(wfs, workdir):
+    # Como CALLE 24-899, GRAL. PICO: una estación de GNC y otra de líquidos, mismo CUIT y punto
+    name = 'res1104_mmino_eess'
+    first = wfs.layers[name].members[0]
+    gnc = first.replace(b'ESTACION 0 S.A.', b'ESTACION 0 GNC S.A.')
+    _with_extra_members(wfs, name, gnc)
+    df = _run(wfs, workdir)
+    assert len(df) == 81
+    assert (df['razonsocial'] == 'ESTACION 0 GNC S.A.').sum() == 1
+
+
+def test_feature_on_a_tile_edge_is_kept_once(wfs, workdir):
+    name = 'res1104_mmino_eess'
+    west, south, east, north = wfs_harvest.split_bbox()[0]
+    edge = wfs.layers[name].members[0].replace(b'ESTACION 0 S.A.', b'ESTACION BORDE S.A.')
+    start = edge.index(b'<gml:coordinates>') + len(b'<gml:coordinates>')
+    end = edge.index(b'</gml:coordinates>')
+    edge = edge[:start] + f'{east!r},{(south + north) / 2!r}'.encode() + edge[end:]
+    _with_extra_members(wfs, name, edge)
+    df = _run(wfs, workdir)
+    assert len(df) == 81
+    assert (df['razonsocial'] == 'ESTACION BORDE S.A.').sum() == 1
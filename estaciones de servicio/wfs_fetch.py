@@ -0,0 +1,162 @@
+"""
+Capa de descarga del WFS de sig.energia.gob.ar.
+
+Reúne en un solo lugar:
+  - una sesión HTTP compartida con pool de conexiones (keep-alive)
+  - una caché en disco de la última respuesta de cada capa
+  - revalidación condicional con ETag / If-Modified-Since
+  - detección de "sin cambios" comparando el hash del cuerpo descargado
+  - el hash de los cuerpos que se exportaron de verdad (mark_exported), que es
+    contra lo que se decide si hay que reconstruir las salidas: el de la última
+    descarga se guarda antes de parsear, y si el parseo o la exportación fallan
+    la corrida siguiente no debe darla por hecha
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+WFS_URL = "https://sig.energia.gob.ar/wmspubmap"
+REQUEST_TIMEOUT = 60
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.wfs_cache')
+CHUNK_SIZE = 64 * 1024
+EXPORT_STAMP = 'exportado.json'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class FetchResult(NamedTuple):
+    """Resultado de fetch_layer: ruta al XML cacheado y si cambió respecto de la corrida anterior."""
+    path: str
+    changed: bool
+    status: int
+    sha256: str
+
+
+def get_session(pool_size: int = 8) -> requests.Session:
+    """
+    Devuelve la sesión HTTP compartida del módulo, creándola la primera vez.
+
+    Args:
+        pool_size: Conexiones máximas por host en el pool
+
+    Returns:
+        requests.Session con keep-alive y reintentos ante errores transitorios
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=3, backoff_factor=1.0,
+                          status_forcelist=(500, 502, 503, 504),
+                          allowed_methods=frozenset(['GET']))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _cache_paths(cache_dir: str, typename: str):
+    return (os.path.join(cache_dir, f'{typename}.xml'),
+            os.path.join(cache_dir, f'{typename}.json'))
+
+
+def _load_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(meta_path: str, meta: dict):
+    tmp = meta_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def load_exported(cache_dir: str = CACHE_DIR) -> dict:
+    """SHA-256 por capa de los cuerpos con los que se generaron las salidas actuales ({} si no hay registro)."""
+    return _load_meta(os.path.join(cache_dir, EXPORT_STAMP))
+
+
+def mark_exported(shas: dict, cache_dir: str = CACHE_DIR):
+    """Registra los SHA-256 por capa recién exportados. Llamar sólo después de que la exportación terminó bien."""
+    os.makedirs(cache_dir, exist_ok=True)
+    _save_meta(os.path.join(cache_dir, EXPORT_STAMP), shas)
+
+
+def clear_exported(cache_dir: str = CACHE_DIR):
+    """Olvida el registro: las salidas se van a reescribir desde otra fuente (o quedaron a medias)."""
+    try:
+        os.remove(os.path.join(cache_dir, EXPORT_STAMP))
+    except FileNotFoundError:
+        pass
+
+
+def fetch_layer(typename: str, base_url: str = WFS_URL, cache_dir: str = CACHE_DIR,
+                session: Optional[requests.Session] = None,
+                timeout: float = REQUEST_TIMEOUT) -> FetchResult:
+    """
+    Descarga (o revalida) el GetFeature completo de una capa y lo deja en la caché.
+
+    Si hay una copia previa se envían If-None-Match / If-Modified-Since. Un 304
+    o un cuerpo con el mismo SHA-256 que el cacheado se informan con changed=False.
+    El cuerpo se escribe a disco por bloques, nunca se mantiene entero en memoria.
+
+    Args:
+        typename: Nombre de la capa WFS (también es la clave de la caché)
+        base_url: URL del servicio WFS
+        cache_dir: Directorio de la caché
+        session: Sesión HTTP a usar (por defecto la compartida)
+        timeout: Timeout de la petición en segundos
+
+    Returns:
+        FetchResult con la ruta al XML cacheado
+    """
+    session = session or get_session()
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(cache_dir, typename)
+    meta = _load_meta(meta_path) if os.path.exists(body_path) else {}
+
+    params = {'VERSION': '1.0.0', 'SERVICE': 'WFS', 'REQUEST': 'GetFeature', 'TYPENAME': typename}
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+
+    with session.get(base_url, params=params, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304 and meta:
+            return FetchResult(body_path, False, 304, meta.get('sha256', ''))
+        response.raise_for_status()
+
+        digest = hashlib.sha256()
+        tmp_path = body_path + '.part'
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+        sha = digest.hexdigest()
+
+        changed = sha != meta.get('sha256')
+        if changed:
+            os.replace(tmp_path, body_path)
+        else:
+            os.remove(tmp_path)
+
+        _save_meta(meta_path, {
+            'url': response.url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': sha,
+        })
+        return FetchResult(body_path, changed, response.status_code, sha)
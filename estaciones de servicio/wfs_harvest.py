@@ -0,0 +1,156 @@
+"""
+Cosecha de capas WFS en mosaicos BBOX en paralelo.
+
+Divide la extensión de Argentina en una grilla de BBOX, pide cada mosaico de
+cada capa a través de un pool de hilos acotado, reintenta por separado sólo los
+mosaicos que fallan y une los resultados descartando los features repetidos en
+los bordes: un registro se descarta sólo si es idéntico (todos los campos y las
+coordenadas) a uno que ya devolvió otro mosaico. Dos registros iguales dentro de
+un mismo mosaico son dos features del servicio y se conservan ambos.
+"""
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import requests
+
+from extraer_wfs import CAMPOS, COLUMNAS, iter_wfs_records
+from wfs_fetch import WFS_URL, REQUEST_TIMEOUT, get_session
+
+# (min_lon, min_lat, max_lon, max_lat) del territorio continental e insular
+ARGENTINA_BBOX = (-73.6, -55.1, -53.6, -21.7)
+DEFAULT_GRID = (4, 6)  # columnas x filas
+MAX_WORKERS = 8
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 1.0
+DEDUP_DECIMALS = 6
+
+BBox = Tuple[float, float, float, float]
+
+
+def split_bbox(bbox: BBox = ARGENTINA_BBOX, grid: Tuple[int, int] = DEFAULT_GRID) -> List[BBox]:
+    """
+    Divide un BBOX en una grilla regular de mosaicos.
+
+    Args:
+        bbox: (min_lon, min_lat, max_lon, max_lat)
+        grid: (columnas, filas)
+
+    Returns:
+        Lista de BBOX, recorrida por filas de sur a norte
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    nx, ny = grid
+    dx = (max_lon - min_lon) / nx
+    dy = (max_lat - min_lat) / ny
+    tiles = []
+    for j in range(ny):
+        for i in range(nx):
+            # El último mosaico de cada eje toma el borde exacto para no perder features por redondeo
+            x1 = max_lon if i == nx - 1 else min_lon + (i + 1) * dx
+            y1 = max_lat if j == ny - 1 else min_lat + (j + 1) * dy
+            tiles.append((min_lon + i * dx, min_lat + j * dy, x1, y1))
+    return tiles
+
+
+def fetch_tile(typename: str, bbox: BBox, session: requests.Session = None,
+               base_url: str = WFS_URL, timeout: float = REQUEST_TIMEOUT) -> List[Dict]:
+    """
+    Pide un mosaico de una capa y lo parsea en streaming.
+
+    Una respuesta truncada produce ET.ParseError, que harvest_layers trata
+    como un fallo reintentable del mosaico.
+    """
+    session = session or get_session()
+    params = {
+        'VERSION': '1.0.0',
+        'SERVICE': 'WFS',
+        'REQUEST': 'GetFeature',
+        'TYPENAME': typename,
+        'BBOX': ','.join(repr(round(c, 6)) for c in bbox),
+    }
+    with session.get(base_url, params=params, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return list(iter_wfs_records(response.raw, typename))
+
+
+def dedupe_records(df: pd.DataFrame, tiles, decimals: int = DEDUP_DECIMALS) -> pd.DataFrame:
+    """
+    Descarta los features repetidos entre mosaicos vecinos.
+
+    Hay estaciones distintas con el mismo CUIT y las mismas coordenadas (p.ej.
+    una de GNC y otra de líquidos), así que la clave es el registro completo, y
+    se descarta sólo si apareció antes en otro mosaico.
+
+    Args:
+        df: Registros de todos los mosaicos, en orden de mosaico
+        tiles: Índice del mosaico de cada fila de df
+        decimals: Decimales de las coordenadas al comparar
+
+    Returns:
+        DataFrame sin los features ya devueltos por un mosaico anterior
+    """
+    key = df[CAMPOS].fillna('').astype(str)
+    key['lon'] = pd.to_numeric(df['Longitude'], errors='coerce').round(decimals)
+    key['lat'] = pd.to_numeric(df['Latitude'], errors='coerce').round(decimals)
+    tile = pd.Series(list(tiles), index=df.index)
+    first_tile = tile.groupby([key[c] for c in key.columns], dropna=False).transform('min')
+    return df[(tile == first_tile).to_numpy()].reset_index(drop=True)
+
+
+def harvest_layers(layers: List[str], bbox: BBox = ARGENTINA_BBOX,
+                   grid: Tuple[int, int] = DEFAULT_GRID, max_workers: int = MAX_WORKERS,
+                   max_attempts: int = MAX_ATTEMPTS, base_url: str = WFS_URL,
+                   timeout: float = REQUEST_TIMEOUT):
+    """
+    Cosecha varias capas WFS por mosaicos, en paralelo y con reintentos por mosaico.
+
+    Args:
+        layers: Capas WFS a cosechar
+        bbox: Extensión total a cubrir
+        grid: (columnas, filas) de la grilla de mosaicos
+        max_workers: Tamaño del pool de hilos (y del pool de conexiones)
+        max_attempts: Intentos por mosaico antes de darlo por perdido
+        base_url: URL del servicio WFS
+        timeout: Timeout por petición en segundos
+
+    Returns:
+        Tupla (dict capa -> DataFrame deduplicado, lista de (capa, bbox) que fallaron)
+    """
+    session = get_session(pool_size=max_workers)
+    tiles = split_bbox(bbox, grid)
+    pending = [(layer, idx) for layer in layers for idx in range(len(tiles))]
+    results = {}
+
+    for attempt in range(1, max_attempts + 1):
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch_tile, layer, tiles[idx], session, base_url, timeout): (layer, idx)
+                for layer, idx in pending
+            }
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    results[task] = future.result()
+                except (requests.RequestException, ET.ParseError) as e:
+                    failed.append(task)
+                    print(f"⚠ Mosaico {task[1]} de {task[0]} falló (intento {attempt}): {e}")
+        pending = sorted(failed)
+        if not pending:
+            break
+        if attempt < max_attempts:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+    frames = {}
+    for layer in layers:
+        # Concatenar en orden de mosaico para que la salida sea determinista
+        tagged = [(idx, rec) for idx in range(len(tiles)) for rec in results.get((layer, idx), [])]
+        df = pd.DataFrame.from_records([rec for _, rec in tagged], columns=COLUMNAS)
+        frames[layer] = dedupe_records(df, [idx for idx, _ in tagged])
+
+    failed_tiles = [(layer, tiles[idx]) for layer, idx in pending]
+    return frames, failed_tiles
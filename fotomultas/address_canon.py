@@ -0,0 +1,216 @@
+import csv
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+
+import numpy as np
+
+# Address canonicalization in front of the geocoder. Installation strings that
+# only differ by lane/direction, spacing, accents or "10,8" vs "10.8" are the
+# same place, but each distinct string used to cost its own rate-limited
+# request. Every address is reduced to a canonical key and near-identical keys
+# are grouped with a MinHash LSH index, so each group is geocoded once.
+
+NUM_PERM = 64
+BANDS = 16                  # 16 bands x 4 rows: candidates from ~0.5 Jaccard up
+SHINGLE = 3
+SIMILARITY = 0.8            # verified Jaccard needed to merge two candidates
+MERSENNE = 4294967291       # largest prime below 2**32
+
+# Applied in order on folded text
+REPLACEMENTS = [
+    (r'\(.*?\)', ' '),                                  # "(carril sentido descendente)"
+    # "sentido de circulacion ..." / "sent. asc." up to the next clause, so a town after it stays.
+    # Following clauses that still describe lanes/directions ("carril 2 S-N", "La Plata - CABA",
+    # "4 y 5") go with it.
+    (r'\bsent(ido)?\.?\b[^,(]*(?:,(?=[^,(]*(?:carril|-))[^,(]*|,[\d y.]*(?=,|$))*', ' '),
+    (r'\bcarril(es)?( unico)?( \d+)?( y \d+)?\b', ' '),
+    (r'\b(asc|desc)(endente)?\.?\b', ' '),
+    (r'\bn ?[º°o]\.?|\bnro\.?|\bnum\.?', ' '),
+    (r'\bav(da)?\.|\bavenida\b', ' av '),
+    (r'\bau\.|\bautopista\b', ' autopista '),
+    (r'\bgral\.?|\bgeneral\b', ' gral '),
+    (r'\br\.?n\.?(?= ?\d)|\bruta nacional\b', ' rn '),
+    (r'\br\.?p\.?(?= ?\d)|\bruta (provincial\b|prov\.|pcial\.?)', ' rp '),
+    (r'\bpcia\.?|\bprovincia\b', ' provincia '),
+    (r'\bbs\.? ?as\.?', ' buenos aires '),
+    (r'\bc\.?a\.?b\.?a\.?|\bciudad autonoma de buenos aires\b|\bcapital federal\b', ' caba '),
+    (r'\ben jurisdiccion de( la localidad de)?\b', ' '),
+    (r'\bkm\.?', ' km '),
+]
+STOPWORDS = {'de', 'del', 'la', 'el', 'y', 'en', 'a', 'al', 'argentina', 'localidad', 'provincia'}
+
+def fold(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+def normalize_number(token):
+    """'10,8' -> '10.8', '8,400' -> '8.4', '0095' -> '95'."""
+    token = token.replace(',', '.')
+    if '.' in token:
+        whole, frac = token.split('.', 1)
+        frac = frac.rstrip('0')
+        return f"{int(whole or 0)}.{frac}" if frac else str(int(whole or 0))
+    return str(int(token))
+
+def canonical_key(address):
+    """
+    Reduces an installation string to its canonical form: folded accents,
+    abbreviations expanded, direction/lane noise removed and numbers normalized.
+    """
+    if not isinstance(address, str):
+        return ""
+    text = fold(address)
+    for pattern, repl in REPLACEMENTS:
+        text = re.sub(pattern, repl, text)
+    tokens = []
+    for token in re.findall(r'\d+(?:[.,]\d+)?|[a-z]+', text):
+        if token[0].isdigit():
+            tokens.append(normalize_number(token))
+        elif token not in STOPWORDS:
+            tokens.append(token)
+    return ' '.join(tokens)
+
+def numbers_of(key):
+    return frozenset(t for t in key.split() if t[0].isdigit())
+
+def shingles(key, k=SHINGLE):
+    padded = f" {key} "
+    return {padded[i:i + k] for i in range(max(1, len(padded) - k + 1))}
+
+class MinHashIndex:
+    """
+    MinHash signatures over character shingles with banded LSH lookup.
+    Candidates are verified with the exact Jaccard similarity, and keys that
+    don't carry the same numbers (km, door number) are never merged.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=SIMILARITY, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE, num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.buckets = defaultdict(list)
+        self.keys = []
+        self.shingle_sets = []
+
+    def signature(self, shingle_set):
+        x = np.fromiter((zlib.crc32(s.encode('utf-8')) % MERSENNE for s in shingle_set),
+                        dtype=np.uint64, count=len(shingle_set))
+        return ((np.outer(x, self.a) + self.b) % MERSENNE).min(axis=0)
+
+    def query(self, key):
+        """Returns the id of the most similar indexed key, or None."""
+        sh = shingles(key)
+        sig = self.signature(sh)
+        nums = numbers_of(key)
+        best, best_sim = None, self.threshold
+        seen = set()
+        for band in range(self.bands):
+            bucket = (band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+            for i in self.buckets.get(bucket, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                if numbers_of(self.keys[i]) != nums:
+                    continue
+                other = self.shingle_sets[i]
+                sim = len(sh & other) / len(sh | other)
+                if sim >= best_sim:
+                    best, best_sim = i, sim
+        return best
+
+    def add(self, key):
+        i = len(self.keys)
+        sh = shingles(key)
+        sig = self.signature(sh)
+        self.keys.append(key)
+        self.shingle_sets.append(sh)
+        for band in range(self.bands):
+            self.buckets[(band, sig[band * self.rows:(band + 1) * self.rows].tobytes())].append(i)
+        return i
+
+class AddressCanonicalizer:
+    """
+    Groups raw addresses from any source under one canonical query.
+
+        canon = AddressCanonicalizer()
+        group = canon.add(raw, source='NACION')
+        canon.representative(group)  -> raw address to send to the geocoder
+        canon.key(group)             -> canonical cache key
+    """
+
+    def __init__(self, threshold=SIMILARITY):
+        self.index = MinHashIndex(threshold=threshold)
+        self.exact = {}             # canonical key -> group id
+        self.group_of = {}          # raw address -> group id
+        self.members = []           # group id -> [(raw, source)]
+        self.known = {}             # group id -> (lat, lon, formatted_address) from a source with coordinates
+
+    def add(self, raw, source=None, location=None):
+        """Adds a raw address and returns its group id. `location` marks a point already known."""
+        if raw in self.group_of:
+            group = self.group_of[raw]
+        else:
+            key = canonical_key(raw)
+            group = self.exact.get(key)
+            if group is None:
+                match = self.index.query(key) if key else None
+                if match is None:
+                    group = len(self.members)
+                    self.members.append([])
+                    self.index.add(key)
+                else:
+                    group = match
+                self.exact[key] = group
+            self.group_of[raw] = group
+            self.members[group].append((raw, source))
+        if location is not None and group not in self.known:
+            self.known[group] = location
+        return group
+
+    def key(self, group):
+        return self.index.keys[group]
+
+    def representative(self, group):
+        """First raw address seen for the group (the one sent to the geocoder)."""
+        return self.members[group][0][0]
+
+    def __len__(self):
+        return len(self.members)
+
+    def report(self, addresses=0, requests=0):
+        """
+        Summary of the lookup budget: how many raw strings collapsed into how
+        many groups, and the share of the `addresses` that needed a location
+        which were resolved without a network request (`requests` made).
+        """
+        raw = len(self.group_of)
+        sources = defaultdict(int)
+        for members in self.members:
+            for _, source in members:
+                sources[source or '-'] += 1
+        shared = sum(1 for members in self.members if len({s for _, s in members}) > 1)
+        lines = [
+            f"Distinct raw addresses: {raw} ({', '.join(f'{k}: {v}' for k, v in sorted(sources.items()))})",
+            f"Canonical groups:       {len(self.members)} ({raw - len(self.members)} duplicates collapsed, {shared} shared across sources)",
+            f"Known from sources:     {len(self.known)} groups",
+        ]
+        if addresses:
+            lines.append(f"Cache hit ratio:        {addresses - requests}/{addresses} addresses "
+                         f"({(addresses - requests) / addresses:.1%}) resolved without a request")
+        return '\n'.join(lines)
+
+    def write_groups(self, path):
+        """Writes group id, canonical key, source and raw address per row, for reviewing merges."""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['group', 'canonical_key', 'source', 'raw_address'])
+            for group, members in enumerate(self.members):
+                for raw, source in members:
+                    writer.writerow([group, self.key(group), source or '', raw])
@@ -0,0 +1,306 @@
+import json
+import math
+from collections import deque
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from cameras_ahead import CAMERAS_GEOJSON, CameraAheadIndex, km_sign, parse_speed
+
+# Streaming speed-camera warnings for navigation. GPS fixes are pushed one at a
+# time (or streamed from a generator / async iterator) and each camera runs a
+# small debounced state machine:
+#
+#     idle --enter--> entered --approach--> approaching --pass--> passed
+#       ^                                                           |
+#       +-------------- further than EXIT_KM (re-armed) ------------+
+#
+# Only cameras in a moving window are looked at: the 3x3 grid cells around the
+# vehicle, refilled when it crosses into another cell and capped at MAX_WINDOW
+# (the nearest ones). Per fix the engine does at most MAX_WINDOW distance
+# checks and only writes into state lists allocated once up front: no per-fix
+# containers, the only new objects are the alerts themselves and the candidate
+# list of a refill, which happens once every couple of km.
+#
+# A camera only fires when it lies ahead of the vehicle (within AHEAD_CONE of
+# its heading) and, when its direction of travel is known, when that direction
+# matches the vehicle's heading within HEADING_TOLERANCE. Directions come from
+# the road network: with a --roads extract each camera with `sentido` gets the
+# bearing of its lane (see cameras_ahead.py); without one, only the cone is
+# checked.
+
+CELL_DEG = 0.02             # ~2 km cells: the 3x3 window always reaches past EXIT_KM
+MAX_WINDOW = 64
+MAX_PENDING = 256           # undrained alerts kept for stream(); older ones are dropped
+ENTER_KM = 1.0
+APPROACH_KM = 0.3
+PASS_KM = 0.2               # a camera falling behind closer than this counts as passed
+EXIT_KM = 1.2               # hysteresis: re-armed only once this far away
+DEBOUNCE_FIXES = 2          # consecutive fixes a condition must hold before an event fires
+AHEAD_CONE = 60.0           # degrees either side of the heading
+HEADING_TOLERANCE = 45.0
+MIN_MOVE_KM = 0.003         # smaller displacements don't update the derived heading
+SPEED_SMOOTHING = 0.3       # EMA weight of each new fix in the derived speed
+KM_PER_DEG = 111.32
+
+IDLE, ENTERED, APPROACHING, PASSED = 0, 1, 2, 3
+ENTER, APPROACH, PASS = 'enter', 'approach', 'pass'
+
+class Fix(NamedTuple):
+    t: float                        # seconds (epoch or track-relative)
+    lon: float
+    lat: float
+    speed_kmh: Optional[float] = None
+    heading: Optional[float] = None  # degrees clockwise from north
+
+class Alert(NamedTuple):
+    kind: str                       # 'enter' / 'approach' / 'pass'
+    t: float
+    camera: int                     # index into CameraSet
+    distance_m: float
+    speed_kmh: Optional[float]
+    speed_limit: Optional[int]      # velocidadPermitida
+    over_limit: bool
+    serial: Optional[str]
+    label: Optional[str]
+
+def bearing_deg(lon1, lat1, lon2, lat2):
+    """Initial bearing from point 1 to point 2 on the local equirectangular plane."""
+    dx = (lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.degrees(math.atan2(dx, lat2 - lat1)) % 360.0
+
+def angle_diff(a, b):
+    d = abs(a - b) % 360.0
+    return 360.0 - d if d > 180.0 else d
+
+def chain_bearing(chain, chainage, sign):
+    """Bearing of a road chain at `chainage` for travel in direction `sign` (+1 along its drawing)."""
+    i = int(np.searchsorted(chain.chainage, chainage, side='right')) - 1
+    i = min(max(i, 0), len(chain.coords) - 2)
+    (lon1, lat1), (lon2, lat2) = chain.coords[i], chain.coords[i + 1]
+    b = bearing_deg(lon1, lat1, lon2, lat2)
+    return b if sign > 0 else (b + 180.0) % 360.0
+
+class CameraSet:
+    """
+    Flat per-camera columns (coordinates, travel bearing, speed limit) plus a
+    CSR grid of CELL_DEG cells. bearing is NaN when unknown; two_way marks
+    cameras without `sentido`, which match either way along their road.
+    """
+
+    def __init__(self, lon, lat, bearing, two_way, speed_limit, serial, label):
+        self.lon = [float(v) for v in lon]
+        self.lat = [float(v) for v in lat]
+        self.bearing = [float(v) for v in bearing]
+        self.two_way = [bool(v) for v in two_way]
+        self.speed_limit = list(speed_limit)
+        self.serial = list(serial)
+        self.label = list(label)
+        ix = np.floor(np.asarray(lon, dtype=float) / CELL_DEG).astype(np.int64)
+        iy = np.floor(np.asarray(lat, dtype=float) / CELL_DEG).astype(np.int64)
+        keys = [(int(x), int(y)) for x, y in zip(ix, iy)]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.order = order
+        self.cells = {}
+        for pos, i in enumerate(order):
+            start, _ = self.cells.get(keys[i], (pos, pos))
+            self.cells[keys[i]] = (start, pos + 1)
+
+    def __len__(self):
+        return len(self.lon)
+
+    @classmethod
+    def from_geojson(cls, path=CAMERAS_GEOJSON, roads=None):
+        """Loads speed_cameras.geojson; `roads` (a RouteKmIndex) adds per-camera travel bearings."""
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json.load(f).get('features', [])
+        ahead = CameraAheadIndex(roads) if roads is not None else None
+        cols = ([], [], [], [], [], [], [])
+        for feat in features:
+            coords = (feat.get('geometry') or {}).get('coordinates')
+            if not coords:
+                continue
+            props = feat.get('properties') or {}
+            bearing, two_way = math.nan, True
+            cam = ahead.add(props, coords[0], coords[1]) if ahead is not None else None
+            if cam is not None:
+                chain = roads.chains[cam.road][cam.chain]
+                sign = km_sign(chain) if cam.direction != 'descendente' else -km_sign(chain)
+                bearing, two_way = chain_bearing(chain, cam.chainage, sign), cam.direction is None
+            for col, value in zip(cols, (coords[0], coords[1], bearing, two_way,
+                                         parse_speed(props.get('velocidadPermitida')),
+                                         props.get('nroSerie'), props.get('calleRuta'))):
+                col.append(value)
+        return cls(*cols)
+
+class AlertEngine:
+    """
+    Debounced enter/approach/pass alerts for a stream of fixes.
+
+        engine = AlertEngine(CameraSet.from_geojson())
+        for alert in engine.stream(fixes):
+            ...
+
+    push() is the hot path; stream() and astream() wrap it for iterables and
+    async iterables. Alerts also go to `on_event` when given.
+    """
+
+    def __init__(self, cameras, on_event=None, max_window=MAX_WINDOW):
+        self.cameras = cameras
+        self.on_event = on_event
+        self.max_window = max_window
+        n = len(cameras)
+        self.state = [IDLE] * n
+        self.count = [0] * n
+        self.stamp = [0] * n
+        self.window = [0] * max_window
+        self.window_size = 0
+        self.generation = 0
+        self.cell = None
+        self.last_lon = self.last_lat = self.last_t = None
+        self.heading = None
+        self.speed_kmh = None
+        self.pending = deque(maxlen=MAX_PENDING)
+        self.fixes = 0
+        self.events = 0
+        self.refills = 0
+
+    def _refill(self, cx, cy, lon, lat):
+        """Loads the cameras of the 3x3 cells around (cx, cy) into the window (the nearest ones if over capacity)."""
+        cams = self.cameras
+        self.generation += 1
+        gen = self.generation
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                span = cams.cells.get((cx + dx, cy + dy))
+                if span is not None:
+                    found.extend(cams.order[span[0]:span[1]])
+        if len(found) > self.max_window:
+            k = KM_PER_DEG * math.cos(math.radians(lat))
+            found.sort(key=lambda i: ((cams.lon[i] - lon) * k) ** 2 + ((cams.lat[i] - lat) * KM_PER_DEG) ** 2)
+            del found[self.max_window:]
+        for i in found:
+            self.stamp[i] = gen
+        # Cameras that dropped out (left the 3x3 cells, or the farthest of an over-full window) are re-armed
+        window = self.window
+        for j in range(self.window_size):
+            i = window[j]
+            if self.stamp[i] != gen:
+                self.state[i] = IDLE
+                self.count[i] = 0
+        for j, i in enumerate(found):
+            window[j] = i
+        self.window_size = len(found)
+        self.refills += 1
+
+    def _emit(self, kind, t, i, d_km):
+        cams = self.cameras
+        limit = cams.speed_limit[i]
+        speed = self.speed_kmh
+        alert = Alert(kind, t, i, d_km * 1000.0, speed, limit,
+                      bool(limit and speed is not None and speed > limit), cams.serial[i], cams.label[i])
+        self.events += 1
+        self.pending.append(alert)
+        if self.on_event is not None:
+            self.on_event(alert)
+
+    def push(self, t, lon, lat, speed_kmh=None, heading=None):
+        """
+        Processes one fix. Returns the number of alerts it raised; they are
+        queued in self.pending (drained by stream()) and passed to on_event.
+        """
+        self.fixes += 1
+        # Heading and speed: from the receiver when it reports them, else from the last fix
+        if self.last_lon is not None:
+            k = KM_PER_DEG * math.cos(math.radians(lat))
+            mx, my = (lon - self.last_lon) * k, (lat - self.last_lat) * KM_PER_DEG
+            moved = math.hypot(mx, my)
+            if moved >= MIN_MOVE_KM:
+                if heading is None:
+                    self.heading = math.degrees(math.atan2(mx, my)) % 360.0
+                if speed_kmh is None and t > self.last_t:
+                    inst = moved / (t - self.last_t) * 3600.0
+                    prev = self.speed_kmh
+                    self.speed_kmh = inst if prev is None else prev + SPEED_SMOOTHING * (inst - prev)
+                self.last_lon, self.last_lat, self.last_t = lon, lat, t
+        else:
+            self.last_lon, self.last_lat, self.last_t = lon, lat, t
+        if heading is not None:
+            self.heading = heading
+        if speed_kmh is not None:
+            self.speed_kmh = speed_kmh
+
+        cx, cy = math.floor(lon / CELL_DEG), math.floor(lat / CELL_DEG)
+        if self.cell is None or cx != self.cell[0] or cy != self.cell[1]:
+            self.cell = (cx, cy)
+            self._refill(cx, cy, lon, lat)
+        if self.heading is None:
+            return 0
+
+        cams = self.cameras
+        state, count, window = self.state, self.count, self.window
+        c_lon, c_lat, c_bearing, c_two_way = cams.lon, cams.lat, cams.bearing, cams.two_way
+        heading = self.heading
+        k = KM_PER_DEG * math.cos(math.radians(lat))
+        raised = 0
+        for j in range(self.window_size):
+            i = window[j]
+            dx, dy = (c_lon[i] - lon) * k, (c_lat[i] - lat) * KM_PER_DEG
+            d = math.hypot(dx, dy)
+            s = state[i]
+            if d > EXIT_KM:
+                if s != IDLE:
+                    state[i] = IDLE
+                    count[i] = 0
+                continue
+            if s == PASSED:
+                continue
+            off = angle_diff(math.degrees(math.atan2(dx, dy)) % 360.0, heading)
+            b = c_bearing[i]
+            if b == b:  # not NaN
+                turn = angle_diff(b, heading)
+                if c_two_way[i] and turn > 90.0:
+                    turn = 180.0 - turn
+                matches = turn <= HEADING_TOLERANCE
+            else:
+                matches = True
+            if s == IDLE:
+                hit = matches and d <= ENTER_KM and off <= AHEAD_CONE
+                nxt, kind = ENTERED, ENTER
+            elif s == ENTERED and not (d <= PASS_KM and off > 90.0):
+                hit = matches and d <= APPROACH_KM and off <= AHEAD_CONE
+                nxt, kind = APPROACHING, APPROACH
+            else:
+                # Also from ENTERED: with sparse fixes the approach stage can be skipped
+                hit = d <= PASS_KM and off > 90.0
+                nxt, kind = PASSED, PASS
+            if not hit:
+                count[i] = 0
+                continue
+            count[i] += 1
+            if count[i] >= DEBOUNCE_FIXES:
+                state[i] = nxt
+                count[i] = 0
+                self._emit(kind, t, i, d)
+                raised += 1
+        return raised
+
+    def push_fix(self, fix):
+        return self.push(fix.t, fix.lon, fix.lat, fix.speed_kmh, fix.heading)
+
+    def stream(self, fixes):
+        """Generator of Alerts for an iterable of Fix (or (t, lon, lat[, speed, heading]) tuples)."""
+        pending = self.pending
+        for fix in fixes:
+            if self.push(*fix):
+                while pending:
+                    yield pending.popleft()
+
+    async def astream(self, fixes):
+        """Async generator of Alerts for an async iterable of fixes."""
+        pending = self.pending
+        async for fix in fixes:
+            if self.push(*fix):
+                while pending:
+                    yield pending.popleft()
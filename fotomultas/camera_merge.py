@@ -0,0 +1,204 @@
+import hashlib
+import json
+import math
+import os
+
+# Keyed, idempotent merge of the camera sources into speed_cameras.geojson.
+#
+# Every source (PBA HTML, CABA shapefile, CABA CSV, national registry) keeps its
+# own records in a state file, keyed by a stable feature id. Syncing a source
+# whose input file hasn't changed is skipped without parsing it; a changed one
+# is diffed record by record (upsert + delete). The output is the union of all
+# sources where the same physical camera reported by different sources within
+# DEDUP_METERS is collapsed into the record of the highest-priority source,
+# sorted by id and only rewritten when its bytes actually change.
+
+STATE_FILE = 'speed_cameras.state.json'
+DEDUP_METERS = 30.0
+# Earlier sources win when two of them report the same camera
+SOURCE_PRIORITY = ['PBA', 'CABA_SHP', 'NACION', 'CABA']
+STATE_VERSION = 2           # 2: NACION records no longer carry a stored `vigente` flag
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def record_hash(feature):
+    return hashlib.sha1(json.dumps(feature, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def location_id(source, lon, lat, label=''):
+    """Stable id for sources without serial numbers: hash of source, rounded location and label."""
+    key = f"{source}|{lon:.5f}|{lat:.5f}|{' '.join(str(label or '').lower().split())}"
+    return f"{source}:{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+
+def assign_ids(source, features, serial_key='nroSerie'):
+    """
+    Sets feature['id'] to '<source>:<serial>' when the serial is unique within
+    the source, and to a location hash otherwise (or always, with
+    serial_key=None, for sources whose serials are just row numbers).
+    Returns {id: feature}.
+    """
+    def serial_of(feat):
+        return str(feat['properties'].get(serial_key) or '').strip() if serial_key else ''
+
+    counts = {}
+    for feat in features:
+        serial = serial_of(feat)
+        counts[serial] = counts.get(serial, 0) + 1
+    records = {}
+    for feat in features:
+        serial = serial_of(feat)
+        lon, lat = feat['geometry']['coordinates'][:2]
+        if serial and counts[serial] == 1:
+            fid = f"{source}:{serial}"
+        else:
+            fid = location_id(source, lon, lat, feat['properties'].get('calleRuta'))
+        feat = {'type': 'Feature', 'id': fid, 'geometry': feat['geometry'],
+                'properties': dict(feat['properties'], source=source)}
+        records[fid] = feat
+    return records
+
+class SpatialHash:
+    """Uniform grid of ~cell_m metre cells; neighbours() returns ids in the 3x3 cells around a point."""
+
+    def __init__(self, cell_m=DEDUP_METERS):
+        self.cell_deg = cell_m / 111320.0
+        self.cells = {}
+
+    def _cell(self, lon, lat):
+        # Longitude cells are widened by 1/cos(lat) so they stay ~cell_m wide
+        scale = max(math.cos(math.radians(lat)), 0.1)
+        return int(math.floor(lon * scale / self.cell_deg)), int(math.floor(lat / self.cell_deg))
+
+    def add(self, fid, lon, lat):
+        self.cells.setdefault(self._cell(lon, lat), []).append((fid, lon, lat))
+
+    def neighbours(self, lon, lat):
+        cx, cy = self._cell(lon, lat)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self.cells.get((cx + dx, cy + dy), ())
+
+def distance_m(lon1, lat1, lon2, lat2):
+    k = math.cos(math.radians((lat1 + lat2) / 2))
+    return 111320.0 * math.hypot((lon2 - lon1) * k, lat2 - lat1)
+
+class CameraStore:
+    """
+    Per-source camera records persisted in STATE_FILE.
+
+        store = CameraStore()
+        store.sync_source('PBA', 'MEDIDORESPBA.HTML', lambda: parse_cameras('MEDIDORESPBA.HTML'))
+        store.write('speed_cameras.geojson')
+        store.save()
+    """
+
+    def __init__(self, path=STATE_FILE, dedup_meters=DEDUP_METERS):
+        self.path = path
+        self.dedup_meters = dedup_meters
+        self.sources = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == STATE_VERSION:
+                self.sources = state.get('sources', {})
+
+    def sync_source(self, name, input_path, loader, serial_key='nroSerie'):
+        """
+        Brings one source up to date with its input file. `loader` is only
+        called when the file's digest changed. Returns (added, updated, removed).
+        """
+        if not os.path.exists(input_path):
+            print(f"File missing: {input_path} (keeping {len(self.sources.get(name, {}).get('records', {}))} stored {name} records)")
+            return 0, 0, 0
+        digest = file_digest(input_path)
+        current = self.sources.get(name)
+        if current and current.get('digest') == digest:
+            return 0, 0, 0
+        return self.upsert_source(name, loader(), digest, serial_key)
+
+    def upsert_source(self, name, features, digest=None, serial_key='nroSerie'):
+        """Replaces the records of one source: new ids are added, changed ones updated, missing ones deleted."""
+        incoming = assign_ids(name, features, serial_key)
+        current = self.sources.setdefault(name, {'digest': None, 'records': {}, 'hashes': {}})
+        records, hashes = current['records'], current['hashes']
+        added = updated = 0
+        for fid, feat in incoming.items():
+            h = record_hash(feat)
+            if fid not in records:
+                added += 1
+            elif hashes.get(fid) == h:
+                continue
+            else:
+                updated += 1
+            records[fid] = feat
+            hashes[fid] = h
+        removed = [fid for fid in records if fid not in incoming]
+        for fid in removed:
+            del records[fid]
+            hashes.pop(fid, None)
+        current['digest'] = digest
+        self.dirty = True
+        print(f"{name}: {len(records)} records ({added} added, {updated} updated, {len(removed)} removed)")
+        return added, updated, len(removed)
+
+    def remove_source(self, name):
+        if self.sources.pop(name, None) is not None:
+            self.dirty = True
+
+    def merged_features(self):
+        """
+        Union of all sources with cross-source duplicates collapsed. The kept
+        feature lists the ids it absorbed in properties['mergedIds'].
+        """
+        order = {name: i for i, name in enumerate(SOURCE_PRIORITY)}
+        names = sorted(self.sources, key=lambda n: (order.get(n, len(order)), n))
+        grid = SpatialHash(self.dedup_meters)
+        kept = {}
+        for name in names:
+            records = self.sources[name]['records']
+            for fid in sorted(records):
+                feat = records[fid]
+                lon, lat = feat['geometry']['coordinates'][:2]
+                dup = None
+                for other, olon, olat in grid.neighbours(lon, lat):
+                    if kept[other]['properties']['source'] != name and distance_m(lon, lat, olon, olat) <= self.dedup_meters:
+                        dup = other
+                        break
+                if dup is not None:
+                    props = kept[dup]['properties']
+                    props['mergedIds'] = sorted(props.get('mergedIds', []) + [fid])
+                    continue
+                kept[fid] = {'type': 'Feature', 'id': fid, 'geometry': feat['geometry'],
+                             'properties': dict(feat['properties'])}
+                grid.add(fid, lon, lat)
+        return [kept[fid] for fid in sorted(kept)]
+
+    def write(self, path):
+        """Writes the merged collection; the file is left untouched when the bytes are identical. Returns True if written."""
+        features = self.merged_features()
+        data = json.dumps({'type': 'FeatureCollection', 'features': features},
+                          indent=2, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        print(f"Wrote {len(features)} features to {path}")
+        return True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'sources': self.sources}, f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.dirty = False
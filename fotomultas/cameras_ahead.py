@@ -0,0 +1,309 @@
+import argparse
+import json
+import math
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+
+from route_km_geocoder import KM_TOLERANCE, ROAD_RE, RouteKmIndex, fold, load_index, normalize_ref, parse_route_km
+
+# "Next camera ahead" index for navigation. Every camera that can be tied to a
+# road (a ref in calleRuta, a km marker, or just its coordinates close to an
+# indexed road) is linear-referenced: we store its chainage (km along the road
+# chain's geometry) in a sorted list per lane. A lane is one road chain in one
+# travel direction, so cameras with `sentido` Ascendente/Descendente only show
+# up for traffic going that way and cameras without a direction go in both.
+#
+# A query is then "where am I on which chain" + one bisect in that lane: the
+# cost depends on the cameras of that single road, never on the national total.
+# At GPS rate the position comes from a ChainCursor, which only re-projects the
+# fix onto the few segments around the previous match.
+#
+#   python cameras_ahead.py --roads roads.geojson --road RN34 --km 120 --heading ascendente
+#   python cameras_ahead.py --roads roads.geojson --at=-61.35,-32.2 -n 5
+
+CAMERAS_GEOJSON = 'speed_cameras.geojson'
+SNAP_KM = 0.25              # cameras further than this from every candidate chain stay unindexed
+CURSOR_WINDOW = 8           # segments searched on each side of the last match
+CURSOR_MAX_OFFSET_KM = 0.05  # a windowed match further off the road than this falls back to a full search
+KM_PER_DEG = 111.32
+SOURCE_PROVINCE = {'PBA': 'buenos aires', 'CABA': 'caba', 'CABA_SHP': 'caba'}
+
+class Camera(NamedTuple):
+    serial: Optional[str]
+    source: Optional[str]
+    label: Optional[str]        # calleRuta as published
+    road: str                   # index key: RN34, RP2|buenos aires, AP01
+    chain: int                  # index of the chain within road
+    chainage: float             # km along the chain's drawing direction
+    direction: Optional[str]    # 'ascendente' / 'descendente' / None (both)
+    speed_limit: Optional[int]  # velocidadPermitida, km/h
+    lon: Optional[float]
+    lat: Optional[float]
+
+class CameraAhead(NamedTuple):
+    distance_km: float          # along the road, from the query chainage
+    camera: Camera
+
+class RoadPosition(NamedTuple):
+    road: str
+    chain: int
+    chainage: float
+    offset_km: float            # distance from the fix to the road, 0 for km-based positions
+
+def km_sign(chain):
+    """+1 if the chain's km posts grow along its drawing, -1 if they shrink. Uncalibrated chains count as +1."""
+    if chain.post_km is None or len(chain.post_km) < 2:
+        return 1
+    return 1 if chain.post_km[-1] >= chain.post_km[0] else -1
+
+def parse_direction(text):
+    if not text:
+        return None
+    text = fold(str(text))
+    if text.startswith('desc'):
+        return 'descendente'
+    if text.startswith('asc'):
+        return 'ascendente'
+    return None
+
+def parse_speed(value):
+    try:
+        return int(float(str(value).replace(',', '.')))
+    except (TypeError, ValueError):
+        return None
+
+def road_of(label):
+    """(road ref, km, direction, province) out of a calleRuta string; missing parts are None."""
+    parsed = parse_route_km(label)
+    if parsed is not None:
+        return parsed.road, parsed.km, parsed.direction, parsed.province
+    if isinstance(label, str):
+        m = ROAD_RE.search(fold(label))
+        if m:
+            return normalize_ref(m.group('kind'), m.group('num')), None, None, None
+    return None, None, None, None
+
+class ChainCursor:
+    """
+    Tracks a moving point along one chain. update() projects a fix onto the
+    CURSOR_WINDOW segments around the previous match with plain float math, so
+    its cost doesn't grow with the chain's length; only when the fix has left
+    that window (or the first time) it falls back to a full projection.
+    """
+
+    def __init__(self, chain, segment=None, window=CURSOR_WINDOW):
+        self.chain = chain
+        self.window = window
+        self.segment = segment
+        self._lon = chain.coords[:, 0].tolist()
+        self._lat = chain.coords[:, 1].tolist()
+        self._ch = chain.chainage.tolist()
+        self._k_lon = [KM_PER_DEG * math.cos(math.radians((a + b) / 2)) for a, b in zip(self._lat, self._lat[1:])]
+
+    def update(self, lon, lat):
+        """Returns (offset_km, chainage_km) of the fix."""
+        if self.segment is not None:
+            lo = max(self.segment - self.window, 0)
+            hi = min(self.segment + self.window + 1, len(self._k_lon))
+            best_d, best_c, best_i, best_t = math.inf, 0.0, lo, 0.0
+            first = last = None
+            lons, lats, ch, k_lon = self._lon, self._lat, self._ch, self._k_lon
+            for i in range(lo, hi):
+                k = k_lon[i]
+                sx, sy = (lons[i + 1] - lons[i]) * k, (lats[i + 1] - lats[i]) * KM_PER_DEG
+                len2 = sx * sx + sy * sy
+                if len2 <= 0:
+                    continue
+                if first is None:
+                    first = i
+                last = i
+                px, py = (lon - lons[i]) * k, (lat - lats[i]) * KM_PER_DEG
+                t = min(max((px * sx + py * sy) / len2, 0.0), 1.0)
+                d = math.hypot(px - t * sx, py - t * sy)
+                if d < best_d:
+                    best_d, best_c, best_i, best_t = d, ch[i] + t * (ch[i + 1] - ch[i]), i, t
+            # Clamped to the window's first/last real segment: the fix may be further along
+            edge = ((best_i == first and best_t == 0.0 and lo > 0)
+                    or (best_i == last and best_t == 1.0 and hi < len(k_lon)))
+            if best_d <= CURSOR_MAX_OFFSET_KM and not edge:
+                self.segment = best_i
+                return best_d, best_c
+        d, c, self.segment = self.chain.project_segment(lon, lat)
+        return d, c
+
+class CameraAheadIndex:
+    """
+    Per-lane sorted chainages of the cameras on a RouteKmIndex. Lanes are keyed
+    by (road key, chain index, +1/-1), the sign being the direction of travel
+    relative to the chain's drawing.
+    """
+
+    def __init__(self, roads):
+        self.roads = roads
+        self.lanes = {}
+        self.unmatched = []
+
+    def _keys(self, road, province):
+        keys = [RouteKmIndex._key(road, province), road]
+        keys += [k for k in self.roads.chains if k.startswith(road + '|') and k not in keys]
+        return [k for k in keys if k in self.roads.chains]
+
+    def _snap(self, lon, lat, keys):
+        best = None
+        for key in keys:
+            for ci, chain in enumerate(self.roads.chains[key]):
+                dist, ch = chain.project(lon, lat)
+                if dist <= SNAP_KM and (best is None or dist < best[0]):
+                    best = (dist, key, ci, ch)
+        return best
+
+    def position(self, lon, lat, road=None, province=None):
+        """Snaps a point to the closest chain (of `road` if given). Returns a RoadPosition or None."""
+        keys = self._keys(road, province) if road else list(self.roads.chains)
+        best = self._snap(lon, lat, keys)
+        if best is None:
+            return None
+        return RoadPosition(best[1], best[2], best[3], best[0])
+
+    def position_at_km(self, road, km, province=None):
+        """RoadPosition of a km marker on a calibrated chain of `road`, or None."""
+        best = None
+        for key in self._keys(road, province):
+            for ci, chain in enumerate(self.roads.chains[key]):
+                rng = chain.km_range()
+                if rng is None:
+                    continue
+                outside = max(rng[0] - km, km - rng[1], 0.0)
+                if outside <= KM_TOLERANCE and (best is None or outside < best[0]):
+                    best = (outside, key, ci, chain)
+        if best is None:
+            return None
+        return RoadPosition(best[1], best[2], best[3].chainage_at_km(km), 0.0)
+
+    def cursor(self, position):
+        """A ChainCursor on the chain of `position`, for following a vehicle along it."""
+        return ChainCursor(self.roads.chains[position.road][position.chain])
+
+    def add(self, props, lon=None, lat=None):
+        """Indexes one camera (GeoJSON properties + coordinates). Returns its Camera or None."""
+        label = props.get('calleRuta')
+        road, km, direction, province = road_of(label)
+        province = province or SOURCE_PROVINCE.get(props.get('source'))
+        direction = parse_direction(props.get('sentido')) or direction
+
+        pos = None
+        if road and km is not None:
+            pos = self.position_at_km(road, km, province)
+        if lon is not None:
+            # Coordinates win over a km marker that lands somewhere else (uncalibrated
+            # stretch, km posts from another carriageway); cameras without a road ref
+            # go to whichever indexed road passes by
+            if pos is not None and self.roads.chains[pos.road][pos.chain].project(lon, lat)[0] > SNAP_KM:
+                pos = self.position(lon, lat, road, province) or pos
+            elif pos is None:
+                pos = self.position(lon, lat, road, province)
+        if pos is None:
+            self.unmatched.append(props)
+            return None
+
+        camera = Camera(props.get('nroSerie'), props.get('source'), label, pos.road, pos.chain, pos.chainage,
+                        direction, parse_speed(props.get('velocidadPermitida')), lon, lat)
+        sign = km_sign(self.roads.chains[pos.road][pos.chain])
+        if direction is None:
+            signs = (1, -1)
+        else:
+            signs = (sign if direction == 'ascendente' else -sign,)
+        for s in signs:
+            chainages, cameras = self.lanes.setdefault((pos.road, pos.chain, s), ([], []))
+            i = bisect_right(chainages, camera.chainage)
+            chainages.insert(i, camera.chainage)
+            cameras.insert(i, camera)
+        return camera
+
+    @classmethod
+    def from_geojson(cls, roads, path=CAMERAS_GEOJSON):
+        index = cls(roads)
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json.load(f).get('features', [])
+        for feat in features:
+            coords = (feat.get('geometry') or {}).get('coordinates') or (None, None)
+            index.add(feat.get('properties') or {}, coords[0], coords[1])
+        return index
+
+    def travel_sign(self, position, heading):
+        """+1/-1 travel direction along the chain for a 'ascendente'/'descendente' heading (km-wise)."""
+        sign = km_sign(self.roads.chains[position.road][position.chain])
+        return sign if heading == 'ascendente' else -sign
+
+    def ahead(self, position, heading='ascendente', n=3, sign=None):
+        """
+        The next `n` cameras ahead of `position` for traffic heading
+        'ascendente' or 'descendente' (km-wise), nearest first. Pass `sign`
+        (+1/-1 along the chain) instead when the heading comes from the
+        vehicle's own movement. A camera exactly at the position counts as ahead.
+        """
+        if sign is None:
+            sign = self.travel_sign(position, heading)
+        lane = self.lanes.get((position.road, position.chain, sign))
+        if lane is None:
+            return []
+        chainages, cameras = lane
+        x = position.chainage
+        if sign > 0:
+            i = bisect_left(chainages, x)
+            return [CameraAhead(c.chainage - x, c) for c in cameras[i:i + n]]
+        i = bisect_right(chainages, x)
+        return [CameraAhead(x - c.chainage, c) for c in reversed(cameras[max(i - n, 0):i])]
+
+    def __len__(self):
+        return len({id(c) for _, cameras in self.lanes.values() for c in cameras})
+
+def main():
+    parser = argparse.ArgumentParser(description='Next speed cameras ahead along a road.')
+    parser.add_argument('--roads', required=True, help='Road network extract (.geojson or .osm.pbf)')
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--road', help='Road ref (RN34, RP2, AP01); optional with --at')
+    parser.add_argument('--province', default=None)
+    parser.add_argument('--km', type=float, help='Position as a km marker on --road')
+    parser.add_argument('--at', help='Position as lon,lat')
+    parser.add_argument('--heading', choices=['ascendente', 'descendente'], default='ascendente')
+    parser.add_argument('-n', type=int, default=3)
+    parser.add_argument('--bench', type=int, default=0, help='Time this many queries')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = CameraAheadIndex.from_geojson(load_index(args.roads), args.cameras)
+    print(f"Indexed {len(index)} cameras in {len(index.lanes)} lanes "
+          f"({len(index.unmatched)} off the road network) in {time.perf_counter() - start:.2f}s")
+
+    if args.at:
+        lon, lat = (float(v) for v in args.at.split(','))
+        pos = index.position(lon, lat, args.road, args.province)
+    elif args.road and args.km is not None:
+        pos = index.position_at_km(args.road, args.km, args.province)
+    else:
+        parser.error('give a position with --at or --road + --km')
+    if pos is None:
+        print("Position is not on an indexed road")
+        return
+    print(f"{pos.road} chain {pos.chain} at {pos.chainage:.3f} km ({pos.offset_km * 1000:.0f} m off), heading {args.heading}")
+    for hit in index.ahead(pos, args.heading, args.n):
+        cam = hit.camera
+        limit = f"{cam.speed_limit} km/h" if cam.speed_limit else "no limit listed"
+        print(f"  {hit.distance_km:8.3f} km  {limit:>15}  {cam.serial or '-'}  {cam.label}")
+
+    if args.bench:
+        lanes = list(index.lanes)
+        positions = []
+        for i in range(args.bench):
+            road, ci, _ = lanes[i % len(lanes)]
+            positions.append(RoadPosition(road, ci, (i * 7.919) % max(index.roads.chains[road][ci].length, 1e-3), 0.0))
+        start = time.perf_counter()
+        for p in positions:
+            index.ahead(p, args.heading, args.n)
+        elapsed = time.perf_counter() - start
+        print(f"{len(positions)} queries in {elapsed * 1000:.1f} ms ({elapsed / max(len(positions), 1) * 1e6:.2f} us/query)")
+
+if __name__ == "__main__":
+    main()
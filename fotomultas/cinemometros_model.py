@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from datetime import date, datetime
+
+import pandas as pd
+
+from address_canon import canonical_key
+
+# cinemometros.csv has one row per verification (fecha_de_verificacion) of each
+# camera. This splits it into a device table (one row per serial + location,
+# with its latest verification) and a verification-history table, stored in
+# SQLite so "is this camera certified?" and "show me its history" are indexed
+# lookups. Whether a verification is still current depends on the day you ask,
+# so it is never stored: is_current() evaluates it at query time.
+
+INPUT_FILE = 'cinemometros.csv'
+DEFAULT_DB = 'cinemometros.sqlite'
+# Speed cameras must be re-verified every year
+VALIDITY_DAYS = 365
+
+SCHEMA = """
+DROP TABLE IF EXISTS device;
+DROP TABLE IF EXISTS verification;
+CREATE TABLE device (
+    device_id TEXT PRIMARY KEY,
+    nro_de_serie TEXT NOT NULL,
+    marca TEXT,
+    modelo TEXT,
+    tipo TEXT,
+    lugar_de_instalacion TEXT,
+    primera_verificacion TEXT,
+    ultima_verificacion TEXT,
+    verificaciones INTEGER NOT NULL,
+    lat REAL,
+    lon REAL
+);
+CREATE INDEX device_serie ON device (nro_de_serie);
+CREATE TABLE verification (
+    device_id TEXT NOT NULL,
+    fecha TEXT,                    -- ISO date, NULL for undated ones
+    fecha_raw TEXT,                -- as published (e.g. 'Primitiva')
+    lugar_de_instalacion TEXT
+);
+CREATE INDEX verification_device ON verification (device_id, fecha);
+"""
+
+def device_ids(serials, location_keys):
+    """Stable device id per (serial, canonical location): '<serial>@<8 hex digits>'."""
+    pairs = pd.DataFrame({'s': serials.fillna('').astype(str), 'k': location_keys})
+    unique = pairs.drop_duplicates()
+    ids = {(s, k): f"{s}@{hashlib.sha1(f'{s}|{k}'.encode('utf-8')).hexdigest()[:8]}"
+           for s, k in zip(unique['s'], unique['k'])}
+    return pd.Series([ids[p] for p in zip(pairs['s'], pairs['k'])], index=serials.index)
+
+def complete_location_keys(serials, location_keys):
+    """
+    Per serial, replaces a location key that only lacks the town ("au illia km 1.2")
+    with the one longer key of that serial it is a prefix of ("au illia km 1.2 caba").
+    When a serial has several longer keys (different towns) it is left alone.
+    """
+    pairs = pd.DataFrame({'s': serials.fillna('').astype(str), 'k': location_keys}).drop_duplicates()
+    fill = {}
+    for serial, keys in pairs.groupby('s')['k']:
+        keys = set(keys)
+        for key in keys:
+            longer = [k for k in keys if k.startswith(key + ' ')]
+            if len(longer) == 1:
+                fill[(serial, key)] = longer[0]
+    if not fill:
+        return location_keys
+    return pd.Series([fill.get(p, p[1]) for p in zip(serials.fillna('').astype(str), location_keys)],
+                     index=location_keys.index)
+
+def is_current(ultima_verificacion, as_of=None):
+    """True when an ISO date (latest verification) is at most VALIDITY_DAYS old on `as_of` (default today)."""
+    if not ultima_verificacion:
+        return False
+    as_of = as_of or date.today()
+    return (as_of - datetime.strptime(ultima_verificacion, '%Y-%m-%d').date()).days <= VALIDITY_DAYS
+
+def build_model(df):
+    """
+    Splits the per-verification rows into (devices, verifications) DataFrames.
+    Works on cinemometros.csv as well as on cinemometros_geocoded.csv (lat/lon
+    are carried over to the device from its latest located row).
+    """
+    df = df.copy()
+    keys = {a: canonical_key(a) for a in df['lugar_de_instalacion'].dropna().unique()}
+    location_keys = complete_location_keys(df['nro_de_serie'], df['lugar_de_instalacion'].map(keys).fillna(''))
+    df['device_id'] = device_ids(df['nro_de_serie'], location_keys)
+    df['fecha'] = pd.to_datetime(df['fecha_de_verificacion'], format='%Y-%m-%d', errors='coerce')
+    df = df.sort_values(['device_id', 'fecha'], na_position='first', kind='mergesort')
+
+    verifications = pd.DataFrame({
+        'device_id': df['device_id'],
+        'fecha': df['fecha'].dt.strftime('%Y-%m-%d'),
+        'fecha_raw': df['fecha_de_verificacion'],
+        'lugar_de_instalacion': df['lugar_de_instalacion'],
+    }).drop_duplicates().reset_index(drop=True)
+
+    grouped = df.groupby('device_id', sort=True)
+    devices = df.drop_duplicates('device_id', keep='last').set_index('device_id')
+    devices = devices[['nro_de_serie', 'marca', 'modelo', 'tipo', 'lugar_de_instalacion']].copy()
+    devices['primera_verificacion'] = grouped['fecha'].min()
+    devices['ultima_verificacion'] = grouped['fecha'].max()
+    devices['verificaciones'] = verifications.groupby('device_id').size()
+    if 'lat' in df and 'lon' in df:
+        # GroupBy.last() skips NaN: the latest row that has coordinates
+        devices[['lat', 'lon']] = grouped[['lat', 'lon']].last()
+    else:
+        devices['lat'] = devices['lon'] = float('nan')
+    for col in ('primera_verificacion', 'ultima_verificacion'):
+        devices[col] = devices[col].dt.strftime('%Y-%m-%d')
+    return devices.reset_index(), verifications
+
+class CinemometroRegistry:
+    """
+    SQLite-backed device / verification-history tables.
+
+        registry = CinemometroRegistry()
+        registry.build(pd.read_csv('cinemometros.csv'))
+        registry.history('NEO-0048')
+        registry.is_certified('NEO-0048')
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def build(self, df):
+        """Rebuilds both tables from per-verification rows. Returns (devices, verifications) counts."""
+        devices, verifications = build_model(df)
+        devices = devices.astype(object).where(devices.notna(), None)
+        verifications = verifications.astype(object).where(verifications.notna(), None)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.executemany(
+                'INSERT INTO device VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                devices[['device_id', 'nro_de_serie', 'marca', 'modelo', 'tipo', 'lugar_de_instalacion',
+                         'primera_verificacion', 'ultima_verificacion', 'verificaciones', 'lat', 'lon']]
+                .itertuples(index=False, name=None))
+            self.conn.executemany(
+                'INSERT INTO verification VALUES (?, ?, ?, ?)',
+                verifications[['device_id', 'fecha', 'fecha_raw', 'lugar_de_instalacion']].itertuples(index=False, name=None))
+        return len(devices), len(verifications)
+
+    def devices(self, serial):
+        """Devices (one per installation location) of a serial number, latest verified first."""
+        rows = self.conn.execute(
+            'SELECT * FROM device WHERE nro_de_serie = ? ORDER BY ultima_verificacion DESC', (serial,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def history(self, serial_or_device):
+        """Full verification history of a serial number or a device_id, oldest first."""
+        column = 'v.device_id' if '@' in serial_or_device else 'd.nro_de_serie'
+        rows = self.conn.execute(
+            'SELECT v.device_id, v.fecha, v.fecha_raw, v.lugar_de_instalacion FROM verification v '
+            f'JOIN device d ON d.device_id = v.device_id WHERE {column} = ? '
+            'ORDER BY v.fecha IS NOT NULL, v.fecha', (serial_or_device,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def is_certified(self, serial_or_device, as_of=None):
+        """True when the latest verification is at most VALIDITY_DAYS old on `as_of` (default today)."""
+        column = 'device_id' if '@' in serial_or_device else 'nro_de_serie'
+        row = self.conn.execute(f'SELECT MAX(ultima_verificacion) FROM device WHERE {column} = ?',
+                                (serial_or_device,)).fetchone()
+        return is_current(row[0] if row else None, as_of)
+
+def main():
+    parser = argparse.ArgumentParser(description='Device / verification model for cinemometros.')
+    parser.add_argument('--input', default=INPUT_FILE, help=f'Per-verification CSV (Default {INPUT_FILE})')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'SQLite database (Default {DEFAULT_DB})')
+    parser.add_argument('--history', default=None, help='Print the verification history of a serial number or device id')
+    args = parser.parse_args()
+
+    with CinemometroRegistry(args.db) as registry:
+        if args.history:
+            for row in registry.history(args.history):
+                print(f"{row['fecha'] or row['fecha_raw']:<12} {row['device_id']:<20} {row['lugar_de_instalacion']}")
+            print(f"Certified today: {registry.is_certified(args.history)}")
+            return
+        if not os.path.exists(args.input):
+            print(f"Error: {args.input} not found.")
+            return
+        df = pd.read_csv(args.input)
+        devices, verifications = registry.build(df)
+        print(f"{len(df)} rows -> {devices} devices, {verifications} verifications in {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,33 @@
+import os
+import sys
+
 import pandas as pd
-import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from geojson_writer import write_point_collection
+from intermedios import read_table
+
+COLUMNS = ['lat', 'lon', 'formatted_address', 'lugar_de_instalacion', 'tipo']
 
 def convert_csv_to_geojson(input_file, output_file):
-    df = pd.read_csv(input_file)
-    
+    # The typed table geocode_speedcameras.py writes next to the CSV export
+    if input_file.endswith('.parquet'):
+        df = read_table(input_file, 'cinemometros_geocoded', columns=COLUMNS)
+    else:
+        df = pd.read_csv(input_file)
+
     # Filter out rows with missing lat/lon
     df = df.dropna(subset=['lat', 'lon'])
-    
-    features = []
-    for _, row in df.iterrows():
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [float(row['lon']), float(row['lat'])]
-            },
-            "properties": {
-                "address": row['formatted_address'],
-                "original_location": row['lugar_de_instalacion'],
-                "type": row.get('tipo', 'Unknown')
-            }
-        }
-        features.append(feature)
-        
-    geojson = {
-        "type": "FeatureCollection",
-        "features": features
+
+    properties = {
+        "address": df['formatted_address'],
+        "original_location": df['lugar_de_instalacion'],
+        "type": df['tipo'] if 'tipo' in df.columns else pd.Series('Unknown', index=df.index)
     }
-    
-    with open(output_file, 'w') as f:
-        json.dump(geojson, f, indent=2)
-        
-    print(f"Converted {len(features)} records to {output_file}")
+    count = write_point_collection(output_file, df['lon'], df['lat'], properties)
+
+    print(f"Converted {count} records to {output_file}")
 
 if __name__ == "__main__":
-    convert_csv_to_geojson('cinemometros_geocoded.csv', 'speed_cameras.geojson')
+    # Only the national cameras: the combined speed_cameras.geojson is built by merge_cameras.py
+    convert_csv_to_geojson('cinemometros_geocoded.parquet', 'cinemometros_geocoded.geojson')
@@ -0,0 +1,113 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for Nominatim's /search endpoint. It answers deterministically
+# (same query -> same point inside Argentina), records the arrival time of every
+# request and can inject failures, so the rate limiter and retry logic in
+# geocode_pipeline can be checked without touching the real service:
+#
+#   python fake_geocoder.py --port 8765 --error-rate 0.1
+#   python geocode_speedcameras.py --test --workers 8 --domain localhost:8765 --rate 5
+
+class FakeGeocoderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, error_rate=0.0, miss_rate=0.0, latency=0.0, seed=0, error_status=503):
+        super().__init__(address, FakeGeocoderHandler)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.miss_rate = miss_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.timestamps = []
+        self.lock = threading.Lock()
+
+    @property
+    def domain(self):
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+class FakeGeocoderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.timestamps.append(time.monotonic())
+            fail = server.rng.random() < server.error_rate
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != '/search':
+            self._send(404, b'not found')
+            return
+        if fail:
+            # 503 (transient) by default; 400/403 etc. to check that non-transient errors aren't retried
+            self._send(server.error_status, b'injected error')
+            return
+
+        query = parse_qs(url.query).get('q', [''])[0]
+        digest = hashlib.sha1(query.encode('utf-8')).digest()
+        results = []
+        if digest[0] / 255.0 >= server.miss_rate:
+            lat = -55.0 + 33.0 * int.from_bytes(digest[1:5], 'big') / 2**32
+            lon = -73.5 + 20.0 * int.from_bytes(digest[5:9], 'big') / 2**32
+            results.append({'lat': f"{lat:.7f}", 'lon': f"{lon:.7f}",
+                            'display_name': f"{query} (fake)", 'place_id': int.from_bytes(digest[9:13], 'big'),
+                            'boundingbox': [f"{lat:.7f}", f"{lat:.7f}", f"{lon:.7f}", f"{lon:.7f}"]})
+        self._send(200, json.dumps(results).encode('utf-8'), 'application/json')
+
+    def _send(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def max_requests_in_window(timestamps, window=1.0):
+    """Largest number of requests that arrived within any `window` seconds."""
+    ts = sorted(timestamps)
+    best = 0
+    start = 0
+    for end, t in enumerate(ts):
+        while t - ts[start] >= window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+def start_fake_geocoder(port=0, **kwargs):
+    """Starts the server on a background thread and returns it."""
+    server = FakeGeocoderServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Nominatim /search for local testing.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of the injected errors')
+    parser.add_argument('--miss-rate', type=float, default=0.0, help='Fraction of queries with no result')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering')
+    args = parser.parse_args()
+
+    server = FakeGeocoderServer(('127.0.0.1', args.port), args.error_rate, args.miss_rate, args.latency,
+                                error_status=args.error_status)
+    print(f"Fake geocoder on http://{server.domain}/search (Ctrl-C prints request stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        ts = server.timestamps
+        print(f"\n{len(ts)} requests, max in any 1 s window: {max_requests_in_window(ts)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import csv
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_FILE = 'geocode_cache.sqlite'
+NEGATIVE_TTL_DAYS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    query_key TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    raw_query TEXT,
+    lat REAL,
+    lon REAL,
+    formatted_address TEXT,
+    status TEXT NOT NULL,          -- 'ok' or 'miss'
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (query_key, provider)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS geocode_status ON geocode (provider, status, updated_at);
+"""
+
+def normalize_query(query):
+    """
+    Normalizes a query string into the cache key: lowercase, single spaces,
+    no spaces before punctuation.
+    """
+    if not isinstance(query, str):
+        return ""
+    key = re.sub(r'\s+', ' ', query.strip().lower())
+    key = re.sub(r'\s+([,.;:)])', r'\1', key)
+    return key
+
+class GeocodeCache:
+    """
+    Persistent geocode cache backed by SQLite in WAL mode.
+
+    Every put() is committed immediately (write-through), so an interrupted run
+    keeps everything geocoded so far. Misses are stored too and are considered
+    valid for `negative_ttl_days`, after which they are retried.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, negative_ttl_days=NEGATIVE_TTL_DAYS):
+        self.path = path
+        self.negative_ttl = negative_ttl_days * 86400
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+
+    def get(self, query, provider):
+        """
+        Returns (lat, lon, formatted_address) for a cached hit, (None, None, None)
+        for a cached miss that has not expired, or None when the query must be
+        (re)geocoded.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT lat, lon, formatted_address, status, updated_at FROM geocode '
+                'WHERE query_key = ? AND provider = ?',
+                (normalize_query(query), provider)).fetchone()
+        if row is None:
+            return None
+        lat, lon, addr, status, updated_at = row
+        if status == 'miss':
+            if time.time() - updated_at > self.negative_ttl:
+                return None
+            return None, None, None
+        return lat, lon, addr
+
+    def put(self, query, provider, lat, lon, formatted_address, raw_query=None):
+        """Stores a result (lat=None means a miss) and commits right away."""
+        status = 'ok' if lat is not None and lon is not None else 'miss'
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO geocode '
+                '(query_key, provider, raw_query, lat, lon, formatted_address, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (normalize_query(query), provider, raw_query or query,
+                 lat if status == 'ok' else None, lon if status == 'ok' else None,
+                 formatted_address if status == 'ok' else None, status, time.time()))
+            self.conn.commit()
+
+    def import_csv(self, csv_path, provider, query_column='lugar_de_instalacion', to_query=None):
+        """
+        Imports an existing CSV cache (e.g. unique_cache.csv). Rows without
+        coordinates are skipped: the old format can't tell a miss from a row
+        that was never processed.
+
+        Returns the number of imported rows.
+        """
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            return self.import_records(csv.DictReader(f), provider, query_column, to_query)
+
+    def import_records(self, records, provider, query_column='lugar_de_instalacion', to_query=None):
+        """Like import_csv, from any iterable of dicts with query_column, lat, lon and formatted_address."""
+        to_query = to_query or (lambda raw: raw)
+        rows = []
+        for row in records:
+            raw = row.get(query_column)
+            try:
+                lat = float(row.get('lat') or '')
+                lon = float(row.get('lon') or '')
+            except (TypeError, ValueError):
+                continue
+            if lat != lat or lon != lon:
+                continue
+            address = row.get('formatted_address')
+            rows.append((normalize_query(to_query(raw)), provider, raw, lat, lon,
+                         address if isinstance(address, str) and address else None, 'ok', time.time()))
+        with self._lock:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO geocode '
+                '(query_key, provider, raw_query, lat, lon, formatted_address, status, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.conn.commit()
+        return len(rows)
+
+    def export_csv(self, csv_path, provider, query_column='lugar_de_instalacion'):
+        """Exports the positive results of a provider in the unique_cache.csv layout."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT raw_query, lat, lon, formatted_address FROM geocode "
+                "WHERE provider = ? AND status = 'ok' ORDER BY raw_query", (provider,)).fetchall()
+        tmp = csv_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([query_column, 'lat', 'lon', 'formatted_address'])
+            writer.writerows(rows)
+        os.replace(tmp, csv_path)
+        return len(rows)
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+
+from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited
+
+# Per-provider settings. `rate` is requests/second shared by ALL workers,
+# `burst` is how many requests may go out back to back after an idle period.
+PROVIDERS = {
+    # Public Nominatim: absolute max 1 req/s per the usage policy
+    'nominatim': {'domain': 'nominatim.openstreetmap.org', 'scheme': 'https', 'rate': 1.0, 'burst': 1},
+    # Self-hosted Nominatim (docker) on this machine
+    'nominatim-local': {'domain': 'localhost:8080', 'scheme': 'http', 'rate': 200.0, 'burst': 20},
+}
+
+# Only transient failures. GeocoderServiceError is also the base class of bad
+# queries, auth and quota errors, which would fail again: those are raised at once.
+RETRYABLE = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available, so
+    any number of workers sharing one bucket never exceed `rate` requests/second
+    (after an initial burst of at most `capacity`).
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class RateLimitedGeocoder:
+    """
+    Wraps a geopy geocoder so every request takes a token from a shared bucket
+    and transient errors are retried with jittered exponential backoff. Exposes
+    the same geocode() call, so geocode_address() works unchanged.
+    """
+
+    def __init__(self, geocoder, limiter, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.geocoder = geocoder
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def geocode(self, query, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            self._count('requests')
+            try:
+                return self.geocoder.geocode(query, **kwargs)
+            except RETRYABLE:
+                if attempt == self.max_retries:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+def build_geocoder(provider, user_agent, rate=None, burst=None, domain=None, timeout=10):
+    """
+    Builds a rate-limited Nominatim client for one of PROVIDERS, optionally
+    overriding its rate, burst or domain (e.g. to point at fake_geocoder.py).
+    """
+    from geopy.geocoders import Nominatim
+
+    cfg = dict(PROVIDERS[provider])
+    if rate is not None:
+        cfg['rate'] = rate
+        # A lower rate shouldn't keep the provider's (larger) burst
+        cfg['burst'] = min(cfg['burst'], max(1, int(rate)))
+    if burst is not None:
+        cfg['burst'] = burst
+    if domain is not None:
+        cfg['domain'] = domain
+        cfg['scheme'] = 'http' if domain.startswith(('localhost', '127.')) else cfg['scheme']
+    geolocator = Nominatim(user_agent=user_agent, domain=cfg['domain'], scheme=cfg['scheme'], timeout=timeout)
+    limiter = TokenBucket(cfg['rate'], cfg['burst'])
+    return RateLimitedGeocoder(geolocator, limiter)
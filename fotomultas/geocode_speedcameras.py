@@ -1,18 +1,32 @@
 import pandas as pd
-from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
-import time
 from tqdm import tqdm
 import sys
 import os
 import argparse
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from geocode_cache import GeocodeCache, DEFAULT_CACHE_FILE
+from geocode_pipeline import PROVIDERS, build_geocoder
+from route_km_geocoder import load_index
+from address_canon import AddressCanonicalizer
+from medidores_stream import iter_camera_features
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from intermedios import read_table, write_table
 
 # --- Configuration ---
 INPUT_FILE = 'cinemometros.csv'
-OUTPUT_FILE = 'cinemometros_geocoded.csv'
+OUTPUT_FILE = 'cinemometros_geocoded.csv'          # export
+OUTPUT_TABLE = 'cinemometros_geocoded.parquet'     # read by merge_cameras.py
 USER_AGENT = "speedcamera_geocoder_v1.1"
-RATE_LIMIT_DELAY = 1.1  # Seconds between requests (Nominatim policy says absolute max 1/s)
+DEFAULT_PROVIDER = 'nominatim'  # Rate limits per provider live in geocode_pipeline.PROVIDERS
+CACHE_TABLE = 'unique_cache.parquet'
+LEGACY_CACHE_CSV = 'unique_cache.csv'
+# Sources that already carry coordinates; a national address that canonicalizes
+# to one of their locations doesn't need a lookup at all.
+CABA_SOURCE = 'caba_full_data.parquet'
+PBA_SOURCE = 'MEDIDORESPBA.HTML'
+MAX_SOURCE_SPREAD_DEG = 0.005  # ~500 m: a label used for cameras further apart names a road, not a place
 
 def clean_address(raw_address):
     """
@@ -36,7 +50,9 @@ def clean_address(raw_address):
 
 def geocode_address(geolocator, raw_address):
     """
-    Geocodes a single address string. Returns (lat, lon, formatted_address).
+    Geocodes a single address string. Returns (lat, lon, formatted_address),
+    or (None, None, None) when the geocoder found nothing. Timeouts and other
+    errors are raised so the caller doesn't cache them as misses.
     """
     query_address = clean_address(raw_address)
     try:
@@ -53,19 +69,50 @@ def geocode_address(geolocator, raw_address):
                 return location.latitude, location.longitude, location.address + " (approx)"
                 
     except (GeocoderTimedOut, GeocoderUnavailable):
-        # In a real threaded env, we might want to retry, but for simplicity we return None
-        # and let the main loop handle (or just leave empty)
-        pass
-    except Exception as e:
-        # print(f"Error: {e}")
-        pass
+        # Transient: let the main loop skip it so it is retried on the next run
+        raise
         
     return None, None, None
 
+def load_source_locations():
+    """
+    Reads (raw_address, source, (lat, lon, formatted_address)) from the CABA and
+    PBA extracts. Labels whose cameras are spread over more than
+    MAX_SOURCE_SPREAD_DEG (e.g. "Ruta Provincial 51") are skipped.
+    """
+    points = {}
+    if os.path.exists(CABA_SOURCE):
+        caba = read_table(CABA_SOURCE, 'caba_full_data', columns=['Name', 'Latitud', 'Longitud'])
+        caba = caba.dropna(subset=['Latitud', 'Longitud'])
+        for name, lat, lon in zip(caba['Name'], caba['Latitud'], caba['Longitud']):
+            points.setdefault((name, 'CABA'), []).append((lat, lon))
+    if os.path.exists(PBA_SOURCE):
+        # Straight from the PBA page: speed_cameras.geojson is built from this script's output
+        for feat in iter_camera_features(PBA_SOURCE):
+            lon, lat = feat['geometry']['coordinates'][:2]
+            points.setdefault((feat['properties'].get('calleRuta'), 'PBA'), []).append((lat, lon))
+
+    located = []
+    for (raw, source), pts in points.items():
+        if not raw:
+            continue
+        lats, lons = [p[0] for p in pts], [p[1] for p in pts]
+        if max(lats) - min(lats) > MAX_SOURCE_SPREAD_DEG or max(lons) - min(lons) > MAX_SOURCE_SPREAD_DEG:
+            continue
+        located.append((raw, source, (sum(lats) / len(lats), sum(lons) / len(lons), f"{raw} ({source})")))
+    return located
+
 def main():
     parser = argparse.ArgumentParser(description='Geocode speed cameras.')
     parser.add_argument('--test', action='store_true', help='Run in test mode (first 5 unique records)')
-    parser.add_argument('--workers', type=int, default=1, help='Number of threads (Default 1 to respect Rate Limits)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of threads (the rate limit is shared by all of them)')
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), default=DEFAULT_PROVIDER, help=f'Geocoding provider (Default {DEFAULT_PROVIDER})')
+    parser.add_argument('--rate', type=float, default=None, help="Override the provider's requests/second")
+    parser.add_argument('--domain', default=None, help="Override the provider's host (e.g. localhost:8765 for fake_geocoder.py)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_FILE, help=f'SQLite geocode cache (Default {DEFAULT_CACHE_FILE})')
+    parser.add_argument('--roads', default=None, help='Road network extract (.geojson or .osm.pbf) to resolve "Ruta N km X" addresses offline')
+    parser.add_argument('--no-shared-sources', action='store_true', help=f'Do not reuse locations from {CABA_SOURCE} / {PBA_SOURCE}')
+    parser.add_argument('--groups', default=None, help='Write the canonical address groups to this CSV for review')
     args = parser.parse_args()
 
     print(f"Reading {INPUT_FILE}...")
@@ -85,83 +132,108 @@ def main():
     unique_df['lon'] = None
     unique_df['formatted_address'] = None
 
-    # Load existing progress if any
-    if os.path.exists('unique_cache.csv'):
-        print("Loading cached unique addresses...")
-        cached_df = pd.read_csv('unique_cache.csv')
-        # Update unique_df with known values
-        # We merge to keep only current unique addresses but fill known ones
-        unique_df = pd.merge(unique_df, cached_df[['lugar_de_instalacion', 'lat', 'lon', 'formatted_address']], 
-                             on='lugar_de_instalacion', how='left', suffixes=('', '_y'))
-        
-        # Coalesce
-        if 'lat_y' in unique_df.columns:
-            unique_df['lat'] = unique_df['lat'].fillna(unique_df['lat_y'])
-            unique_df['lon'] = unique_df['lon'].fillna(unique_df['lon_y'])
-            unique_df['formatted_address'] = unique_df['formatted_address'].fillna(unique_df['formatted_address_y'])
-            unique_df = unique_df.drop(columns=['lat_y', 'lon_y', 'formatted_address_y'])
+    # Load existing progress from the SQLite cache (seeded from the last run's table on first use)
+    cache = GeocodeCache(args.cache)
+    if len(cache) == 0 and os.path.exists(CACHE_TABLE):
+        records = read_table(CACHE_TABLE, 'unique_cache').to_dict('records')
+        imported = cache.import_records(records, args.provider, to_query=clean_address)
+        print(f"Imported {imported} results from {CACHE_TABLE} into {args.cache}")
+    elif len(cache) == 0 and os.path.exists(LEGACY_CACHE_CSV):
+        imported = cache.import_csv(LEGACY_CACHE_CSV, args.provider, to_query=clean_address)
+        print(f"Imported {imported} results from {LEGACY_CACHE_CSV} into {args.cache}")
+
+    known = pd.Series(False, index=unique_df.index)
+
+    # Road + km addresses are interpolated along the road network locally; the
+    # network geocoder would only return the town centre for them anyway.
+    if args.roads:
+        roads = load_index(args.roads)
+        for idx, address in unique_df['lugar_de_instalacion'].items():
+            located = roads.geocode(address)
+            if located is not None:
+                known[idx] = True
+                unique_df.at[idx, 'lat'], unique_df.at[idx, 'lon'], unique_df.at[idx, 'formatted_address'] = located
+        print(f"Resolved offline from {args.roads}: {int(known.sum())}")
+
+    # Equivalent strings (lane/direction variants, "10,8" vs "10.8", accents...)
+    # collapse into one canonical group that is looked up once for all of them.
+    canon = AddressCanonicalizer()
+    if not args.no_shared_sources:
+        for raw, source, location in load_source_locations():
+            canon.add(raw, source, location)
+    group_rows = {}
+    for idx, address in unique_df['lugar_de_instalacion'].items():
+        if not known[idx]:
+            group_rows.setdefault(canon.add(address, 'NACION'), []).append(idx)
+
+    def resolve(group, result):
+        for idx in group_rows[group]:
+            known[idx] = True
+            unique_df.at[idx, 'lat'], unique_df.at[idx, 'lon'], unique_df.at[idx, 'formatted_address'] = result
+
+    for group, rows in group_rows.items():
+        result = canon.known.get(group)
+        if result is None:
+            result = cache.get(canon.key(group), args.provider)
+        if result is None:
+            # Entries cached before canonicalization are keyed by clean_address()
+            for idx in rows:
+                result = cache.get(clean_address(unique_df.at[idx, 'lugar_de_instalacion']), args.provider)
+                if result is not None:
+                    break
+        if result is not None:
+            resolve(group, result)
+    print(f"Known after cache lookup: {int(known.sum())} addresses (including known misses)")
 
     # Determine what to process
+    pending = [group for group, rows in group_rows.items() if not known[rows[0]]]
     if args.test:
-        print("Running in TEST mode (processing first 5 unique records)...")
-        to_process_indices = unique_df[unique_df['lat'].isnull()].head(5).index
+        print("Running in TEST mode (processing first 5 address groups)...")
+        pending = pending[:5]
     else:
-        to_process_indices = unique_df[unique_df['lat'].isnull()].index
-        print(f"Addresses remaining to geocode: {len(to_process_indices)}")
+        print(f"Address groups remaining to geocode: {len(pending)}")
 
-    geolocator = Nominatim(user_agent=USER_AGENT)
+    # Every request (including fallbacks and retries) takes a token from one
+    # bucket shared by all workers, so the provider's rate holds for any --workers.
+    geolocator = build_geocoder(args.provider, USER_AGENT, rate=args.rate, domain=args.domain)
 
-    # We use a lock or just robust logic. Since we are updating specific indices, it's thread-safe enough for pandas in this context?
-    # Actually, pandas isn't strictly thread safe for writing. 
-    # Better to collect results and update.
-
-    results = []
-    
-    # To respect rate limits with threading, we need to be careful.
-    # If workers=1, it is sequential.
-    # If workers > 1, we share the pool.
-    
-    # NOTE: Nominatim requires 1 req/sec. We enforce this by sleeping.
-    # If we have multiple workers, we can't easily enforce a global rate limit without a lock.
-    # But filtering uniqueness IS the speedup.
-    
+    # Workers only geocode; results are written to unique_df and the cache from this thread.
     with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        future_to_index = {}
-        for idx in to_process_indices:
-            address = unique_df.at[idx, 'lugar_de_instalacion']
-            future = executor.submit(geocode_address, geolocator, address)
-            future_to_index[future] = idx
-            
-            # Simple rate limiting: Sleep in the main submission loop? 
-            # No, that slows down submission but not execution if pool is large.
-            # But with workers=1 it behaves sequentially.
-            if args.workers == 1:
-                time.sleep(RATE_LIMIT_DELAY)
-
-        for future in tqdm(as_completed(future_to_index), total=len(to_process_indices), desc="Geocoding"):
-            idx = future_to_index[future]
+        future_to_group = {}
+        for group in pending:
+            future = executor.submit(geocode_address, geolocator, canon.representative(group))
+            future_to_group[future] = group
+
+        for future in tqdm(as_completed(future_to_group), total=len(pending), desc="Geocoding"):
+            group = future_to_group[future]
             try:
                 lat, lon, addr = future.result()
-                unique_df.at[idx, 'lat'] = lat
-                unique_df.at[idx, 'lon'] = lon
-                unique_df.at[idx, 'formatted_address'] = addr
             except Exception as e:
-                pass
-            
-            # If threaded, we might be hitting rate limits.
-            if args.workers > 1:
-                # We can't really sleep here effectively for the API, 
-                # but we rely on the user knowing what they are doing if they asked for threads.
-                pass
+                # Not cached: it will be retried on the next run
+                continue
+            # Write-through: a crash or Ctrl-C keeps everything geocoded so far
+            cache.put(canon.key(group), args.provider, lat, lon, addr, raw_query=canon.representative(group))
+            resolve(group, (lat, lon, addr))
+
+    stats = geolocator.stats
+    print(f"Requests: {stats['requests']}, retries: {stats['retries']}, failed after retries: {stats['failures']}")
+    print(canon.report(addresses=len(unique_df), requests=len(pending)))
+    if args.groups:
+        canon.write_groups(args.groups)
+        print(f"Address groups written to {args.groups}")
 
-    # Save cache
-    unique_df.to_csv('unique_cache.csv', index=False)
+    # Keep the table cache in sync for anything still reading it
+    write_table(unique_df, CACHE_TABLE, 'unique_cache')
+    cache.close()
 
     # Merge back to main DF
     print("Merging results back to main dataset...")
     final_df = pd.merge(df, unique_df, on='lugar_de_instalacion', how='left')
     
     final_output = 'cinemometros_geocoded_test.csv' if args.test else OUTPUT_FILE
+    if not args.test:
+        write_table(final_df, OUTPUT_TABLE, 'cinemometros_geocoded')
+        print(f"Typed copy saved to {OUTPUT_TABLE}")
     final_df.to_csv(final_output, index=False)
     print(f"Done! Results saved to {final_output}")
 
@@ -0,0 +1,173 @@
+import json
+import mmap
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from geojson_writer import write_features
+
+# Single-pass streaming extractor for pages that publish their cameras as
+# JavaScript object literals, like MEDIDORESPBA.HTML:
+#
+#     receivedArr.push({
+#         nroSerie: "LUTEC_020",
+#         latitud: "-36.980358",
+#         longitud: "-60.285294",
+#         // nroKilometro: "456",
+#     })
+#
+# The file (memory-mapped, or read in chunks from any binary stream) is walked
+# once: a bytes find() jumps between `push(` openers and one combined tokenizer
+# emits the opening of a push({, each key: value pair and the closing }); a
+# small state machine turns those into features. Field
+# order doesn't matter, unknown fields become properties, comments are
+# skipped and quoted values may contain escaped quotes. Other provinces' pages
+# only need a different `array` name (and `lat_keys` / `lon_keys` if their
+# coordinate fields are named differently).
+
+DEFAULT_ARRAY = 'receivedArr'
+LAT_KEYS = ('latitud', 'lat', 'latitude')
+LON_KEYS = ('longitud', 'lon', 'lng', 'longitude')
+CHUNK_SIZE = 1 << 20
+
+_STRING = rb'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\''
+_VALUE = _STRING + rb'|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null'
+
+def build_tokenizer(array=DEFAULT_ARRAY):
+    """Compiled tokenizer for `<array>.push({ ... })` objects."""
+    return re.compile(
+        rb'(?P<open>\b' + re.escape(array.encode('ascii')) + rb'\.push\(\s*\{)'
+        rb'|(?P<close>\}\s*\))'
+        rb'|(?P<comment>//[^\n]*|/\*.*?\*/)'
+        rb'|(?P<key>[A-Za-z_$][\w$]*|' + _STRING + rb')\s*:\s*(?P<value>' + _VALUE + rb')',
+        re.DOTALL)
+
+def _decode_value(raw, encoding):
+    text = raw.decode(encoding, errors='replace')
+    if text[0] in '"\'' and '\\' not in text:
+        return text[1:-1]
+    if text[0] == '"':
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text[1:-1]
+    if text[0] == "'":
+        inner = text[1:-1].replace("\\'", "'").replace('"', '\\"')
+        try:
+            return json.loads(f'"{inner}"')
+        except ValueError:
+            return text[1:-1]
+    if text in ('true', 'false'):
+        return text == 'true'
+    if text == 'null':
+        return None
+    number = float(text)
+    return int(number) if number.is_integer() and '.' not in text and 'e' not in text.lower() else number
+
+def _decode_key(raw, encoding):
+    text = raw.decode(encoding, errors='replace')
+    return text[1:-1] if text[0] in '"\'' else text
+
+def _scan(buf, tokenizer, opener, state):
+    """
+    Tokenizes the objects in `buf`: a fast bytes find() jumps to each opener,
+    then the tokenizer runs until that object's closing token. state['resume']
+    is left at the first byte that may still belong to an unfinished object.
+    """
+    pos = 0
+    while True:
+        i = buf.find(opener, pos)
+        if i < 0:
+            state['resume'] = max(pos, len(buf) - len(opener))
+            return
+        for match in tokenizer.finditer(buf, i):
+            yield match
+            if match.lastgroup == 'close':
+                pos = match.end()
+                break
+        else:
+            state['resume'] = i
+            return
+
+def _iter_tokens(source, tokenizer, opener):
+    """
+    Yields tokens from `source`: a path (memory-mapped) or a binary file-like
+    object read in CHUNK_SIZE pieces. In chunked mode an object cut by the
+    end of a chunk is tokenized again from its opener once the rest arrives;
+    the new 'open' token resets it, so nothing is emitted twice.
+    """
+    state = {}
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from _scan(mm, tokenizer, opener, state)
+        return
+
+    buf = b''
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        buf += chunk
+        yield from _scan(buf, tokenizer, opener, state)
+        buf = buf[state['resume']:]
+
+def iter_objects(source, array=DEFAULT_ARRAY, encoding='utf-8'):
+    """Yields one dict per `<array>.push({...})` in source, with its keys in file order."""
+    tokenizer = build_tokenizer(array)
+    opener = array.encode('ascii') + b'.push('
+    current = None
+    for match in _iter_tokens(source, tokenizer, opener):
+        kind = match.lastgroup
+        if kind == 'open':
+            current = {}
+        elif kind == 'close':
+            if current is not None:
+                yield current
+            current = None
+        elif kind == 'value' and current is not None:
+            current[_decode_key(match.group('key'), encoding)] = _decode_value(match.group('value'), encoding)
+
+def _coordinate(obj, keys):
+    for key in keys:
+        if key in obj:
+            try:
+                return float(str(obj[key]).replace(',', '.'))
+            except ValueError:
+                return None
+    return None
+
+def iter_camera_features(source, array=DEFAULT_ARRAY, encoding='utf-8', lat_keys=LAT_KEYS, lon_keys=LON_KEYS):
+    """
+    Yields a GeoJSON point feature per pushed object. Coordinates are taken out
+    of the properties; objects without valid (non-zero) coordinates are skipped.
+    """
+    coord_keys = set(lat_keys) | set(lon_keys)
+    for obj in iter_objects(source, array, encoding):
+        lat = _coordinate(obj, lat_keys)
+        lon = _coordinate(obj, lon_keys)
+        if lat is None or lon is None or (lat == 0.0 and lon == 0.0):
+            continue
+        yield {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {k: v for k, v in obj.items() if k not in coord_keys},
+        }
+
+def extract(source, output_file, array=DEFAULT_ARRAY, encoding='utf-8'):
+    """Streams the features of `source` straight into a GeoJSON file. Returns how many were written."""
+    return write_features(output_file, iter_camera_features(source, array, encoding))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Extract pushed camera objects from an HTML page into GeoJSON.')
+    parser.add_argument('input', help='HTML page (e.g. MEDIDORESPBA.HTML)')
+    parser.add_argument('output', help='GeoJSON output')
+    parser.add_argument('--array', default=DEFAULT_ARRAY, help=f'JS array the page pushes into (Default {DEFAULT_ARRAY})')
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+    count = extract(args.input, args.output, args.array, args.encoding)
+    print(f"Extracted {count} cameras to {args.output}")
@@ -1,20 +1,19 @@
 import csv
-import json
 import os
+import sys
+from camera_merge import CameraStore, STATE_FILE
+from cinemometros_model import build_model
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from intermedios import read_table, SchemaError
 
 EXISTING_GEOJSON = 'speed_cameras.geojson'
+PBA_FILE = 'MEDIDORESPBA.HTML'
 CABA_FILE = 'camaras-fijas-de-control-vehicular.csv'
-NACION_FILE = 'cinemometros_geocoded.csv'
-
-def load_existing_features():
-    if not os.path.exists(EXISTING_GEOJSON):
-        return []
-    try:
-        with open(EXISTING_GEOJSON, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('features', [])
-    except:
-        return []
+CABA_DBF_FILE = 'caba/camaras-fijas-de-control-vehicular.dbf'
+NACION_FILE = 'cinemometros_geocoded.parquet'
+# The only columns build_model() needs
+NACION_COLUMNS = ['marca', 'modelo', 'nro_de_serie', 'lugar_de_instalacion', 'fecha_de_verificacion', 'tipo', 'lat', 'lon']
 
 def safe_float(val):
     if not val: return None
@@ -30,106 +29,105 @@ def process_caba():
         print(f"File missing: {CABA_FILE}")
         return features
     
-    # Try encodings
-    encodings = ['latin-1', 'utf-8', 'cp1252']
-    rows = []
-    used_enc = ''
-    
-    for enc in encodings:
-        try:
-            with open(CABA_FILE, 'r', encoding=enc, newline='') as f:
-                reader = csv.DictReader(f, delimiter=';')
-                # Force read to check encoding
-                rows = list(reader)
-            used_enc = enc
-            print(f"Read CABA with {enc}")
-            break
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            print(f"Error reading CABA with {enc}: {e}")
-            
-    for i, row in enumerate(rows):
-        # Validate columns flexibly
-        lat_key = next((k for k in row.keys() if k and 'latitud' in k.lower()), None)
-        lon_key = next((k for k in row.keys() if k and 'longitud' in k.lower()), None)
-        ubi_key = next((k for k in row.keys() if k and 'ubicacion' in k.lower()), None)
+    # Open data portal export: UTF-8 when re-downloaded, latin-1 in older copies
+    with open(CABA_FILE, 'rb') as f:
+        data = f.read()
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+    reader = csv.DictReader(text.splitlines(), delimiter=';')
+
+    # Columns are resolved once from the header, not per row
+    fields = reader.fieldnames or []
+    lat_key = next((k for k in fields if k and 'latitud' in k.lower()), None)
+    lon_key = next((k for k in fields if k and 'longitud' in k.lower()), None)
+    ubi_key = next((k for k in fields if k and 'ubicacion' in k.lower()), None)
+    if not (lat_key and lon_key):
+        print(f"{CABA_FILE}: no latitud/longitud columns in {fields}")
+        return features
+
+    for i, row in enumerate(reader):
+        lat = safe_float(row[lat_key])
+        lon = safe_float(row[lon_key])
         
-        if lat_key and lon_key:
-            lat = safe_float(row[lat_key])
-            lon = safe_float(row[lon_key])
+        if lat and lon:
+            props = {
+                "nroSerie": f"CABA_{i+1}",
+                "calleRuta": row.get(ubi_key),
+                "source": "CABA"
+            }
+            feature = {
+                "type": "Feature",
+                "geometry": { "type": "Point", "coordinates": [lon, lat] },
+                "properties": props
+            }
+            features.append(feature)
             
-            if lat and lon:
-                props = {
-                    "nroSerie": f"CABA_{i+1}",
-                    "calleRuta": row.get(ubi_key),
-                    "source": "CABA"
-                }
-                feature = {
-                    "type": "Feature",
-                    "geometry": { "type": "Point", "coordinates": [lon, lat] },
-                    "properties": props
-                }
-                features.append(feature)
-                
     return features
 
 def process_nacion():
+    """One feature per device (serial + location) with its latest verification, not one per verification row."""
     features = []
     if not os.path.exists(NACION_FILE):
         print(f"File missing: {NACION_FILE}")
         return features
-        
+
     try:
-        with open(NACION_FILE, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                lat = safe_float(row.get('lat', ''))
-                lon = safe_float(row.get('lon', ''))
-                
-                if lat and lon:
-                    props = {
-                        "nroSerie": row.get('nro_de_serie', 'NACION'),
-                        "calleRuta": row.get('lugar_de_instalacion', 'Unknown'),
-                        "source": "NACION",
-                        "marca": row.get('marca', ''),
-                        "modelo": row.get('modelo', '')
-                    }
-                    feature = {
-                        "type": "Feature",
-                        "geometry": { "type": "Point", "coordinates": [lon, lat] },
-                        "properties": props
-                    }
-                    features.append(feature)
-    except Exception as e:
+        devices, _ = build_model(read_table(NACION_FILE, 'cinemometros_geocoded', columns=NACION_COLUMNS))
+    except (OSError, SchemaError) as e:
         print(f"Error reading Nacion file: {e}")
-        
+        return features
+
+    devices = devices[devices['lat'].notna() & devices['lon'].notna()]
+    for row in devices.itertuples(index=False):
+        props = {
+            "deviceId": row.device_id,
+            "nroSerie": row.nro_de_serie,
+            "calleRuta": row.lugar_de_instalacion,
+            "source": "NACION",
+            "marca": row.marca,
+            "modelo": row.modelo,
+            # Only the date: validity depends on when the map is looked at (cinemometros_model.is_current)
+            "fechaVerificacion": row.ultima_verificacion if isinstance(row.ultima_verificacion, str) else "",
+        }
+        feature = {
+            "type": "Feature",
+            "geometry": { "type": "Point", "coordinates": [float(row.lon), float(row.lat)] },
+            "properties": props
+        }
+        features.append(feature)
+
     return features
 
+def merge(state_file=STATE_FILE, output=EXISTING_GEOJSON):
+    """
+    Syncs every source into the keyed camera store and writes the merged
+    GeoJSON. Sources whose input file is unchanged are not even parsed, and the
+    output file is left untouched when nothing changed.
+    """
+    from extract_cameras import parse_cameras
+    from process_caba_dbf import read_dbf_records, read_points, build_features
+
+    store = CameraStore(state_file)
+    store.sync_source('PBA', PBA_FILE, lambda: parse_cameras(PBA_FILE))
+    store.sync_source('CABA_SHP', CABA_DBF_FILE, lambda: build_features(read_dbf_records(CABA_DBF_FILE)[0], read_points(CABA_DBF_FILE)), serial_key=None)
+    if os.path.exists(CABA_DBF_FILE):
+        # The shapefile is the newer, fuller export of the same devices; the portal
+        # CSV places them 30-70 m away, so merging both showed every camera twice
+        store.remove_source('CABA')
+    else:
+        # CSV row numbers aren't stable serials: identify by location instead
+        store.sync_source('CABA', CABA_FILE, process_caba, serial_key=None)
+    store.sync_source('NACION', NACION_FILE, process_nacion, serial_key='deviceId')
+    written = store.write(output)
+    store.save()
+    if not written:
+        print(f"{output} is up to date.")
+    return written
+
 def main():
-    existing = load_existing_features()
-    caba = process_caba()
-    nacion = process_nacion()
-    
-    print(f"Existing: {len(existing)}, CABA: {len(caba)}, Nacion: {len(nacion)}")
-    
-    # We do NOT append existing if it already contains the merged data from a previous run to avoid rapid duplication
-    # A simple check: if existing count > 5000 and we are adding ~300, it might be safer to restart from base 
-    # or detect if features look same.
-    # For now, to simply fulfill "add these", we append. 
-    # Ideally, we'd start with a 'clean' base if we knew which one it was. 
-    # Assuming 'speed_cameras.geojson' WAS just the 'renabap' or similar set initially? 
-    # No, speed_cameras.geojson was 198KB (line 4 of step 4). 
-    # CABA is small? Nacion is small?
-    # Let's just combine all.
-    
-    combined = existing + caba + nacion
-    
-    output = { "type": "FeatureCollection", "features": combined }
-    
-    with open(EXISTING_GEOJSON, 'w', encoding='utf-8') as f:
-        json.dump(output, f, indent=2)
-    print("Done.")
+    merge()
 
 if __name__ == "__main__":
     main()
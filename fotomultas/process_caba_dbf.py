@@ -1,59 +1,38 @@
-import struct
-import json
-import re
+import argparse
 import os
+import re
 import csv
+import sys
+import pandas as pd
+from merge_cameras import merge
+from shapefile_reader import DBFReader, ShapefileReader
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'comun'))
+from intermedios import write_table, SchemaError
 
 DBF_FILE = 'caba/camaras-fijas-de-control-vehicular.dbf'
 CSV_OUTPUT = 'caba_full_data.csv'
+# Typed copy read by the later stages (geocode_speedcameras.py); the CSV is only an export
+PARQUET_OUTPUT = 'caba_full_data.parquet'
 GEOJSON_FILE = 'speed_cameras.geojson'
 
 def read_dbf_records(filename):
-    records = []
-    field_names = []
+    """Returns (records, field_names) with every value as text, as exported to CSV_OUTPUT."""
     try:
-        with open(filename, 'rb') as f:
-            # Header
-            data = f.read(32)
-            num_records = struct.unpack('<I', data[4:8])[0]
-            header_len = struct.unpack('<H', data[8:10])[0]
-            
-            # Fields
-            fields = []
-            f.seek(32)
-            while f.tell() < header_len - 1:
-                field_data = f.read(32)
-                if field_data[0] == 0x0D: break
-                name = field_data[0:11].replace(b'\x00', b'').decode('latin-1').strip()
-                length = field_data[16]
-                fields.append({'name': name, 'len': length})
-            
-            field_names = [fd['name'] for fd in fields]
-            f.seek(header_len)
-            
-            for _ in range(num_records):
-                flag = f.read(1)
-                record = {}
-                for fd in fields:
-                    if flag == b'*': # Deleted
-                        f.read(fd['len'])
-                        continue
-                        
-                    raw = f.read(fd['len'])
-                    try:
-                        val = raw.decode('utf-8').strip()
-                    except:
-                        val = raw.decode('latin-1').strip()
-                    val = val.replace('\x00', '')
-                    record[fd['name']] = val
-                
-                if flag != b'*':
-                    records.append(record)
-                    
-    except Exception as e:
+        dbf = DBFReader(filename)
+    except (OSError, ValueError) as e:
         print(f"Error reading DBF: {e}")
-        
-    return records, field_names
+        return [], []
+    return list(dbf.records(text=True)), dbf.field_names
+
+def read_points(filename):
+    """(lon, lat) arrays from the .shp next to the DBF, or None when there is no usable geometry."""
+    try:
+        shp = ShapefileReader(filename)
+        return shp.points() if len(shp) == len(shp.dbf) else None
+    except (OSError, ValueError) as e:
+        print(f"No shapefile geometry, using Latitud/Longitud: {e}")
+        return None
 
 def parse_speed(text):
     # Look for "Velocidad permitida: 60 km/h"
@@ -62,28 +41,20 @@ def parse_speed(text):
         return match.group(1)
     return ""
 
-def main():
-    print("Reading CABA DBF...")
-    records, columns = read_dbf_records(DBF_FILE)
-    print(f"Found {len(records)} records with {len(columns)} columns.")
-    
-    # Export to CSV
-    print(f"Exporting to {CSV_OUTPUT}...")
-    try:
-        with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=columns)
-            writer.writeheader()
-            writer.writerows(records)
-        print("CSV export successful.")
-    except Exception as e:
-        print(f"Error writing CSV: {e}")
-    
-    # Continue with GeoJSON update
+def build_features(records, points=None):
+    """
+    Builds the CABA_SHP camera features from the DBF records. The geometry comes
+    from the .shp `points` when given; the Latitud/Longitud text is a fallback.
+    """
     new_features = []
     for i, r in enumerate(records):
         try:
-            lat = float(r.get('Latitud', 0))
-            lon = float(r.get('Longitud', 0))
+            if points is not None:
+                lon, lat = float(points[0][i]), float(points[1][i])
+            else:
+                lat = float(r.get('Latitud', 0))
+                lon = float(r.get('Longitud', 0))
+            if lat != lat or lon != lon: continue  # null shape
             if lat == 0 or lon == 0: continue
             
             desc = r.get('descriptio', '')
@@ -111,28 +82,37 @@ def main():
         except ValueError:
             continue
             
-    print(f"Parsed {len(new_features)} valid features for GeoJSON.")
+    return new_features
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the CABA camera DBF to CSV and merge it into the camera GeoJSON.')
+    parser.add_argument('--no-merge', action='store_true', help=f'Only export {CSV_OUTPUT} / {PARQUET_OUTPUT} (the pipeline merges in its own stage)')
+    args = parser.parse_args()
+
+    print("Reading CABA DBF...")
+    records, columns = read_dbf_records(DBF_FILE)
+    print(f"Found {len(records)} records with {len(columns)} columns.")
     
-    # Update GeoJSON
-    if os.path.exists(GEOJSON_FILE):
-        with open(GEOJSON_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        current_features = data.get('features', [])
-        
-        # Remove old CABA (csv based)
-        filtered = [f for f in current_features if f['properties'].get('source') != 'CABA']
-        
-        # Add new
-        final_features = filtered + new_features
-        data['features'] = final_features
-        
-        with open(GEOJSON_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-            
-        print(f"Updated {GEOJSON_FILE} with {len(final_features)} features.")
-    else:
-        print("GeoJSON file not found to update.")
+    # Export to CSV
+    print(f"Exporting to {CSV_OUTPUT}...")
+    try:
+        with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+        print("CSV export successful.")
+    except Exception as e:
+        print(f"Error writing CSV: {e}")
+
+    try:
+        count = write_table(pd.DataFrame(records, columns=columns), PARQUET_OUTPUT, 'caba_full_data')
+        print(f"Wrote {count} rows to {PARQUET_OUTPUT}")
+    except SchemaError as e:
+        print(f"Error writing {PARQUET_OUTPUT}: {e}")
+
+    # Merge into the camera GeoJSON through the keyed store (CABA_SHP is one of its sources)
+    if not args.no_merge:
+        merge(output=GEOJSON_FILE)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import numpy as np
+
+from camera_alerts import KM_PER_DEG, AlertEngine, CameraSet, Fix
+from cameras_ahead import CAMERAS_GEOJSON
+from route_km_geocoder import load_index
+
+# Replays GPS tracks through camera_alerts.AlertEngine and reports alert
+# throughput and per-fix latency. Tracks are GPX files (trkpt/rtept with
+# optional time, speed and course) or synthetic drives:
+#   - without --roads, hops between nearby cameras in straight lines,
+#   - with --roads, drives the longest road chains in both directions, so the
+#     cameras' `sentido` is exercised too.
+#
+#   python replay_gpx.py track1.gpx track2.gpx
+#   python replay_gpx.py --synthetic 20 --speed 90 --write-gpx /tmp/synthetic.gpx
+#   python replay_gpx.py --synthetic 10 --roads roads.geojson --async
+
+HOP_MIN_KM = 0.5            # synthetic hops skip cameras closer than this (same site, other lane)
+HOP_MAX_KM = 8.0
+LEAD_IN_KM = 2.0            # synthetic drives start this far before the first camera
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _parse_time(text):
+    return datetime.fromisoformat(text.strip().replace('Z', '+00:00')).timestamp()
+
+def read_gpx(path):
+    """Yields the Fix of every trkpt/rtept of a GPX 1.0/1.1 file, streaming."""
+    n = 0
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if _local(elem.tag) not in ('trkpt', 'rtept'):
+            continue
+        values = {}
+        for child in elem.iter():
+            name = _local(child.tag)
+            if name in ('time', 'speed', 'course') and child.text:
+                values[name] = child.text
+        # GPX 1.0 <speed> is m/s; some loggers put it under <extensions>
+        speed = float(values['speed']) * 3.6 if 'speed' in values else None
+        course = float(values['course']) if 'course' in values else None
+        t = _parse_time(values['time']) if 'time' in values else float(n)
+        yield Fix(t, float(elem.get('lon')), float(elem.get('lat')), speed, course)
+        n += 1
+        elem.clear()
+
+def write_gpx(fixes, path, name='synthetic'):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<gpx version="1.1" creator="replay_gpx.py" xmlns="http://www.topografix.com/GPX/1/1">',
+             f'<trk><name>{name}</name><trkseg>']
+    for f in fixes:
+        stamp = datetime.fromtimestamp(f.t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        lines.append(f'<trkpt lat="{f.lat:.7f}" lon="{f.lon:.7f}"><time>{stamp}</time></trkpt>')
+    lines.append('</trkseg></trk></gpx>')
+    with open(path, 'w', encoding='utf-8') as out:
+        out.write('\n'.join(lines) + '\n')
+
+def _drive(points, speed_kmh, hz, noise_m, rng, t0=0.0):
+    """Fixes every 1/hz s along a polyline of (lon, lat) at constant speed, with Gaussian noise."""
+    pts = np.asarray(points, dtype=float)
+    k = KM_PER_DEG * np.cos(np.radians(pts[:, 1]))
+    seg = np.hypot(np.diff(pts[:, 0]) * k[:-1], np.diff(pts[:, 1]) * KM_PER_DEG)
+    chain = np.concatenate(([0.0], np.cumsum(seg)))
+    steps = np.arange(0.0, chain[-1], speed_kmh / 3600.0 / hz)
+    lon = np.interp(steps, chain, pts[:, 0])
+    lat = np.interp(steps, chain, pts[:, 1])
+    noise = rng.normal(0.0, noise_m / 1000.0, size=(2, len(steps)))
+    lon += noise[0] / (KM_PER_DEG * np.cos(np.radians(lat)))
+    lat += noise[1] / KM_PER_DEG
+    return [Fix(t0 + i / hz, float(x), float(y)) for i, (x, y) in enumerate(zip(lon, lat))]
+
+def camera_hop_track(cameras, hops, speed_kmh=90.0, hz=1.0, noise_m=4.0, seed=0):
+    """A drive through `hops` cameras, each the nearest unvisited one HOP_MIN_KM..HOP_MAX_KM away."""
+    rng = np.random.default_rng(seed)
+    lon, lat = np.asarray(cameras.lon), np.asarray(cameras.lat)
+    k = KM_PER_DEG * math.cos(math.radians(float(np.mean(lat))))
+    route = []
+    # Isolated start cameras give no drive at all: draw another one
+    while len(route) < 2:
+        current = int(rng.integers(len(lon)))
+        route = [current]
+        visited = np.zeros(len(lon), dtype=bool)
+        for _ in range(hops):
+            d = np.hypot((lon - lon[current]) * k, (lat - lat[current]) * KM_PER_DEG)
+            visited |= d < HOP_MIN_KM
+            d[visited | (d > HOP_MAX_KM)] = np.inf
+            if not np.isfinite(d.min()):
+                break
+            current = int(np.argmin(d))
+            route.append(current)
+    points = [(lon[i], lat[i]) for i in route]
+    # Lead in from behind the first camera, and run out past the last one
+    for end, prev in ((0, 1), (-1, -2)):
+        if len(points) > 1:
+            dx, dy = points[end][0] - points[prev][0], points[end][1] - points[prev][1]
+            scale = LEAD_IN_KM / max(math.hypot(dx * k, dy * KM_PER_DEG), 1e-9)
+            extra = (points[end][0] + dx * scale, points[end][1] + dy * scale)
+            points.insert(0, extra) if end == 0 else points.append(extra)
+    return _drive(points, speed_kmh, hz, noise_m, rng)
+
+def road_tracks(roads, count, speed_kmh=90.0, hz=1.0, noise_m=4.0, seed=0):
+    """Drives along the `count` longest road chains, alternating directions."""
+    rng = np.random.default_rng(seed)
+    chains = sorted((c for group in roads.chains.values() for c in group), key=lambda c: -c.length)
+    tracks = []
+    for i, chain in enumerate(chains[:count]):
+        coords = chain.coords if i % 2 == 0 else chain.coords[::-1]
+        tracks.append(_drive(coords, speed_kmh, hz, noise_m, rng))
+    return tracks
+
+def replay(engine, fixes):
+    """Pushes every fix, timing each push. Returns (alerts, per-fix latencies in seconds, wall seconds)."""
+    latencies = np.empty(len(fixes))
+    alerts = []
+    pending = engine.pending
+    clock = time.perf_counter
+    start = clock()
+    for j, f in enumerate(fixes):
+        t0 = clock()
+        if engine.push(f.t, f.lon, f.lat, f.speed_kmh, f.heading):
+            while pending:
+                alerts.append(pending.popleft())
+        latencies[j] = clock() - t0
+    return alerts, latencies, clock() - start
+
+async def replay_async(engine, fixes):
+    """Same through astream(): a producer task feeds an asyncio.Queue; latency is enqueue -> alert."""
+    queue = asyncio.Queue(maxsize=64)
+    sent = {}
+
+    async def produce():
+        for j, f in enumerate(fixes):
+            sent[j] = time.perf_counter()
+            await queue.put((j, f))
+        await queue.put(None)
+
+    current = [0]
+
+    async def source():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            current[0] = item[0]
+            yield item[1]
+
+    alerts, latencies = [], []
+    producer = asyncio.create_task(produce())
+    start = time.perf_counter()
+    async for alert in engine.astream(source()):
+        alerts.append(alert)
+        latencies.append(time.perf_counter() - sent[current[0]])
+    await producer
+    return alerts, np.asarray(latencies), time.perf_counter() - start
+
+def summarize(name, fixes, alerts, latencies, wall):
+    us = latencies * 1e6
+    kinds = {}
+    for a in alerts:
+        kinds[a.kind] = kinds.get(a.kind, 0) + 1
+    return {
+        'track': name,
+        'fixes': len(fixes),
+        'track_minutes': round((fixes[-1].t - fixes[0].t) / 60.0, 1) if fixes else 0,
+        'alerts': kinds,
+        'over_limit': sum(a.over_limit for a in alerts),
+        'seconds': round(wall, 4),
+        'fixes_per_s': round(len(fixes) / wall, 1) if wall else None,
+        'alerts_per_s': round(len(alerts) / wall, 1) if wall else None,
+        'p50_us': round(float(np.percentile(us, 50)), 2) if len(us) else None,
+        'p99_us': round(float(np.percentile(us, 99)), 2) if len(us) else None,
+        'max_us': round(float(us.max()), 2) if len(us) else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay GPS tracks through the camera alert engine.')
+    parser.add_argument('tracks', nargs='*', help='GPX files')
+    parser.add_argument('--cameras', default=CAMERAS_GEOJSON)
+    parser.add_argument('--roads', default=None, help='Road network extract: camera directions + road drives')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Synthetic drives: cameras hopped (no --roads) or roads driven (with --roads)')
+    parser.add_argument('--speed', type=float, default=90.0, help='Synthetic speed, km/h')
+    parser.add_argument('--hz', type=float, default=1.0, help='Synthetic fix rate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Feed fixes through astream()')
+    parser.add_argument('--write-gpx', default=None, help='Save the (first) synthetic track')
+    parser.add_argument('--verbose', action='store_true', help='Print every alert')
+    parser.add_argument('--out', default=None, help='Save the report as JSON')
+    args = parser.parse_args()
+
+    roads = load_index(args.roads) if args.roads else None
+    cameras = CameraSet.from_geojson(args.cameras, roads)
+    directed = sum(b == b for b in cameras.bearing)
+    print(f"{len(cameras)} cameras, {directed} with a travel direction, {len(cameras.cells)} grid cells")
+
+    tracks = [(path, list(read_gpx(path))) for path in args.tracks]
+    if args.synthetic:
+        if roads is not None:
+            drives = road_tracks(roads, args.synthetic, args.speed, args.hz, seed=args.seed)
+        else:
+            drives = [camera_hop_track(cameras, 25, args.speed, args.hz, seed=args.seed + i)
+                      for i in range(args.synthetic)]
+        tracks += [(f'synthetic-{i}', fixes) for i, fixes in enumerate(drives)]
+        if args.write_gpx and drives:
+            write_gpx(drives[0], args.write_gpx)
+            print(f"✓ Synthetic track saved to: {args.write_gpx}")
+    if not tracks:
+        parser.error('give GPX tracks and/or --synthetic N')
+
+    report = []
+    total_fixes = total_alerts = total_wall = 0
+    print(f"{'track':<16} {'fixes':>7} {'min':>6} {'enter':>6} {'appr':>6} {'pass':>6} {'fixes/s':>10} "
+          f"{'alerts/s':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for name, fixes in tracks:
+        engine = AlertEngine(cameras)
+        if args.use_async:
+            alerts, latencies, wall = asyncio.run(replay_async(engine, fixes))
+        else:
+            alerts, latencies, wall = replay(engine, fixes)
+        r = summarize(name, fixes, alerts, latencies, wall)
+        r['window_refills'] = engine.refills
+        report.append(r)
+        total_fixes += len(fixes)
+        total_alerts += len(alerts)
+        total_wall += wall
+        a = r['alerts']
+        print(f"{name[-16:]:<16} {r['fixes']:>7} {r['track_minutes']:>6} {a.get('enter', 0):>6} "
+              f"{a.get('approach', 0):>6} {a.get('pass', 0):>6} {r['fixes_per_s']:>10.0f} {r['alerts_per_s']:>9.1f} "
+              f"{r['p50_us'] or 0:>8.2f} {r['p99_us'] or 0:>8.2f} {r['max_us'] or 0:>8.2f}")
+        if args.verbose:
+            for al in alerts:
+                limit = f"{al.speed_limit} km/h" if al.speed_limit else '-'
+                speed = f"{al.speed_kmh:.0f}" if al.speed_kmh is not None else '?'
+                print(f"    t={al.t:9.1f} {al.kind:<8} {al.distance_m:6.0f} m  limit {limit:<8} at {speed} km/h"
+                      f"{'  OVER' if al.over_limit else ''}  {al.serial}  {al.label}")
+    print(f"Total: {total_fixes} fixes, {total_alerts} alerts in {total_wall:.3f}s "
+          f"({total_fixes / max(total_wall, 1e-9):.0f} fixes/s, {total_alerts / max(total_wall, 1e-9):.1f} alerts/s)")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'cameras': len(cameras), 'async': args.use_async, 'tracks': report}, f, indent=2)
+        print(f"✓ Report saved to: {args.out}")
+
+if __name__ == "__main__":
+    main()
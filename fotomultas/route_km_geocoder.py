@@ -0,0 +1,405 @@
+import argparse
+import json
+import re
+import unicodedata
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Offline geocoder for "Ruta Nacional N - km X,Y ... provincia de Z" style
+# addresses. Nominatim can't resolve a km marker, so instead of spending a
+# rate-limited request per camera we:
+#   1. parse road, km and province out of the address,
+#   2. look the road up in a local linear-referencing index built from a road
+#      network extract (GeoJSON routes + km posts, or an OSM PBF),
+#   3. interpolate the point at that km along the road geometry.
+# Free-form street addresses don't parse and still go to the network geocoder.
+
+EARTH_RADIUS_KM = 6371.0088
+KM_TOLERANCE = 5.0          # how far outside a road's calibrated km range we still extrapolate
+POST_SNAP_KM = 0.3          # km posts further than this from their road are ignored
+ENDPOINT_DECIMALS = 6       # endpoints closer than ~0.1 m are joined when chaining ways
+
+PROVINCE_ALIASES = {
+    'bs as': 'buenos aires', 'bs. as': 'buenos aires', 'bs.as': 'buenos aires', 'pba': 'buenos aires',
+    'caba': 'caba', 'c.a.b.a': 'caba', 'ciudad autonoma de buenos aires': 'caba',
+    'capital federal': 'caba', 'santa fe': 'santa fe',
+}
+
+# All patterns run on fold()ed text (lowercase, no accents, single spaces)
+ROAD_RE = re.compile(
+    r'\b(?P<kind>ruta nacional|ruta provincial|ruta prov\.?|ruta pcial\.?|ruta nac\.?|r\.?n\.?|r\.?p\.?'
+    r'|autopista|au\.?)'
+    r' ?(?:n ?[º°o]\.?|nro\.?|n\.)? ?(?P<num>[a-z]{1,2} ?\d+|\d+)\b(?! de )')
+# Highways known by name rather than number: "Autopista 25 de Mayo km 4,0", "Au. Illia km 4,5"
+NAMED_ROAD_RE = re.compile(r'\b(?:autopista|au\.|camino|corredor|acceso) (?P<name>[a-z0-9 .]+?),? (?:- )?km\b')
+KM_RE = re.compile(r'\bkm\.? ?(?P<km>\d+(?:[.,]\d+)?)')
+PROVINCE_RE = re.compile(r'\b(?:provincia|pcia\.?) (?:de )?(?P<prov>bs\. ?as|[^,.(\-]+)')
+
+class RouteKm(NamedTuple):
+    road: str                 # normalized ref: RN34, RP2, AP01
+    km: float
+    province: Optional[str]   # folded province name, or None
+    direction: Optional[str]  # 'ascendente' / 'descendente' / None
+
+def fold(text):
+    """Lowercase, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', text.lower()).strip()
+
+def normalize_province(text):
+    if not text:
+        return None
+    p = fold(text).strip(' .,-')
+    p = re.sub(r'^(la )?provincia de ', '', p)
+    return PROVINCE_ALIASES.get(p, p)
+
+def normalize_ref(kind, num):
+    """('ruta nacional', '34') -> 'RN34'; ('autopista', 'ap01') -> 'AP01'."""
+    kind = kind.replace('.', '').replace(' ', '')
+    num = num.replace(' ', '').upper()
+    if num[0].isalpha():
+        return ref_from_tag(num)
+    if kind.startswith('rutanac') or kind == 'rn':
+        return f"RN{int(num)}"
+    if kind.startswith(('rutaprov', 'rutapcial')) or kind == 'rp':
+        return f"RP{int(num)}"
+    return f"AU{int(num)}"
+
+def name_key(name):
+    """'Autopista 25 de Mayo' / 'Au. 25 de mayo' -> '25 DE MAYO'."""
+    name = fold(name)
+    name = re.sub(r'^(autopista|au\.?|camino|corredor|acceso)\s+', '', name)
+    return name.strip(' .,-').upper()
+
+def parse_route_km(address):
+    """
+    Extracts road, km marker, province and direction from an installation
+    string. Returns a RouteKm, or None when it is not a road + km address.
+    """
+    if not isinstance(address, str):
+        return None
+    text = fold(address)
+    km = KM_RE.search(text)
+    if not km:
+        return None
+    road = ROAD_RE.search(text)
+    if road and road.start() < km.start():
+        ref = normalize_ref(road.group('kind'), road.group('num'))
+    else:
+        named = NAMED_ROAD_RE.search(text)
+        if not named:
+            return None
+        ref = name_key(named.group('name'))
+
+    prov = PROVINCE_RE.search(text)
+    province = normalize_province(prov.group('prov')) if prov else None
+    if province is None:
+        if re.search(r'\bbs\.? ?as\b', text):
+            province = 'buenos aires'
+        elif 'caba' in text.replace('.', '') or 'ciudad autonoma' in text:
+            province = 'caba'
+
+    direction = None
+    if re.search(r'\bdesc', text):
+        direction = 'descendente'
+    elif re.search(r'\basc', text):
+        direction = 'ascendente'
+    return RouteKm(ref, float(km.group('km').replace(',', '.')), province, direction)
+
+def ref_from_tag(ref):
+    """Normalizes an OSM/GeoJSON `ref` tag ('RN 34', 'N-34', 'RP 2', 'AP01') to the index key form."""
+    if not ref:
+        return None
+    ref = str(ref).split(';')[0].strip().upper().replace('-', ' ')
+    m = re.match(r'^(RN|RP|N|P|AP|AU|A)?\s*(\d+)$', ref)
+    if not m:
+        return name_key(ref)
+    prefix = {'N': 'RN', 'P': 'RP', None: 'RN'}.get(m.group(1), m.group(1))
+    if prefix in ('AP', 'A'):
+        return f"{prefix}{m.group(2).zfill(2 if prefix == 'AP' else 3)}"
+    return f"{prefix}{int(m.group(2))}"
+
+def _segment_lengths(coords):
+    lat = np.radians(coords[:, 1])
+    dlat = np.diff(lat)
+    dlon = np.radians(np.diff(coords[:, 0]))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class RoadChain:
+    """A chained polyline of one road, with cumulative length and an optional km calibration."""
+
+    def __init__(self, coords, province=None):
+        self.coords = np.asarray(coords, dtype=float)
+        self.province = province
+        self.chainage = np.concatenate(([0.0], np.cumsum(_segment_lengths(self.coords))))
+        self.post_chain = None
+        self.post_km = None
+
+    @property
+    def length(self):
+        return float(self.chainage[-1])
+
+    def project(self, lon, lat):
+        """Returns (distance_km, chainage_km) of the closest point of the chain to (lon, lat)."""
+        return self.project_segment(lon, lat)[:2]
+
+    def project_segment(self, lon, lat):
+        """Like project(), plus the index of the segment the closest point lies on."""
+        a, b = self.coords[:-1], self.coords[1:]
+        k_lon = 111.32 * np.cos(np.radians((a[:, 1] + b[:, 1]) / 2))
+        sx, sy = (b[:, 0] - a[:, 0]) * k_lon, (b[:, 1] - a[:, 1]) * 111.32
+        px, py = (lon - a[:, 0]) * k_lon, (lat - a[:, 1]) * 111.32
+        len2 = sx * sx + sy * sy
+        t = np.clip(np.where(len2 > 0, (px * sx + py * sy) / np.where(len2 > 0, len2, 1), 0), 0, 1)
+        dist = np.hypot(px - t * sx, py - t * sy)
+        i = int(np.argmin(dist))
+        return float(dist[i]), float(self.chainage[i] + t[i] * (self.chainage[i + 1] - self.chainage[i])), i
+
+    def calibrate(self, posts):
+        """
+        posts: list of (chainage, km). Keeps the posts whose km progresses
+        monotonically with chainage and stores them for km <-> chainage.
+        """
+        if not posts:
+            return
+        if len(posts) == 1:
+            # A single anchor (e.g. km_start): assume km grows along the drawing direction
+            c, k = posts[0]
+            posts = [(0.0, k - c), (self.length, k + self.length - c)]
+        posts = sorted(posts)
+        ch = np.array([p[0] for p in posts])
+        km = np.array([p[1] for p in posts])
+        # km may decrease along the drawing direction: mirror so it increases,
+        # then drop posts that go backwards (misplaced or from another road)
+        km_fit = -km if km[-1] < km[0] else km
+        keep = np.concatenate(([True], km_fit[1:] > np.maximum.accumulate(km_fit)[:-1]))
+        self.post_chain, self.post_km = ch[keep], km[keep]
+
+    def km_range(self):
+        if self.post_km is None:
+            return None
+        return float(self.post_km.min()), float(self.post_km.max())
+
+    def chainage_at_km(self, km):
+        pk, pc = self.post_km, self.post_chain
+        sign = 1.0 if pk[-1] >= pk[0] else -1.0
+        order = np.argsort(pk)
+        pk_sorted, pc_sorted = pk[order], pc[order]
+        if km < pk_sorted[0]:
+            c = pc_sorted[0] - sign * (pk_sorted[0] - km)
+        elif km > pk_sorted[-1]:
+            c = pc_sorted[-1] + sign * (km - pk_sorted[-1])
+        else:
+            c = float(np.interp(km, pk_sorted, pc_sorted))
+        return min(max(c, 0.0), self.length)
+
+    def point_at(self, chainage):
+        lon = float(np.interp(chainage, self.chainage, self.coords[:, 0]))
+        lat = float(np.interp(chainage, self.chainage, self.coords[:, 1]))
+        return lon, lat
+
+def chain_lines(lines):
+    """Joins LineStrings that share endpoints into longer chains (greedy line merge)."""
+    lines = [np.asarray(l, dtype=float) for l in lines if len(l) >= 2]
+    ends = {}
+    def key(pt):
+        return (round(pt[0], ENDPOINT_DECIMALS), round(pt[1], ENDPOINT_DECIMALS))
+    for i, line in enumerate(lines):
+        ends.setdefault(key(line[0]), []).append(i)
+        ends.setdefault(key(line[-1]), []).append(i)
+
+    used = [False] * len(lines)
+    def extend(chain):
+        while True:
+            candidates = [j for j in ends.get(key(chain[-1]), []) if not used[j]]
+            if not candidates:
+                return chain
+            j = candidates[0]
+            used[j] = True
+            nxt = lines[j] if key(lines[j][0]) == key(chain[-1]) else lines[j][::-1]
+            chain = np.vstack([chain, nxt[1:]])
+
+    # Start from loose ends first so chains run end to end
+    order = sorted(range(len(lines)), key=lambda i: min(len(ends[key(lines[i][0])]), len(ends[key(lines[i][-1])])))
+    chains = []
+    for i in order:
+        if used[i]:
+            continue
+        used[i] = True
+        chain = extend(lines[i])
+        chain = extend(chain[::-1])[::-1]
+        chains.append(chain)
+    return chains
+
+class RouteKmIndex:
+    """
+    Linear-referencing index: road ref -> chained geometries calibrated with km
+    posts. Provincial routes are keyed by (ref, province) because their numbers
+    repeat across provinces; national routes and AP autopistas by ref alone.
+    """
+
+    def __init__(self):
+        self.chains = {}
+
+    @staticmethod
+    def _key(road, province):
+        if road.startswith('RN') or province is None:
+            return road
+        return f"{road}|{province}"
+
+    def build(self, lines, posts):
+        """
+        lines: iterable of (ref, province, coords)
+        posts: iterable of (ref or None, lon, lat, km)
+        """
+        grouped = {}
+        for ref, province, coords in lines:
+            road = ref_from_tag(ref)
+            if road:
+                grouped.setdefault(self._key(road, normalize_province(province)), []).append(coords)
+        for key, group in grouped.items():
+            province = key.split('|', 1)[1] if '|' in key else None
+            self.chains[key] = [RoadChain(c, province) for c in chain_lines(group)]
+
+        snapped = {}
+        for ref, lon, lat, km in posts:
+            road = ref_from_tag(ref)
+            keys = [k for k in self.chains if road and (k == road or k.startswith(road + '|'))] or list(self.chains)
+            best = None
+            for key in keys:
+                for ci, chain in enumerate(self.chains[key]):
+                    dist, ch = chain.project(lon, lat)
+                    if dist <= POST_SNAP_KM and (best is None or dist < best[0]):
+                        best = (dist, key, ci, ch)
+            if best:
+                snapped.setdefault((best[1], best[2]), []).append((best[3], float(km)))
+        for (key, ci), chain_posts in snapped.items():
+            self.chains[key][ci].calibrate(chain_posts)
+        return self
+
+    @classmethod
+    def from_geojson(cls, path):
+        """
+        Loads a GeoJSON with LineString/MultiLineString road features (properties
+        `ref`, optional `province`) and Point km posts (properties `km`, or OSM's
+        `distance`/`pk`, and optionally `ref`). Road features may instead carry
+        `km_start` to be calibrated without posts.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json.load(f).get('features', [])
+        lines, posts = [], []
+        for feat in features:
+            geom = feat.get('geometry') or {}
+            props = feat.get('properties') or {}
+            gtype = geom.get('type')
+            if gtype == 'LineString':
+                parts = [geom['coordinates']]
+            elif gtype == 'MultiLineString':
+                parts = geom['coordinates']
+            elif gtype == 'Point':
+                km = props.get('km', props.get('distance', props.get('pk')))
+                try:
+                    km = float(str(km).replace(',', '.'))
+                except (TypeError, ValueError):
+                    continue
+                posts.append((props.get('ref'), geom['coordinates'][0], geom['coordinates'][1], km))
+                continue
+            else:
+                continue
+            province = props.get('province') or props.get('provincia') or props.get('is_in:state')
+            for part in parts:
+                lines.append((props.get('ref'), province, part))
+                if props.get('km_start') is not None:
+                    # Start-of-geometry calibration: a post at the first vertex
+                    posts.append((props.get('ref'), part[0][0], part[0][1], float(props['km_start'])))
+        return cls().build(lines, posts)
+
+    @classmethod
+    def from_osm_pbf(cls, path):
+        """
+        Loads ways tagged with a RN/RP/AP `ref` and highway=milestone nodes from
+        an OSM PBF extract. Needs the optional `osmium` package.
+        """
+        import osmium
+
+        lines, posts = [], []
+
+        class Handler(osmium.SimpleHandler):
+            def way(self, w):
+                ref = w.tags.get('ref')
+                if 'highway' not in w.tags or not ref or not re.match(r'^(RN|RP|AP|N|P)\s*-?\s*\d+', ref.strip().upper()):
+                    return
+                try:
+                    coords = [(n.lon, n.lat) for n in w.nodes]
+                except osmium.InvalidLocationError:
+                    return
+                lines.append((ref, w.tags.get('is_in:state'), coords))
+
+            def node(self, n):
+                if n.tags.get('highway') != 'milestone':
+                    return
+                km = n.tags.get('distance') or n.tags.get('pk')
+                try:
+                    km = float(km.replace(',', '.'))
+                except (AttributeError, ValueError):
+                    return
+                posts.append((n.tags.get('ref') or n.tags.get('railway:ref'), n.location.lon, n.location.lat, km))
+
+        Handler().apply_file(path, locations=True)
+        return cls().build(lines, posts)
+
+    def locate(self, parsed):
+        """
+        Returns (lon, lat) for a RouteKm, or None if the road or km isn't covered.
+        """
+        keys = [self._key(parsed.road, parsed.province), parsed.road]
+        if parsed.province is None:
+            keys += [k for k in self.chains if k.startswith(parsed.road + '|')]
+        best = None
+        for key in keys:
+            for chain in self.chains.get(key, []):
+                rng = chain.km_range()
+                if rng is None:
+                    continue
+                outside = max(rng[0] - parsed.km, parsed.km - rng[1], 0.0)
+                if outside <= KM_TOLERANCE and (best is None or outside < best[0]):
+                    best = (outside, chain)
+        if best is None:
+            return None
+        chain = best[1]
+        return chain.point_at(chain.chainage_at_km(parsed.km))
+
+    def geocode(self, address):
+        """parse_route_km + locate. Returns (lat, lon, formatted_address) or None."""
+        parsed = parse_route_km(address)
+        if parsed is None:
+            return None
+        point = self.locate(parsed)
+        if point is None:
+            return None
+        km = f"{parsed.km:g}".replace('.', ',')
+        where = f", {parsed.province.title()}" if parsed.province else ""
+        return point[1], point[0], f"{parsed.road} km {km}{where}, Argentina (offline)"
+
+def load_index(path):
+    """Builds a RouteKmIndex from a .geojson/.json or .osm.pbf/.pbf road extract."""
+    if path.endswith('.pbf'):
+        return RouteKmIndex.from_osm_pbf(path)
+    return RouteKmIndex.from_geojson(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline road + km geocoder.')
+    parser.add_argument('--roads', required=True, help='Road network extract (.geojson or .osm.pbf)')
+    parser.add_argument('addresses', nargs='+', help='Installation strings to geocode')
+    args = parser.parse_args()
+
+    index = load_index(args.roads)
+    print(f"Indexed {sum(len(c) for c in index.chains.values())} road chains for {len(index.chains)} refs")
+    for address in args.addresses:
+        print(f"{address!r}\n  parsed: {parse_route_km(address)}\n  result: {index.geocode(address)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import mmap
+import os
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+# Shared DBF / Shapefile reader.
+#
+# The .dbf is memory-mapped and viewed through a NumPy structured dtype built
+# from its field descriptors, so nothing is parsed until a column is asked for,
+# and then the whole column is decoded in one go (with the encoding named in
+# the .cpg). Point geometry is read from the .shp at the offsets listed in the
+# .shx; when the records are evenly spaced (the usual case for points) x/y are
+# strided views over the mapped file, with no copy at all.
+
+DEFAULT_ENCODING = 'latin-1'   # dBase default when there is no .cpg
+SHAPE_NULL = 0
+POINT_TYPES = {1: 'Point', 11: 'PointZ', 21: 'PointM'}
+
+CPG_ALIASES = {
+    'utf8': 'utf-8', 'utf-8': 'utf-8', '65001': 'utf-8',
+    'ansi 1252': 'cp1252', '1252': 'cp1252', 'windows-1252': 'cp1252',
+    'iso-8859-1': 'latin-1', 'iso88591': 'latin-1', '88591': 'latin-1', 'latin1': 'latin-1',
+}
+
+class DBFField(NamedTuple):
+    name: str
+    type: str       # C, N, F, L, D, ...
+    length: int
+    decimals: int
+
+def sibling(path, ext):
+    """Path of the file with the same stem and extension `ext` (either case), or None."""
+    stem = os.path.splitext(path)[0]
+    for candidate in (stem + ext.lower(), stem + ext.upper()):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def read_cpg(path):
+    cpg = sibling(path, '.cpg')
+    if not cpg:
+        return DEFAULT_ENCODING
+    with open(cpg, 'r', encoding='ascii', errors='ignore') as f:
+        name = f.read().strip()
+    return CPG_ALIASES.get(name.lower(), name or DEFAULT_ENCODING)
+
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class DBFReader:
+    """
+    Lazy, column-oriented .dbf reader.
+
+        dbf = DBFReader('caba/camaras.dbf')
+        dbf.fields                      # [DBFField(...), ...]
+        dbf.column('Name')              # np.ndarray of str, whole column decoded at once
+        dbf.columns(['Name', 'Tipo'])   # {name: array}, only those fields touched
+        for record in dbf.records(): ...
+    """
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.encoding = encoding or read_cpg(path)
+        self._buf = _map(path)
+        if len(self._buf) < 32:
+            raise ValueError(f"{path}: too short for a DBF header")
+        self.num_records, self.header_len, self.record_len = struct.unpack('<IHH', self._buf[4:12])
+
+        self.fields = []
+        offset = 32
+        while offset + 32 <= self.header_len and self._buf[offset] != 0x0D:
+            desc = self._buf[offset:offset + 32]
+            name = desc[0:11].split(b'\x00', 1)[0].decode('latin-1').strip()
+            self.fields.append(DBFField(name, chr(desc[11]), desc[16], desc[17]))
+            offset += 32
+
+        names = ['_deleted'] + [fd.name for fd in self.fields]
+        formats = ['S1'] + [f'S{fd.length}' for fd in self.fields]
+        offsets, pos = [0], 1
+        for fd in self.fields:
+            offsets.append(pos)
+            pos += fd.length
+        dtype = np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                          'itemsize': self.record_len})
+        available = (len(self._buf) - self.header_len) // self.record_len
+        count = min(self.num_records, max(available, 0))
+        # Zero-copy view of every record
+        self.table = np.frombuffer(self._buf, dtype=dtype, count=count, offset=self.header_len)
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def field_names(self):
+        return [fd.name for fd in self.fields]
+
+    @property
+    def deleted(self):
+        return self.table['_deleted'] == b'*'
+
+    def field(self, name):
+        for fd in self.fields:
+            if fd.name == name:
+                return fd
+        raise KeyError(name)
+
+    def raw(self, name):
+        """The column as fixed-width bytes (a view into the mapped file)."""
+        return self.table[name]
+
+    def column(self, name, include_deleted=False, text=False):
+        """
+        Decodes one whole column: str for C/D, float for N/F, bool/None for L.
+        With text=True every type comes back as the stripped text of the cell.
+        """
+        fd = self.field(name)
+        values = np.char.strip(self.table[name])
+        if not include_deleted:
+            values = values[~self.deleted]
+        if text:
+            return np.char.decode(values, self.encoding, errors='replace')
+        if fd.type in 'NF':
+            blank = (values == b'') | (np.char.find(values, b'*') >= 0)
+            return np.where(blank, b'nan', values).astype(np.float64)
+        if fd.type == 'L':
+            upper = np.char.upper(values)
+            out = np.full(len(values), None, dtype=object)
+            out[np.isin(upper, [b'T', b'Y'])] = True
+            out[np.isin(upper, [b'F', b'N'])] = False
+            return out
+        return np.char.decode(values, self.encoding, errors='replace')
+
+    def columns(self, names=None, include_deleted=False, text=False):
+        """{name: column} for the requested fields only (all of them by default)."""
+        return {name: self.column(name, include_deleted, text) for name in (names or self.field_names)}
+
+    def records(self, names=None, include_deleted=False, text=False):
+        """Yields one dict per record, like the old row-by-row readers, built from decoded columns."""
+        cols = self.columns(names, include_deleted, text)
+        keys = list(cols)
+        for row in zip(*(cols[k].tolist() for k in keys)):
+            yield dict(zip(keys, row))
+
+class ShapefileReader:
+    """
+    A .shp/.shx/.dbf triple. points() returns x/y arrays aligned with the DBF
+    records; attributes are available through .dbf.
+    """
+
+    def __init__(self, path, encoding=None):
+        self.stem = os.path.splitext(path)[0]
+        dbf = sibling(self.stem, '.dbf')
+        self.dbf = DBFReader(dbf, encoding) if dbf else None
+        self.shp_path = sibling(self.stem, '.shp')
+        self.shx_path = sibling(self.stem, '.shx')
+        if not self.shp_path or not self.shx_path:
+            raise FileNotFoundError(f"{self.stem}: .shp and .shx are both needed for geometry")
+        self._shp = _map(self.shp_path)
+        self._shx = _map(self.shx_path)
+        self.shape_type = struct.unpack('<i', self._shp[32:36])[0]
+        self.bbox = struct.unpack('<4d', self._shp[36:68])
+        # .shx: 100-byte header, then (offset, content length) in 16-bit words, big-endian
+        index = np.frombuffer(self._shx, dtype='>i4', offset=100).reshape(-1, 2)
+        self.offsets = index[:, 0].astype(np.int64) * 2
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def points(self, include_deleted=False):
+        """
+        (x, y) float64 arrays of point geometries; null shapes are NaN. Views
+        into the mapped .shp when records are evenly spaced, copies otherwise.
+        """
+        if self.shape_type not in POINT_TYPES:
+            raise ValueError(f"{self.shp_path}: shape type {self.shape_type} is not a point type")
+        n = len(self.offsets)
+        steps = np.diff(self.offsets)
+        if n and (n == 1 or (steps == steps[0]).all()):
+            stride = int(steps[0]) if n > 1 else 28
+            rec = np.dtype({'names': ['type', 'x', 'y'], 'formats': ['<i4', '<f8', '<f8'],
+                            'offsets': [8, 12, 20], 'itemsize': stride})
+            table = np.ndarray(shape=(n,), dtype=rec, buffer=self._shp, offset=int(self.offsets[0]))
+            types, x, y = table['type'], table['x'], table['y']
+        else:
+            raw = np.frombuffer(self._shp, dtype=np.uint8)
+            pos = self.offsets[:, None] + np.arange(8, 28)
+            block = raw[np.minimum(pos, len(raw) - 1)]
+            types = block[:, 0:4].copy().view('<i4').ravel()
+            x = block[:, 4:12].copy().view('<f8').ravel()
+            y = block[:, 12:20].copy().view('<f8').ravel()
+        null = types == SHAPE_NULL
+        if null.any():
+            x = np.where(null, np.nan, x)
+            y = np.where(null, np.nan, y)
+        if self.dbf is not None and not include_deleted and len(self.dbf) == n:
+            keep = ~self.dbf.deleted
+            if not keep.all():
+                x, y = x[keep], y[keep]
+        return x, y
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_geocoder import start_fake_geocoder
+
+@pytest.fixture
+def fake_geocoder(request):
+    """Fake Nominatim on a free port; pass server options with @pytest.mark.parametrize(..., indirect=True)."""
+    server = start_fake_geocoder(**getattr(request, 'param', {}))
+    yield server
+    server.shutdown()
+    server.server_close()
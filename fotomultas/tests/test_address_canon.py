@@ -0,0 +1,27 @@
+import pytest
+
+from address_canon import canonical_key
+
+@pytest.mark.parametrize('a, b', [
+    # Same camera: lanes, direction, spacing and decimal separators don't matter
+    ('Ruta Nacional 7 km 10,8, Luján, Pcia. de Buenos Aires', 'Ruta Nacional 7 km 10.8, Luján, Pcia. de Buenos Aires'),
+    ('Av. Del Libertador 5500, Moreno, Pcia. Bs. As. Sentido Asc.',
+     'Av. Del Libertador 5500, Moreno, Pcia. Bs. As. Sentido Desc.'),
+    ('Av. Del Libertador 5500 (carriles 1 y 2 sentido descendente), de la localidad de Moreno, provincia de Buenos Aires',
+     'Av. Del Libertador 5500, Moreno, Pcia. Bs. As. Sentido Asc.'),
+    ('Ruta Nacional A012 km 63, Ricardone, Pcia. de Santa Fé, sentido de circulación: carril 1 San Lorenzo-Roldán NE-SO, carril 2 Roldán-San Lorenzo SO-NE.',
+     'Ruta Nacional 12 km 63, Ricardone, Pcia. de Santa Fe'),
+    ('Av, Gaona 1852, CABA, sent. Asc. Carriles 3, 4 y 5', 'Av. Gaona 1852, CABA'),
+])
+def test_same_place(a, b):
+    assert canonical_key(a) == canonical_key(b)
+
+@pytest.mark.parametrize('a, b', [
+    # The town after "(... sentido ...)" must survive
+    ('Av. Hipólito Yrigoyen 5000 (carriles sentido descendente) de la localidad de San Fernando, Pcia. de Buenos Aires',
+     'Av. Hipólito Yrigoyen 5000 (carriles sentido descendente) de la localidad de Lanús, Pcia. de Buenos Aires'),
+    ('Av. Del Libertador 5500, Moreno, Pcia. Bs. As. Sentido Asc.', 'Av. Del Libertador 5500, CABA, sentido Asc.'),
+    ('Ruta Nacional 7 km 10,8', 'Ruta Nacional 7 km 10,9'),
+])
+def test_different_place(a, b):
+    assert canonical_key(a) != canonical_key(b)
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from cinemometros_model import build_model
+
+def _rows(*rows):
+    return pd.DataFrame(rows, columns=['marca', 'modelo', 'nro_de_serie', 'lugar_de_instalacion',
+                                       'fecha_de_verificacion', 'tipo'])
+
+def test_devices_split_by_town_and_merge_partial_addresses():
+    df = _rows(
+        ('M', 'X', 'S1', 'Av. Hipólito Yrigoyen 5000 (carriles sentido descendente) de la localidad de San Fernando, Pcia. de Buenos Aires', '2024-01-10', 'Fijo'),
+        ('M', 'X', 'S1', 'Av. Hipólito Yrigoyen 5000 (carriles sentido descendente) de la localidad de Lanús, Pcia. de Buenos Aires', '2025-01-10', 'Fijo'),
+        ('M', 'X', 'S2', 'Au. Illia km 1,2 carril 2 -Ascendente - CABA', '2024-03-01', 'Fijo'),
+        ('M', 'X', 'S2', 'Autopista Illia km 1,2 (sentido hacia Provincia)', '2025-03-01', 'Fijo'),
+    )
+    devices, verifications = build_model(df)
+    assert devices.groupby('nro_de_serie').size().to_dict() == {'S1': 2, 'S2': 1}
+    assert len(verifications) == 4
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from geopy.exc import GeocoderInsufficientPrivileges, GeocoderQueryError, GeocoderTimedOut
+
+from fake_geocoder import max_requests_in_window
+from geocode_pipeline import MAX_RETRIES, build_geocoder
+
+RATE = 20.0
+
+def _geocoder(server, rate=RATE, burst=1):
+    geocoder = build_geocoder('nominatim-local', 'mapnfs-tests', rate=rate, burst=burst, domain=server.domain)
+    geocoder.backoff_base = 0.001
+    return geocoder
+
+def test_workers_share_the_rate_limit(fake_geocoder):
+    geocoder = _geocoder(fake_geocoder)
+    queries = [f"Av. Test {i}, Argentina" for i in range(int(RATE * 2))]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(geocoder.geocode, queries))
+    assert all(r is not None for r in results)
+    assert len(fake_geocoder.timestamps) == len(queries)
+    # A token bucket of capacity 1 lets at most rate + 1 requests through in any one second
+    assert max_requests_in_window(fake_geocoder.timestamps, 1.0) <= RATE + 1
+
+@pytest.mark.parametrize('fake_geocoder', [{'error_rate': 0.3, 'seed': 3}], indirect=True)
+def test_transient_errors_are_retried(fake_geocoder):
+    geocoder = _geocoder(fake_geocoder, rate=200.0, burst=20)
+    results = [geocoder.geocode(f"Ruta {i}, Argentina") for i in range(30)]
+    assert all(r is not None for r in results)
+    stats = geocoder.stats
+    assert stats['retries'] > 0 and stats['failures'] == 0
+    assert stats['requests'] == 30 + stats['retries'] == len(fake_geocoder.timestamps)
+
+@pytest.mark.parametrize('fake_geocoder', [{'error_rate': 1.0}], indirect=True)
+def test_persistent_unavailability_gives_up_after_max_retries(fake_geocoder):
+    geocoder = _geocoder(fake_geocoder, rate=200.0, burst=20)
+    # geopy maps 503 to GeocoderTimedOut
+    with pytest.raises(GeocoderTimedOut):
+        geocoder.geocode("Calle 1, Argentina")
+    assert len(fake_geocoder.timestamps) == MAX_RETRIES + 1
+    assert geocoder.stats['failures'] == 1
+
+@pytest.mark.parametrize('fake_geocoder, error', [
+    ({'error_rate': 1.0, 'error_status': 400}, GeocoderQueryError),
+    ({'error_rate': 1.0, 'error_status': 403}, GeocoderInsufficientPrivileges),
+], indirect=['fake_geocoder'])
+def test_non_transient_errors_fail_fast(fake_geocoder, error):
+    geocoder = _geocoder(fake_geocoder, rate=200.0, burst=20)
+    with pytest.raises(error):
+        geocoder.geocode("Calle 1, Argentina")
+    assert len(fake_geocoder.timestamps) == 1
+    assert geocoder.stats['retries'] == 0
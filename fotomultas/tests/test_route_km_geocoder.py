@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from route_km_geocoder import EARTH_RADIUS_KM, KM_TOLERANCE, RouteKm, RouteKmIndex, parse_route_km
+
+@pytest.mark.parametrize('address, road, km', [
+    ('Ruta Nacional Nº 34, km 1200', 'RN34', 1200.0),
+    ('Ruta Pcial. Nº 2, km 152,7, Lezama, Pcia. de Buenos Aires', 'RP2', 152.7),
+    ('Ruta Pcial 11 km 291', 'RP11', 291.0),
+    ('Ruta Nac 33 km 10', 'RN33', 10.0),
+    ('Ruta Nac. N° 7, km 20,5', 'RN7', 20.5),
+    ('RP Nro. 6 km 3', 'RP6', 3.0),
+])
+def test_parse_route_km(address, road, km):
+    parsed = parse_route_km(address)
+    assert parsed is not None
+    assert (parsed.road, parsed.km) == (road, km)
+
+def test_street_addresses_are_not_route_km():
+    assert parse_route_km('Av. Rivadavia 1234, CABA') is None
+
+# A straight north-south road on a meridian (haversine length is exact there)
+# drawn as two LineStrings, with posts at km 110 and km 150
+LON = -60.0
+KM_PER_DEG = np.radians(1) * EARTH_RADIUS_KM
+
+def _index():
+    lines = [('RN 7', None, [(LON, -35.0), (LON, -34.6)]),
+             ('RN 7', None, [(LON, -34.6), (LON, -34.0)])]
+    posts = [('RN 7', LON + 0.001, -34.9, 110), ('RN 7', LON, -34.5, 150)]
+    return RouteKmIndex().build(lines, posts)
+
+def test_build_chains_lines_and_calibrates_posts():
+    index = _index()
+    [chain] = index.chains['RN7']
+    assert chain.length == pytest.approx(KM_PER_DEG)
+    assert chain.km_range() == (110.0, 150.0)
+    assert chain.chainage_at_km(110) == pytest.approx(0.1 * KM_PER_DEG, abs=1e-3)
+
+def test_locate_interpolates_between_posts():
+    lon, lat = _index().locate(RouteKm('RN7', 130.0, None, None))
+    assert lon == pytest.approx(LON)
+    assert lat == pytest.approx(-34.7, abs=1e-5)
+
+def test_locate_extrapolates_only_within_tolerance():
+    index = _index()
+    lon, lat = index.locate(RouteKm('RN7', 150 + KM_TOLERANCE - 1, None, None))
+    assert lat == pytest.approx(-34.5 + (KM_TOLERANCE - 1) / KM_PER_DEG, abs=1e-5)
+    assert index.locate(RouteKm('RN7', 150 + KM_TOLERANCE + 1, None, None)) is None
+    assert index.locate(RouteKm('RN8', 130.0, None, None)) is None
+
+def test_geocode_address():
+    lat, lon, formatted = _index().geocode('Ruta Nac. Nº 7, km 130, sentido ascendente')
+    assert (lon, lat) == (pytest.approx(LON), pytest.approx(-34.7, abs=1e-5))
+    assert formatted.startswith('RN7 km 130')